@@ -61,6 +61,7 @@ MIDDLEWARE = [
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'corsheaders.middleware.CorsMiddleware',
+    'core.middleware.LoadSheddingMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
@@ -120,6 +121,26 @@ DATABASES = {
 }
 
 
+# Cache
+# https://docs.djangoproject.com/en/3.2/topics/cache/
+# uWSGI workers share the cache created by its --cache2 option. Other
+# processes, such as tests and the development server, cache in memory.
+
+try:
+    import uwsgi  # noqa: F401
+except ImportError:
+    CACHE_BACKEND = 'django.core.cache.backends.locmem.LocMemCache'
+else:
+    CACHE_BACKEND = 'core.cache.UWSGICache'
+
+CACHES = {
+    'default': {
+        'BACKEND': CACHE_BACKEND,
+        'LOCATION': 'default',
+    }
+}
+
+
 # Password validation
 # https://docs.djangoproject.com/en/3.2/ref/settings/#auth-password-validators
 
@@ -157,11 +178,24 @@ USE_TZ = True
 # https://docs.djangoproject.com/en/3.2/howto/static-files/
 
 STATIC_URL = "/static/static/"
-MEDIA_URL = "/static/media/"
+MEDIA_URL = "/media/"
 
 STATIC_ROOT = "/vol/web/static"
 MEDIA_ROOT = "/vol/web/media"
 
+# Partial files of resumable chunked uploads.
+CHUNKED_UPLOAD_ROOT = "/vol/web/chunked_uploads"
+
+# Seconds since a stored file was last written or reused before releasing
+# its last image deletes it. Identical uploads share one file, and one in
+# progress may reuse it before its image row is committed.
+MEDIA_DELETE_MIN_AGE = 300
+
+# Media is served by MediaView, which delegates the transfer to the proxy's
+# internal location. Without a prefix the view streams files itself.
+MEDIA_ACCEL_REDIRECT_PREFIX = os.environ.get(
+    "MEDIA_ACCEL_REDIRECT_PREFIX", "" if DEBUG else "/protected-media/")
+
 STATICFILES_DIRS = [
     BASE_DIR / "static",
     BASE_DIR / "build/static",
@@ -181,7 +215,38 @@ REST_FRAMEWORK = {
         'rest_framework.authentication.TokenAuthentication',
     ),
     'COERCE_DECIMAL_TO_STRING': False,
+    'DEFAULT_THROTTLE_CLASSES': [
+        'core.throttling.AnonTokenBucketThrottle',
+        'core.throttling.UserTokenBucketThrottle',
+        'core.throttling.ScopedTokenBucketThrottle',
+        'core.throttling.GlobalTokenBucketThrottle',
+    ],
+    # Token buckets: a client may burst up to the number of requests,
+    # which are then refilled evenly over the period.
+    'DEFAULT_THROTTLE_RATES': {
+        'anon': '120/min',
+        'user': '600/min',
+        'global': '200/s',
+        'list': '120/min',
+        'token': '10/min',
+        'uploads': '60/min',
+        'bulk': '30/min',
+    },
+}
+
+# Load shedding: the most requests of each route class, a throttle scope,
+# processed at once by all workers and for one client. Requests beyond are
+# refused with 503 and Retry-After seconds. Requests running longer than
+# the maximum age are assumed to have died with their worker.
+CONCURRENCY_LIMITS = {
+    'list': 3,
+    'uploads': 2,
+    'bulk': 2,
+    'token': 2,
 }
+CONCURRENCY_LIMIT_PER_CLIENT = 2
+CONCURRENCY_RETRY_AFTER = 1
+CONCURRENCY_MAX_AGE = 60
 
 SPECTACULAR_SETTINGS = {
     'TITLE': 'Recipe App API Documentation',
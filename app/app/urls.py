@@ -14,9 +14,8 @@ Including another URLconf
     2. Add a URL to urlpatterns:  path('blog/', include('blog.urls'))
 """
 from django.conf import settings
-from django.conf.urls.static import static
 from django.contrib import admin
-from django.urls import path, include
+from django.urls import path, re_path, include
 from django.views.generic import TemplateView
 
 from drf_spectacular.views import (
@@ -24,6 +23,9 @@ from drf_spectacular.views import (
     SpectacularSwaggerView
 )
 
+from core.views import LoadMetricsView
+from recipe.views import MediaView
+
 urlpatterns = [
     path('', TemplateView.as_view(template_name="index.html")),
     path('admin/', admin.site.urls),
@@ -31,12 +33,14 @@ urlpatterns = [
     path('api/docs/',
          SpectacularSwaggerView.as_view(url_name='schema'),
          name='api-docs'),
+    path('api/metrics/load/', LoadMetricsView.as_view(),
+         name='load-metrics'),
     path('api/users/', include('user.urls')),
     path('api/recipe/', include('recipe.urls')),
+    re_path(r'^%s(?P<path>.+)$' % settings.MEDIA_URL.lstrip('/'),
+            MediaView.as_view(), name='media'),
 ]
 
-# URL for serving static files in development
+# URL for the debug toolbar in development
 if settings.DEBUG:
     urlpatterns += [path('__debug__/', include('debug_toolbar.urls'))]
-    urlpatterns += static(settings.MEDIA_URL,
-                          document_root=settings.MEDIA_ROOT)
@@ -1,8 +1,11 @@
 from .models import User
 from django.contrib import admin
+from django.contrib.auth import get_permission_codename
 from django.contrib.auth.admin import UserAdmin as BaseUserAdmin
 from django.utils.translation import gettext_lazy as _
 
+from recipe.deletion import count_account_objects, delete_accounts
+
 
 admin.site.site_header = 'Recipe App Admin Panel'
 admin.site.index_title = 'Administration'
@@ -48,3 +51,31 @@ class UserAdmin(BaseUserAdmin):
     readonly_fields = ['last_login', 'date_joined']
     search_fields = ('email', 'first_name', 'last_name')
     ordering = ('email',)
+
+    def get_deleted_objects(self, objs, request):
+        """
+        Count the recipe objects deleted with the users instead of listing
+        each of them, which would load whole accounts into memory.
+        """
+        users = self.model.objects.filter(pk__in=[obj.pk for obj in objs])
+        model_count = {self.model._meta.verbose_name_plural: len(objs)}
+        perms_needed = set()
+        if not self.has_delete_permission(request):
+            perms_needed.add(self.model._meta.verbose_name)
+        for model, count in count_account_objects(users).items():
+            if not count:
+                continue
+            opts = model._meta
+            model_count[opts.verbose_name_plural] = count
+            codename = get_permission_codename('delete', opts)
+            if not request.user.has_perm(f'{opts.app_label}.{codename}'):
+                perms_needed.add(opts.verbose_name)
+        return [str(obj) for obj in objs], model_count, perms_needed, []
+
+    def delete_model(self, request, obj):
+        """Delete the user with set based deletes of their recipe data."""
+        delete_accounts(self.model.objects.filter(pk=obj.pk))
+
+    def delete_queryset(self, request, queryset):
+        """Delete the users with set based deletes of their recipe data."""
+        delete_accounts(queryset)
@@ -0,0 +1,149 @@
+"""
+Cache backend storing entries in the cache of the uWSGI instance.
+
+The cache is created by the --cache2 option of uwsgi and lives in memory
+shared by every worker, so an entry deleted by one worker is gone for all
+of them. The uwsgi module only exists inside uWSGI, which is why the
+settings fall back to a local memory cache elsewhere.
+"""
+
+from contextlib import contextmanager
+import logging
+import math
+import pickle
+import threading
+import time
+
+from django.core.cache.backends.base import BaseCache, DEFAULT_TIMEOUT
+
+try:
+    import uwsgi
+except ImportError:
+    uwsgi = None
+
+logger = logging.getLogger(__name__)
+
+# Serializes updates of caches without a lock of their own. Those are
+# local to the process, so a process lock is enough.
+_local_lock = threading.Lock()
+
+
+def cache_lock(cache):
+    """
+    Return a lock to hold while reading and writing entries of a cache
+    which must not change in between. The lock is not reentrant, and
+    incr(), add() and touch() of the uWSGI cache must not be called while
+    holding it.
+    """
+    lock = getattr(cache, "lock", None)
+    return lock() if lock is not None else _local_lock
+
+
+class UWSGICache(BaseCache):
+    """
+    Django cache backend for a named uWSGI cache. Values are pickled with
+    their expiry time, which uWSGI also enforces, and incr() holds the
+    uWSGI lock so concurrent workers do not lose updates.
+    """
+
+    def __init__(self, name, params):
+        super().__init__(params)
+        self._name = name or "default"
+
+    @contextmanager
+    def lock(self):
+        """Hold the lock shared by the workers of the uWSGI instance."""
+        uwsgi.lock()
+        try:
+            yield
+        finally:
+            uwsgi.unlock()
+
+    def _expiry(self, timeout):
+        """Return the absolute expiry time of a timeout, None for never."""
+        if timeout is DEFAULT_TIMEOUT:
+            timeout = self.default_timeout
+        return None if timeout is None else time.time() + timeout
+
+    def _load(self, key):
+        """Return the (expiry, value) entry of a key, None if missing."""
+        data = uwsgi.cache_get(key, self._name)
+        if data is None:
+            return None
+        expiry, value = pickle.loads(data)
+        if expiry is not None and expiry <= time.time():
+            return None
+        return expiry, value
+
+    def _store(self, key, value, expiry):
+        """Store an entry, returning False if it was not stored."""
+        if expiry is None:
+            expires = 0
+        else:
+            expires = math.ceil(expiry - time.time())
+            if expires <= 0:
+                uwsgi.cache_del(key, self._name)
+                return False
+        data = pickle.dumps((expiry, value), pickle.HIGHEST_PROTOCOL)
+        if not uwsgi.cache_update(key, data, expires, self._name):
+            # uWSGI refuses values larger than the free blocks of the cache
+            # without raising, so the caller would never notice.
+            logger.warning(
+                "uWSGI cache %r refused %d bytes for key %r",
+                self._name, len(data), key,
+            )
+            return False
+        return True
+
+    def add(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        key = self.make_key(key, version=version)
+        self.validate_key(key)
+        with self.lock():
+            if self._load(key) is not None:
+                return False
+            return self._store(key, value, self._expiry(timeout))
+
+    def get(self, key, default=None, version=None):
+        key = self.make_key(key, version=version)
+        self.validate_key(key)
+        entry = self._load(key)
+        return default if entry is None else entry[1]
+
+    def set(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        key = self.make_key(key, version=version)
+        self.validate_key(key)
+        return self._store(key, value, self._expiry(timeout))
+
+    def touch(self, key, timeout=DEFAULT_TIMEOUT, version=None):
+        key = self.make_key(key, version=version)
+        self.validate_key(key)
+        with self.lock():
+            entry = self._load(key)
+            if entry is None:
+                return False
+            return self._store(key, entry[1], self._expiry(timeout))
+
+    def delete(self, key, version=None):
+        key = self.make_key(key, version=version)
+        self.validate_key(key)
+        return bool(uwsgi.cache_del(key, self._name))
+
+    def has_key(self, key, version=None):
+        key = self.make_key(key, version=version)
+        self.validate_key(key)
+        return self._load(key) is not None
+
+    def incr(self, key, delta=1, version=None):
+        key = self.make_key(key, version=version)
+        self.validate_key(key)
+        with self.lock():
+            entry = self._load(key)
+            if entry is None:
+                raise ValueError("Key '%s' not found" % key)
+            expiry, value = entry
+            value += delta
+            self._store(key, value, expiry)
+        return value
+
+    def clear(self):
+        uwsgi.cache_clear(self._name)
@@ -0,0 +1,171 @@
+"""
+Load shedding for the expensive endpoints of the API.
+
+Requests to views with a throttle scope, their route class, are recorded
+while in flight in the default cache, which the uWSGI workers share, per
+route class and per client. Once a limit of CONCURRENCY_LIMITS or
+CONCURRENCY_LIMIT_PER_CLIENT is reached, further requests of the class
+are refused at once with 503 and Retry-After. They no longer wait in the
+uWSGI listen queue behind slow requests until nginx gives up, and the
+other workers stay free for cheap requests.
+
+Requests are recorded with their start time and forgotten after
+CONCURRENCY_MAX_AGE seconds, so a worker killed during a request does
+not keep its slot.
+"""
+
+import hashlib
+import time
+import uuid
+
+from django.conf import settings
+from django.core.cache import cache
+from django.http import JsonResponse
+from django.urls import Resolver404, resolve
+
+from .cache import cache_lock
+
+try:
+    import uwsgi
+except ImportError:
+    uwsgi = None
+
+
+def route_class(request):
+    """
+    Return the route class of a request: the throttle scope its view
+    gives the action it is routed to, None for other requests.
+    """
+    try:
+        match = resolve(request.path_info)
+    except Resolver404:
+        return None
+    view_class = getattr(match.func, "cls", None)
+    if view_class is None:
+        return None
+    actions = getattr(match.func, "actions", None) or {}
+    scopes = getattr(view_class, "throttle_scopes", {})
+    return scopes.get(
+        actions.get(request.method.lower()),
+        getattr(view_class, "throttle_scope", None))
+
+
+def client_ident(request):
+    """
+    Identify the client of a request by its credentials, or its address
+    when anonymous. Authentication only runs in the view, so the token
+    itself is used, hashed.
+    """
+    authorization = request.META.get("HTTP_AUTHORIZATION")
+    if authorization:
+        return hashlib.sha256(authorization.encode()).hexdigest()
+    return request.META.get("REMOTE_ADDR", "")
+
+
+def _in_flight_key(name, ident=None):
+    """Return the cache key of the requests in flight of a class."""
+    if ident is None:
+        return f"in-flight:{name}"
+    return f"in-flight:{name}:{ident}"
+
+
+def _rejected_key(name):
+    """Return the cache key of the number of refused requests of a class."""
+    return f"in-flight-rejected:{name}"
+
+
+def _in_flight(key, now):
+    """Return the start time of the requests in flight under a key."""
+    started_after = now - settings.CONCURRENCY_MAX_AGE
+    return {
+        request_id: started
+        for request_id, started in cache.get(key, {}).items()
+        if started > started_after
+    }
+
+
+def _acquire(name, keys, limits, request_id):
+    """
+    Record a request in flight under the keys, unless one of them is at
+    its limit. Return whether the request was recorded.
+    """
+    now = time.time()
+    with cache_lock(cache):
+        in_flight = [_in_flight(key, now) for key in keys]
+        if any(
+            len(requests) >= limit
+            for requests, limit in zip(in_flight, limits)
+        ):
+            rejected = cache.get(_rejected_key(name), 0)
+            cache.set(_rejected_key(name), rejected + 1, None)
+            return False
+        for key, requests in zip(keys, in_flight):
+            requests[request_id] = now
+            cache.set(key, requests, settings.CONCURRENCY_MAX_AGE)
+    return True
+
+
+def _release(keys, request_id):
+    """Forget a request in flight under the keys."""
+    now = time.time()
+    with cache_lock(cache):
+        for key in keys:
+            requests = _in_flight(key, now)
+            requests.pop(request_id, None)
+            if requests:
+                cache.set(key, requests, settings.CONCURRENCY_MAX_AGE)
+            else:
+                cache.delete(key)
+
+
+def load_metrics():
+    """
+    Return the requests in flight, the limit and the number of refused
+    requests of each route class, and the number of connections waiting
+    in the uWSGI listen queue when running under uWSGI.
+    """
+    now = time.time()
+    route_classes = {}
+    for name, limit in settings.CONCURRENCY_LIMITS.items():
+        route_classes[name] = {
+            "in_flight": len(_in_flight(_in_flight_key(name), now)),
+            "limit": limit,
+            "rejected": cache.get(_rejected_key(name), 0),
+        }
+    return {
+        "route_classes": route_classes,
+        "listen_queue": uwsgi.listen_queue() if uwsgi else None,
+    }
+
+
+class LoadSheddingMiddleware:
+    """Refuse requests of route classes at their concurrency limits."""
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        name = route_class(request)
+        limit = settings.CONCURRENCY_LIMITS.get(name)
+        if limit is None:
+            return self.get_response(request)
+
+        keys = [
+            _in_flight_key(name),
+            _in_flight_key(name, client_ident(request)),
+        ]
+        request_id = uuid.uuid4().hex
+        if not _acquire(
+            name, keys, [limit, settings.CONCURRENCY_LIMIT_PER_CLIENT],
+            request_id,
+        ):
+            response = JsonResponse(
+                {"detail": "The server is busy, please retry later."},
+                status=503,
+            )
+            response["Retry-After"] = str(settings.CONCURRENCY_RETRY_AFTER)
+            return response
+        try:
+            return self.get_response(request)
+        finally:
+            _release(keys, request_id)
@@ -0,0 +1,18 @@
+"""Serializers for the core API views."""
+
+from rest_framework import serializers
+
+
+class RouteClassLoadSerializer(serializers.Serializer):
+    """Serializer for the load of a route class."""
+
+    in_flight = serializers.IntegerField()
+    limit = serializers.IntegerField()
+    rejected = serializers.IntegerField()
+
+
+class LoadMetricsSerializer(serializers.Serializer):
+    """Serializer for the load of the route classes and the workers."""
+
+    route_classes = serializers.DictField(child=RouteClassLoadSerializer())
+    listen_queue = serializers.IntegerField(allow_null=True)
@@ -2,6 +2,8 @@ from django.test import TestCase, Client
 from django.contrib.auth import get_user_model
 from django.urls import reverse
 
+from recipe.models import Recipe, Tag
+
 
 class AdminSiteTests(TestCase):
     def setUp(self):
@@ -47,3 +49,28 @@ class AdminSiteTests(TestCase):
         response = self.client.post(url)
 
         self.assertEqual(response.status_code, 200)
+
+    def test_delete_user_page_counts_recipe_objects(self):
+        Recipe.objects.create(
+            user=self.user, title='Sample recipe', time_minutes=5,
+            description='Sample description', price=5)
+        url = reverse('admin:core_user_delete', args=[self.user.id])
+        response = self.client.get(url)
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(list(response.context['model_count']), [
+            ('users', 1), ('recipes', 1)])
+
+    def test_delete_user_deletes_recipe_objects(self):
+        recipe = Recipe.objects.create(
+            user=self.user, title='Sample recipe', time_minutes=5,
+            description='Sample description', price=5)
+        recipe.tags.add(Tag.objects.create(user=self.user, name='Tag'))
+        url = reverse('admin:core_user_delete', args=[self.user.id])
+        response = self.client.post(url, {'post': 'yes'})
+
+        self.assertEqual(response.status_code, 302)
+        self.assertFalse(
+            get_user_model().objects.filter(id=self.user.id).exists())
+        self.assertFalse(Recipe.objects.filter(id=recipe.id).exists())
+        self.assertFalse(Tag.objects.filter(user=self.user.id).exists())
@@ -0,0 +1,96 @@
+"""Tests for the uWSGI cache backend."""
+import time
+from unittest.mock import patch
+
+from django.test import SimpleTestCase
+
+from core.cache import UWSGICache
+
+
+class FakeUWSGI:
+    """In memory stand-in for the uwsgi module, which only uWSGI has."""
+
+    def __init__(self):
+        self.caches = {}
+        self.locked = False
+        self.max_size = None
+
+    def lock(self):
+        self.locked = True
+
+    def unlock(self):
+        self.locked = False
+
+    def cache_get(self, key, name):
+        return self.caches.get(name, {}).get(key)
+
+    def cache_update(self, key, value, expires, name):
+        if self.max_size is not None and len(value) > self.max_size:
+            return None
+        self.caches.setdefault(name, {})[key] = value
+        return True
+
+    def cache_del(self, key, name):
+        return self.caches.get(name, {}).pop(key, None) is not None
+
+    def cache_clear(self, name):
+        self.caches.pop(name, None)
+
+
+class UWSGICacheTests(SimpleTestCase):
+    """Test the cache backend on top of the uWSGI cache API."""
+
+    def setUp(self):
+        self.uwsgi = FakeUWSGI()
+        patcher = patch("core.cache.uwsgi", self.uwsgi)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.cache = UWSGICache("stats", {})
+
+    def test_set_get_delete(self):
+        """Test values are stored in the named uWSGI cache."""
+        self.cache.set("key", {"count": 1})
+
+        self.assertEqual(self.cache.get("key"), {"count": 1})
+        self.assertIn(":1:key", self.uwsgi.caches["stats"])
+        self.assertTrue(self.cache.delete("key"))
+        self.assertIsNone(self.cache.get("key"))
+
+    def test_add_only_sets_missing_keys(self):
+        """Test add keeps an existing value."""
+        self.assertTrue(self.cache.add("key", "first"))
+
+        self.assertFalse(self.cache.add("key", "second"))
+        self.assertEqual(self.cache.get("key"), "first")
+
+    def test_refused_values_are_logged(self):
+        """Test values too large for the uWSGI cache are reported."""
+        self.uwsgi.max_size = 64
+
+        with self.assertLogs("core.cache", level="WARNING"):
+            self.assertFalse(self.cache.set("key", "x" * 100))
+        with self.assertLogs("core.cache", level="WARNING"):
+            self.assertFalse(self.cache.add("key", "x" * 100))
+
+        self.assertIsNone(self.cache.get("key"))
+        self.assertTrue(self.cache.set("key", "small"))
+
+    def test_expired_values_are_missing(self):
+        """Test a value is gone after its timeout."""
+        self.cache.set("key", "value", timeout=1)
+
+        with patch("core.cache.time.time", return_value=time.time() + 2):
+            self.assertIsNone(self.cache.get("key"))
+            self.assertNotIn("key", self.cache)
+
+    def test_incr_keeps_expiry(self):
+        """Test incr updates a counter without extending it."""
+        self.cache.set("counter", 1, timeout=1)
+
+        self.assertEqual(self.cache.incr("counter", 2), 3)
+
+        self.assertFalse(self.uwsgi.locked)
+        with patch("core.cache.time.time", return_value=time.time() + 2):
+            self.assertIsNone(self.cache.get("counter"))
+        with self.assertRaises(ValueError):
+            self.cache.incr("missing")
@@ -0,0 +1,157 @@
+"""Tests for the load shedding middleware."""
+from unittest.mock import patch
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.http import HttpResponse
+from django.test import RequestFactory, SimpleTestCase, TestCase
+from django.test import override_settings
+from django.urls import reverse
+
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from core.middleware import LoadSheddingMiddleware, load_metrics, route_class
+
+
+RECIPES_URL = reverse("recipe:recipe-list")
+TOKEN_URL = reverse("user:token")
+
+
+@override_settings(
+    CONCURRENCY_LIMITS={"list": 2, "bulk": 1},
+    CONCURRENCY_LIMIT_PER_CLIENT=1,
+    CONCURRENCY_RETRY_AFTER=3,
+    CONCURRENCY_MAX_AGE=60,
+)
+class LoadSheddingMiddlewareTests(SimpleTestCase):
+    """Test requests in flight are limited by route class and client."""
+
+    def setUp(self):
+        cache.clear()
+        self.addCleanup(cache.clear)
+        self.factory = RequestFactory()
+
+    def request(self, path=RECIPES_URL, token="first", inner=None):
+        """
+        Send a request through the middleware. The inner function is
+        called while the request is in flight, to send other requests.
+        """
+        def get_response(request):
+            if inner is not None:
+                return inner()
+            return HttpResponse("ok")
+
+        request = self.factory.get(
+            path, HTTP_AUTHORIZATION=f"Token {token}")
+        return LoadSheddingMiddleware(get_response)(request)
+
+    def test_route_class_of_views(self):
+        """Test route classes are the throttle scopes of the actions."""
+        self.assertEqual(
+            route_class(self.factory.get(RECIPES_URL)), "list")
+        self.assertEqual(
+            route_class(self.factory.post(RECIPES_URL)), None)
+        self.assertEqual(route_class(self.factory.post(TOKEN_URL)), "token")
+        self.assertEqual(route_class(self.factory.get("/missing/")), None)
+
+    def test_client_limit(self):
+        """Test a client cannot run more requests of a class at once."""
+        response = self.request(inner=lambda: self.request(token="first"))
+
+        self.assertEqual(
+            response.status_code, status.HTTP_503_SERVICE_UNAVAILABLE)
+        self.assertEqual(response["Retry-After"], "3")
+        self.assertEqual(self.request().status_code, 200)
+
+    def test_route_class_limit(self):
+        """Test all clients together are limited per route class."""
+        response = self.request(
+            token="first",
+            inner=lambda: self.request(
+                token="second",
+                inner=lambda: self.request(token="third")))
+
+        self.assertEqual(response.status_code, 503)
+        self.assertEqual(load_metrics()["route_classes"]["list"], {
+            "in_flight": 0, "limit": 2, "rejected": 1})
+
+    def test_other_routes_are_not_limited(self):
+        """Test requests outside the class or without one are let through."""
+        detail_url = reverse("recipe:recipe-detail", args=[1])
+        response = self.request(
+            inner=lambda: self.request(
+                detail_url, inner=lambda: self.request(
+                    reverse("recipe:recipe-bulk"))))
+
+        self.assertEqual(response.status_code, 200)
+
+    def test_request_released_after_error(self):
+        """Test a request raising an exception frees its slot."""
+        def fail():
+            raise ValueError("View failed")
+
+        with self.assertRaises(ValueError):
+            self.request(inner=fail)
+
+        self.assertEqual(self.request().status_code, 200)
+
+    def test_stale_requests_expire(self):
+        """Test requests older than the maximum age are forgotten."""
+        now = 1000.0
+
+        def later():
+            with patch("core.middleware.time.time", lambda: now + 61):
+                return self.request()
+
+        with patch("core.middleware.time.time", lambda: now):
+            response = self.request(inner=later)
+
+        self.assertEqual(response.status_code, 200)
+
+    def test_metrics_count_requests_in_flight(self):
+        """Test the metrics report the requests being processed."""
+        metrics = []
+
+        def inner():
+            metrics.append(load_metrics())
+            return HttpResponse("ok")
+
+        self.request(inner=inner)
+
+        self.assertEqual(metrics[0]["route_classes"]["list"]["in_flight"], 1)
+        self.assertEqual(metrics[0]["route_classes"]["bulk"]["in_flight"], 0)
+        self.assertIsNone(metrics[0]["listen_queue"])
+
+
+class LoadMetricsApiTests(TestCase):
+    """Test the load metrics endpoint."""
+
+    def setUp(self):
+        cache.clear()
+        self.addCleanup(cache.clear)
+        self.client = APIClient()
+
+    def test_metrics_require_admin(self):
+        """Test only admins can read the load metrics."""
+        user = get_user_model().objects.create_user(
+            "user@example.com", "password123")
+        self.client.force_authenticate(user)
+
+        response = self.client.get(reverse("load-metrics"))
+
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+
+    def test_metrics_for_admin(self):
+        """Test admins read the load of every route class."""
+        admin = get_user_model().objects.create_superuser(
+            "admin@example.com", "password123")
+        self.client.force_authenticate(admin)
+
+        response = self.client.get(reverse("load-metrics"))
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertIn("list", response.data["route_classes"])
+        self.assertEqual(
+            response.data["route_classes"]["list"]["in_flight"], 0)
+        self.assertIsNone(response.data["listen_queue"])
@@ -0,0 +1,181 @@
+"""Tests for the token bucket throttles."""
+from unittest.mock import patch
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.urls import reverse
+
+from rest_framework import status
+from rest_framework.response import Response
+from rest_framework.test import (
+    APIClient,
+    APIRequestFactory,
+    force_authenticate,
+)
+from rest_framework.views import APIView
+
+from core.cache import UWSGICache
+from core.tests.test_cache import FakeUWSGI
+from core.throttling import (
+    AnonTokenBucketThrottle,
+    GlobalTokenBucketThrottle,
+    ScopedTokenBucketThrottle,
+    UserTokenBucketThrottle,
+)
+
+
+RATES = {
+    "anon": "2/min",
+    "user": "3/min",
+    "global": "5/min",
+    "expensive": "1/min",
+}
+
+
+class User:
+    """Authenticated user stand-in, so no database is needed."""
+
+    is_authenticated = True
+
+    def __init__(self, pk):
+        self.pk = pk
+
+
+class ThrottledView(APIView):
+    """View applying the token bucket throttles."""
+
+    authentication_classes = []
+    permission_classes = []
+    throttle_classes = [
+        AnonTokenBucketThrottle,
+        UserTokenBucketThrottle,
+        ScopedTokenBucketThrottle,
+        GlobalTokenBucketThrottle,
+    ]
+
+    def get(self, request):
+        return Response({"ok": True})
+
+
+class ExpensiveView(ThrottledView):
+    """View whose requests are limited by the rate of their scope."""
+
+    throttle_scope = "expensive"
+
+
+@override_settings(REST_FRAMEWORK={
+    **settings.REST_FRAMEWORK, "DEFAULT_THROTTLE_RATES": RATES})
+class TokenBucketThrottleTests(SimpleTestCase):
+    """Test requests are paced by token buckets."""
+
+    def setUp(self):
+        cache.clear()
+        self.addCleanup(cache.clear)
+        self.factory = APIRequestFactory()
+        self.now = 1000.0
+        patcher = patch("core.throttling.time.time", lambda: self.now)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def get(self, view=ThrottledView, user=None, ip="10.0.0.1"):
+        """Send a GET request to a view, as a user or anonymously."""
+        request = self.factory.get("/", REMOTE_ADDR=ip)
+        if user is not None:
+            force_authenticate(request, user=user)
+        return view.as_view()(request)
+
+    def test_burst_then_refill(self):
+        """Test a bucket allows its burst, then one request per refill."""
+        user = User(1)
+        for _ in range(3):
+            self.assertEqual(self.get(user=user).status_code, 200)
+
+        response = self.get(user=user)
+
+        self.assertEqual(
+            response.status_code, status.HTTP_429_TOO_MANY_REQUESTS)
+        self.assertEqual(response["Retry-After"], "20")
+        self.now += 20
+        self.assertEqual(self.get(user=user).status_code, 200)
+        self.assertEqual(self.get(user=user).status_code, 429)
+
+    def test_buckets_are_per_client(self):
+        """Test users and anonymous IP addresses have their own buckets."""
+        for _ in range(2):
+            self.get(ip="10.0.0.1")
+
+        self.assertEqual(self.get(ip="10.0.0.1").status_code, 429)
+        self.assertEqual(self.get(ip="10.0.0.2").status_code, 200)
+        self.assertEqual(self.get(user=User(1)).status_code, 200)
+
+    def test_scoped_rate(self):
+        """Test views with a scope are limited by its rate as well."""
+        user = User(1)
+
+        self.assertEqual(self.get(ExpensiveView, user=user).status_code, 200)
+        response = self.get(ExpensiveView, user=user)
+
+        self.assertEqual(response.status_code, 429)
+        self.assertEqual(response["Retry-After"], "60")
+        self.assertEqual(self.get(user=user).status_code, 200)
+        self.assertEqual(
+            self.get(ExpensiveView, user=User(2)).status_code, 200)
+
+    def test_global_rate(self):
+        """Test all clients share the global bucket."""
+        for pk in range(5):
+            self.assertEqual(self.get(user=User(pk)).status_code, 200)
+
+        self.assertEqual(self.get(user=User(5)).status_code, 429)
+
+    def test_refused_requests_take_no_global_token(self):
+        """Test a client over its limit leaves the global bucket to others."""
+        for _ in range(10):
+            self.get(user=User(1))
+
+        for pk in range(2, 4):
+            self.assertEqual(self.get(user=User(pk)).status_code, 200)
+
+    def test_buckets_updated_under_cache_lock(self):
+        """Test the lock of the uWSGI cache serializes bucket updates."""
+        uwsgi = FakeUWSGI()
+        uwsgi_cache = UWSGICache("default", {})
+        locked = []
+        uwsgi.cache_update = lambda key, value, expires, name: (
+            locked.append(uwsgi.locked) or True)
+
+        with patch("core.cache.uwsgi", uwsgi), \
+                patch("core.throttling.cache", uwsgi_cache):
+            response = self.get(user=User(1))
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(locked, [True, True])
+
+
+class TokenEndpointThrottleTests(TestCase):
+    """Test the token endpoint is limited by the token rate."""
+
+    def setUp(self):
+        cache.clear()
+        self.addCleanup(cache.clear)
+        get_user_model().objects.create_user(
+            "user@example.com", "password123")
+        self.client = APIClient()
+
+    def test_token_requests_throttled(self):
+        """Test repeated logins are refused with a Retry-After header."""
+        rate = int(settings.REST_FRAMEWORK[
+            "DEFAULT_THROTTLE_RATES"]["token"].split("/")[0])
+        payload = {"email": "user@example.com", "password": "wrong"}
+        for _ in range(rate):
+            response = self.client.post(reverse("user:token"), payload)
+            self.assertEqual(
+                response.status_code, status.HTTP_400_BAD_REQUEST)
+
+        response = self.client.post(reverse("user:token"), payload)
+
+        self.assertEqual(
+            response.status_code, status.HTTP_429_TOO_MANY_REQUESTS)
+        self.assertIn("Retry-After", response)
@@ -0,0 +1,145 @@
+"""
+Token bucket throttles keeping their buckets in the default cache.
+
+A bucket holds up to the number of requests of its rate and refills
+continuously at that rate, so a client may burst up to the limit and is
+then paced to the rate rather than locked out until a window ends. With
+the uWSGI cache every worker reads and updates the same buckets, under
+the lock shared by the workers. Rates are set per scope in the
+DEFAULT_THROTTLE_RATES setting of the REST framework, as "<requests>/
+<period>" with a period of s, min, hour or day.
+"""
+
+import math
+import time
+
+from django.core.cache import cache
+from django.core.exceptions import ImproperlyConfigured
+
+from rest_framework.settings import api_settings
+from rest_framework.throttling import BaseThrottle
+
+from .cache import cache_lock
+
+
+PERIODS = {"s": 1, "m": 60, "h": 60 * 60, "d": 24 * 60 * 60}
+
+
+def parse_rate(rate):
+    """Return the requests and seconds of a rate such as "100/min"."""
+    try:
+        requests, period = rate.split("/")
+        return int(requests), PERIODS[period[0]]
+    except (KeyError, ValueError):
+        raise ImproperlyConfigured(f"Invalid throttle rate '{rate}'.")
+
+
+class TokenBucketThrottle(BaseThrottle):
+    """
+    Base throttle taking a token from a bucket for each request. Requests
+    are allowed while the bucket holds a token; wait() then returns the
+    seconds until the next token, which is sent as Retry-After.
+    """
+
+    scope = None
+
+    def get_scope(self, request, view):
+        """Return the scope of the rate applied to the request."""
+        return self.scope
+
+    def get_cache_key(self, request, view, scope):
+        """Return the key of the bucket of the request, None to skip it."""
+        raise NotImplementedError(".get_cache_key() must be overridden")
+
+    def allow_request(self, request, view):
+        self.retry_after = None
+        scope = self.get_scope(request, view)
+        rate = api_settings.DEFAULT_THROTTLE_RATES.get(scope)
+        key = self.get_cache_key(request, view, scope)
+        if rate is None or key is None:
+            return True
+
+        capacity, period = parse_rate(rate)
+        refill = capacity / period
+        now = time.time()
+        with cache_lock(cache):
+            tokens, updated = cache.get(key, (capacity, now))
+            tokens = min(capacity, tokens + (now - updated) * refill)
+            allowed = tokens >= 1
+            if allowed:
+                tokens -= 1
+            # A bucket missing from the cache is full, so it only needs
+            # to be kept until it would have refilled.
+            cache.set(
+                key, (tokens, now),
+                math.ceil((capacity - tokens) / refill) + 1)
+
+        if not allowed:
+            self.retry_after = (1 - tokens) / refill
+            request.token_bucket_throttled = True
+        return allowed
+
+    def wait(self):
+        return self.retry_after
+
+
+class AnonTokenBucketThrottle(TokenBucketThrottle):
+    """Throttle anonymous requests by client IP address."""
+
+    scope = "anon"
+
+    def get_cache_key(self, request, view, scope):
+        if request.user and request.user.is_authenticated:
+            return None
+        return f"throttle:{scope}:{self.get_ident(request)}"
+
+
+class UserTokenBucketThrottle(TokenBucketThrottle):
+    """Throttle authenticated requests by user."""
+
+    scope = "user"
+
+    def get_cache_key(self, request, view, scope):
+        if not (request.user and request.user.is_authenticated):
+            return None
+        return f"throttle:{scope}:{request.user.pk}"
+
+
+class ScopedTokenBucketThrottle(TokenBucketThrottle):
+    """
+    Throttle expensive endpoints by user, or client IP address when
+    anonymous, with the rate of their scope. Views name the scope of
+    their actions in a throttle_scopes mapping, or of all their requests
+    in throttle_scope.
+    """
+
+    def get_scope(self, request, view):
+        scopes = getattr(view, "throttle_scopes", {})
+        return scopes.get(
+            getattr(view, "action", None),
+            getattr(view, "throttle_scope", None))
+
+    def get_cache_key(self, request, view, scope):
+        if scope is None:
+            return None
+        if request.user and request.user.is_authenticated:
+            ident = f"user-{request.user.pk}"
+        else:
+            ident = self.get_ident(request)
+        return f"throttle:{scope}:{ident}"
+
+
+class GlobalTokenBucketThrottle(TokenBucketThrottle):
+    """
+    Throttle all requests with one bucket, keeping the workers from being
+    saturated. Requests already refused by a throttle listed before this
+    one take no token, so a client over its own limit does not use up
+    the capacity left for others.
+    """
+
+    scope = "global"
+
+    def get_cache_key(self, request, view, scope):
+        if getattr(request, "token_bucket_throttled", False):
+            return None
+        return f"throttle:{scope}"
@@ -0,0 +1,25 @@
+"""Views for the core API."""
+
+from drf_spectacular.utils import extend_schema
+
+from rest_framework.permissions import IsAdminUser
+from rest_framework.response import Response
+from rest_framework.views import APIView
+
+from .middleware import load_metrics
+from .serializers import LoadMetricsSerializer
+
+
+class LoadMetricsView(APIView):
+    """View for the load shedding metrics, for monitoring by admins."""
+
+    permission_classes = [IsAdminUser]
+
+    @extend_schema(responses=LoadMetricsSerializer)
+    def get(self, request):
+        """
+        Return the requests in flight, the concurrency limit and the
+        refused requests of each route class, and the connections waiting
+        in the uWSGI listen queue.
+        """
+        return Response(LoadMetricsSerializer(load_metrics()).data)
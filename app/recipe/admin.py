@@ -1,8 +1,13 @@
 """Admin site configuration for the recipe app."""
 
+from django import forms
 from django.contrib import admin
+from django.core.files.uploadedfile import UploadedFile
+from django.db import router, transaction
 from django.utils.html import format_html
 
+from .deletion import delete_recipes
+from .images import strip_metadata
 from .models import (
     Ingredient,
     IngredientImage,
@@ -10,6 +15,8 @@ from .models import (
     RecipeImage,
     Tag,
 )
+from .similarity import refresh_similarities_on_commit
+from .stats import invalidate_stats_on_commit
 
 
 class TagInline(admin.TabularInline):
@@ -20,6 +27,27 @@ class TagInline(admin.TabularInline):
     extra = 1
 
 
+class TagLinksAdminMixin:
+    """
+    Refresh the similar recipes of recipes whose tags were edited in the
+    tag inline. Its rows belong to the auto created through model, which
+    sends no signals.
+    """
+
+    def save_related(self, request, form, formsets, change):
+        super().save_related(request, form, formsets, change)
+        recipe_ids = set()
+        for formset in formsets:
+            if formset.model is not Recipe.tags.through:
+                continue
+            for inline_form in formset.forms:
+                if inline_form.has_changed():
+                    recipe_ids.add(inline_form.initial.get('recipe'))
+                    recipe_ids.add(inline_form.instance.recipe_id)
+        recipe_ids.discard(None)
+        refresh_similarities_on_commit(recipe_ids)
+
+
 class IngredientInline(admin.TabularInline):
     """Inline class for recipe ingredients and ingredient recipes."""
 
@@ -28,9 +56,20 @@ class IngredientInline(admin.TabularInline):
     extra = 1
 
 
+class ImageInlineForm(forms.ModelForm):
+    """Image form stripping EXIF metadata from uploaded files."""
+
+    def clean_image(self):
+        image = self.cleaned_data["image"]
+        if isinstance(image, UploadedFile):
+            image = strip_metadata(image)
+        return image
+
+
 class BaseImageInline(admin.TabularInline):
     """Base class for creating image inlines."""
 
+    form = ImageInlineForm
     readonly_fields = ['thumbnail']
     extra = 1
 
@@ -48,7 +87,7 @@ class RecipeImageInline(BaseImageInline):
 
 
 @admin.register(Recipe)
-class RecipeAdmin(admin.ModelAdmin):
+class RecipeAdmin(TagLinksAdminMixin, admin.ModelAdmin):
     """Recipe model configuration for the admin site"""
 
     autocomplete_fields = ['user']
@@ -58,6 +97,34 @@ class RecipeAdmin(admin.ModelAdmin):
     list_select_related = ['user']
     search_fields = ['title__icontains']
 
+    def changelist_view(self, request, extra_context=None):
+        """Save the rows edited on the list page with one bulk update."""
+        request.changed_recipes = []
+        with transaction.atomic(using=router.db_for_write(self.model)):
+            response = super().changelist_view(request, extra_context)
+            Recipe.objects.bulk_update(
+                request.changed_recipes, self.list_editable)
+            # bulk_update() sends no post_save to drop cached statistics.
+            invalidate_stats_on_commit(
+                recipe.user_id for recipe in request.changed_recipes)
+        return response
+
+    def save_model(self, request, obj, form, change):
+        """Defer saving rows edited on the list page to a bulk update."""
+        changed_recipes = getattr(request, 'changed_recipes', None)
+        if changed_recipes is None or not change:
+            super().save_model(request, obj, form, change)
+        else:
+            changed_recipes.append(obj)
+
+    def delete_model(self, request, obj):
+        """Delete the recipe and its relations with set based deletes."""
+        delete_recipes(Recipe.objects.filter(pk=obj.pk))
+
+    def delete_queryset(self, request, queryset):
+        """Delete the recipes and their relations with set based deletes."""
+        delete_recipes(queryset)
+
     class Media:
         css = {
             'all': ['recipe/styles.css']
@@ -65,7 +132,7 @@ class RecipeAdmin(admin.ModelAdmin):
 
 
 @admin.register(Tag)
-class TagAdmin(admin.ModelAdmin):
+class TagAdmin(TagLinksAdminMixin, admin.ModelAdmin):
     """Tag model configuration for the admin site"""
     autocomplete_fields = ['user']
     inlines = [TagInline]
@@ -0,0 +1,50 @@
+"""Copying recipes with set based SQL."""
+
+from django.db import connection, transaction
+
+from .models import (
+    Recipe,
+    RecipeImage,
+)
+from .similarity import refresh_similarities_on_commit
+
+
+def _copy_rows(model, parent_field, source_id, target_id):
+    """
+    Copy the rows of a model pointing at one parent so they point at
+    another, with a single INSERT ... SELECT.
+    """
+    parent_column = model._meta.get_field(parent_field).column
+    columns = [
+        field.column for field in model._meta.concrete_fields
+        if not field.primary_key and field.column != parent_column
+    ]
+    quote = connection.ops.quote_name
+    column_list = ", ".join(quote(column) for column in columns)
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f"INSERT INTO {quote(model._meta.db_table)} "
+            f"({quote(parent_column)}, {column_list}) "
+            f"SELECT %s, {column_list} FROM {quote(model._meta.db_table)} "
+            f"WHERE {quote(parent_column)} = %s",
+            [target_id, source_id],
+        )
+
+
+def clone_recipe(recipe):
+    """
+    Return a copy of a recipe with the same tags, ingredients and images.
+    Links are copied inside the database and the image rows reference the
+    same files, which the content addressed storage shares by design.
+    """
+    with transaction.atomic():
+        clone = Recipe.objects.create(**{
+            field.attname: getattr(recipe, field.attname)
+            for field in Recipe._meta.concrete_fields
+            if not field.primary_key
+        })
+        for model in [Recipe.tags.through, Recipe.ingredients.through]:
+            _copy_rows(model, "recipe", recipe.id, clone.id)
+        _copy_rows(RecipeImage, "recipe", recipe.id, clone.id)
+        refresh_similarities_on_commit([clone.id])
+    return clone
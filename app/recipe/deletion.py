@@ -0,0 +1,115 @@
+"""
+Set based deletion of recipes and accounts.
+
+Django's deletion collector loads every related row into memory and
+sends signals for each image before deleting. These helpers instead issue
+one DELETE per table, children first, and schedule the file cleanup the
+image signals would have done for the files the deleted rows referenced.
+"""
+
+import os
+
+from django.db import router, transaction
+
+from .models import (
+    Ingredient,
+    IngredientImage,
+    Recipe,
+    RecipeImage,
+    RecipeImageUpload,
+    RecipeSimilarity,
+    Tag,
+)
+from .signals import delete_image_on_commit
+from .similarity import refresh_similarities_on_commit
+from .stats import invalidate_stats_on_commit
+
+
+def raw_delete(queryset):
+    """Delete the rows of a queryset with a single DELETE statement."""
+    return queryset._raw_delete(router.db_for_write(queryset.model))
+
+
+def _delete_images(queryset):
+    """Delete image rows and their files once the transaction commits."""
+    files = queryset.values_list("image", "renditions").distinct()
+    for name, renditions in files:
+        delete_image_on_commit(name, renditions)
+    raw_delete(queryset)
+
+
+def _delete_uploads(queryset):
+    """Delete resumable uploads and their partial files on commit."""
+    paths = [upload.path for upload in queryset.only("id")]
+    raw_delete(queryset)
+
+    def remove_partial_files():
+        for path in paths:
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+
+    transaction.on_commit(remove_partial_files)
+
+
+def _delete_recipe_rows(**lookup):
+    """Delete the recipes matching a lookup and the rows pointing at them."""
+    related = {f"recipe__{key}": value for key, value in lookup.items()}
+    listed = {f"similar__{key}": value for key, value in lookup.items()}
+    # Recipes listing deleted ones as similar get new neighbours.
+    refresh_similarities_on_commit(
+        RecipeSimilarity.objects.filter(**listed).exclude(
+            **related).values_list("recipe_id", flat=True))
+    raw_delete(RecipeSimilarity.objects.filter(**related))
+    raw_delete(RecipeSimilarity.objects.filter(**listed))
+    raw_delete(Recipe.tags.through.objects.filter(**related))
+    raw_delete(Recipe.ingredients.through.objects.filter(**related))
+    _delete_images(RecipeImage.objects.filter(**related))
+    _delete_uploads(RecipeImageUpload.objects.filter(**related))
+    return raw_delete(Recipe.objects.filter(**lookup))
+
+
+def delete_recipes(recipes):
+    """
+    Delete a queryset of recipes with their tag and ingredient links,
+    images and uploads. Return the number of recipes deleted.
+    """
+    with transaction.atomic():
+        rows = list(recipes.values_list("id", "user_id"))
+        invalidate_stats_on_commit(user_id for _, user_id in rows)
+        return _delete_recipe_rows(id__in=[recipe_id for recipe_id, _ in rows])
+
+
+def delete_accounts(users):
+    """
+    Delete a queryset of users with their recipes, tags and ingredients.
+    The remaining small relations, such as tokens and admin log entries,
+    are left to Django's collector.
+    """
+    with transaction.atomic():
+        user_ids = list(users.values_list("id", flat=True))
+        _delete_recipe_rows(user_id__in=user_ids)
+        raw_delete(Recipe.tags.through.objects.filter(
+            tag__user_id__in=user_ids))
+        raw_delete(Recipe.ingredients.through.objects.filter(
+            ingredient__user_id__in=user_ids))
+        _delete_images(IngredientImage.objects.filter(
+            ingredient__user_id__in=user_ids))
+        raw_delete(Tag.objects.filter(user_id__in=user_ids))
+        raw_delete(Ingredient.objects.filter(user_id__in=user_ids))
+        users.model.objects.filter(id__in=user_ids).delete()
+
+
+def count_account_objects(users):
+    """Return the number of recipe app objects owned by the users."""
+    return {
+        model: model.objects.filter(**{lookup: users}).count()
+        for model, lookup in [
+            (Recipe, "user__in"),
+            (Tag, "user__in"),
+            (Ingredient, "user__in"),
+            (RecipeImage, "recipe__user__in"),
+            (IngredientImage, "ingredient__user__in"),
+        ]
+    }
@@ -0,0 +1,126 @@
+"""Filter backends for the recipe app APIs."""
+
+from rest_framework.filters import BaseFilterBackend, OrderingFilter
+
+from .serializers import (
+    AttributeFilterSerializer,
+    RecipeRangeFilterSerializer,
+    RecipeRelationFilterSerializer,
+)
+
+
+class StableOrderingFilter(OrderingFilter):
+    """
+    Ordering filter breaking ties on the primary key, in the direction of
+    the last ordering field. Rows with equal values then keep a stable,
+    unique order, as cursor pagination requires, which the composite
+    (user, field, id) indexes return without sorting.
+    """
+
+    def get_ordering(self, request, queryset, view):
+        ordering = super().get_ordering(request, queryset, view)
+        if not ordering:
+            return ordering
+        last_field = ordering[-1]
+        if last_field.lstrip('-') in ('id', 'pk'):
+            return ordering
+        return [
+            *ordering,
+            '-id' if last_field.startswith('-') else 'id',
+        ]
+
+
+class RecipeRangeFilter(BaseFilterBackend):
+    """
+    Filter recipes by price and preparation time ranges. The bounds are
+    validated and a bad value is answered with a 400 response.
+    """
+
+    # Query parameter: (model lookup, schema type, description)
+    ranges = {
+        'price_min': ('price__gte', 'number', 'Lowest recipe price'),
+        'price_max': ('price__lte', 'number', 'Highest recipe price'),
+        'time_min': (
+            'time_minutes__gte', 'integer', 'Shortest time in minutes'),
+        'time_max': (
+            'time_minutes__lte', 'integer', 'Longest time in minutes'),
+    }
+
+    def filter_queryset(self, request, queryset, view):
+        serializer = RecipeRangeFilterSerializer(data=request.query_params)
+        serializer.is_valid(raise_exception=True)
+        return queryset.filter(**{
+            self.ranges[param][0]: value
+            for param, value in serializer.validated_data.items()
+        })
+
+    def get_schema_operation_parameters(self, view):
+        return [
+            {
+                'name': param,
+                'required': False,
+                'in': 'query',
+                'description': description,
+                'schema': {'type': schema_type},
+            }
+            for param, (_, schema_type, description) in self.ranges.items()
+        ]
+
+
+class RecipeRelationFilter(BaseFilterBackend):
+    """
+    Filter recipes by the IDs of their tags and ingredients, given as
+    comma separated lists. Each list is sent to the database as a single
+    array parameter, so the query does not grow with the list.
+    """
+
+    relations = {
+        'tags': 'Comma-separated list of tag IDs',
+        'ingredients': 'Comma-separated list of ingredient IDs',
+    }
+
+    def filter_queryset(self, request, queryset, view):
+        serializer = RecipeRelationFilterSerializer(
+            data=request.query_params)
+        serializer.is_valid(raise_exception=True)
+        filtered = False
+        for relation, ids in serializer.validated_data.items():
+            if ids:
+                queryset = queryset.filter(**{f'{relation}__id__any': ids})
+                filtered = True
+        # Recipes matching several of the IDs are joined more than once.
+        return queryset.distinct() if filtered else queryset
+
+    def get_schema_operation_parameters(self, view):
+        return [
+            {
+                'name': relation,
+                'required': False,
+                'in': 'query',
+                'description': description,
+                'schema': {'type': 'string'},
+            }
+            for relation, description in self.relations.items()
+        ]
+
+
+class AssignedOnlyFilter(BaseFilterBackend):
+    """Filter tags or ingredients by those assigned to a recipe."""
+
+    def filter_queryset(self, request, queryset, view):
+        serializer = AttributeFilterSerializer(data=request.query_params)
+        serializer.is_valid(raise_exception=True)
+        if serializer.validated_data.get('assigned_only'):
+            queryset = queryset.filter(recipe_count__gt=0)
+        return queryset
+
+    def get_schema_operation_parameters(self, view):
+        return [
+            {
+                'name': 'assigned_only',
+                'required': False,
+                'in': 'query',
+                'description': 'Filter items by those assigned to a recipe.',
+                'schema': {'type': 'integer', 'enum': [0, 1]},
+            },
+        ]
@@ -0,0 +1,178 @@
+"""Image processing for recipe and ingredient images."""
+
+import base64
+from io import BytesIO
+import os
+import re
+import tempfile
+
+from django.conf import settings
+from django.core.exceptions import ValidationError
+from django.core.files.base import ContentFile
+from django.core.files.uploadedfile import UploadedFile
+
+from PIL import Image, ImageOps
+
+from .storage import file_content_hash
+
+
+# Largest decoded image accepted, about a 6000x4000 photo.
+MAX_IMAGE_PIXELS = 24_000_000
+
+EXIF_ORIENTATION = 0x0112
+
+# Widths of the resized copies generated for responsive images.
+RENDITION_WIDTHS = (160, 320, 640, 1280)
+RENDITION_REGEX = re.compile(r"^(?P<source>.+)_w\d+\.(jpg|png)$")
+
+# Largest side of the blurred placeholder inlined in API responses.
+PLACEHOLDER_SIZE = 16
+
+
+def open_image_header(file):
+    """
+    Open an image reading only its header and check its dimensions, so
+    decompression bombs are rejected before any pixel is decoded.
+    Return None if the file is not an image Pillow understands.
+    """
+    file.seek(0)
+    try:
+        image = Image.open(file)
+    except Image.DecompressionBombError:
+        raise ValidationError("The image has too many pixels.")
+    except (OSError, SyntaxError, ValueError):
+        return None
+    width, height = image.size
+    if width * height > MAX_IMAGE_PIXELS:
+        raise ValidationError(
+            f"The image is {width}x{height} pixels but cannot have more "
+            f"than {MAX_IMAGE_PIXELS} pixels.")
+    return image
+
+
+def strip_metadata(file):
+    """
+    Return the uploaded image re-encoded without EXIF metadata, applying
+    its orientation tag first. Images without EXIF data are returned
+    untouched. The output spills to disk once it outgrows the in-memory
+    upload limit, so memory use stays bounded by the pixel limit.
+    """
+    image = open_image_header(file)
+    if (
+        image is None or
+        getattr(image, "is_animated", False) or
+        not image.getexif()
+    ):
+        file.seek(0)
+        return file
+
+    # Encoders copy EXIF from the save options only, leave it empty.
+    options = {"exif": b""}
+    icc_profile = image.info.get("icc_profile")
+    if icc_profile:
+        options["icc_profile"] = icc_profile
+    # Pillow reads multi picture JPEGs from phones as MPO but cannot write it.
+    image_format = "JPEG" if image.format == "MPO" else image.format
+    if image.getexif().get(EXIF_ORIENTATION, 1) == 1:
+        output_image = image
+        if image_format == "JPEG":
+            # Reuse the original quantization tables, pixels are unchanged.
+            options["quality"] = "keep"
+            options["subsampling"] = "keep"
+    else:
+        output_image = ImageOps.exif_transpose(image)
+        if image_format == "JPEG":
+            options["quality"] = 90
+    output = tempfile.SpooledTemporaryFile(
+        max_size=settings.FILE_UPLOAD_MAX_MEMORY_SIZE)
+    try:
+        output_image.save(output, format=image_format, **options)
+    except (KeyError, OSError, ValueError):
+        # Formats Pillow cannot write are stored as uploaded.
+        output.close()
+        file.seek(0)
+        return file
+    size = output.tell()
+    output.seek(0)
+
+    stripped = UploadedFile(
+        file=output,
+        name=file.name,
+        content_type=file.content_type,
+        size=size,
+        charset=file.charset,
+        content_type_extra=file.content_type_extra,
+    )
+    stripped.content_hash = file_content_hash(stripped)
+    stripped.seek(0)
+    file.close()
+    return stripped
+
+
+def rendition_source_prefix(name):
+    """
+    Return the name of the image a rendition was generated from, without
+    its extension, or None if the name is not a rendition.
+    """
+    match = RENDITION_REGEX.match(name)
+    return match.group("source") if match else None
+
+
+def _encode(image, image_format):
+    """Return the bytes of an image encoded in the given format."""
+    output = BytesIO()
+    if image_format == "JPEG":
+        image.save(output, format="JPEG", quality=80, optimize=True)
+    else:
+        image.save(output, format=image_format, optimize=True)
+    return output.getvalue()
+
+
+def populate_image_metadata(instance):
+    """
+    Store the dimensions, byte size, a base64 placeholder and resized
+    renditions of a stored recipe or ingredient image on the instance.
+    JPEGs are decoded at the smallest scale covering the largest rendition.
+    """
+    name = instance.image.name
+    storage = instance.image.storage
+    with storage.open(name) as file:
+        image = open_image_header(file)
+        if image is None:
+            return
+        width, height = image.size
+        instance.width, instance.height = width, height
+        instance.size = storage.size(name)
+
+        has_alpha = (
+            image.mode in ("RGBA", "LA", "PA") or
+            "transparency" in image.info
+        )
+        mode, image_format, extension = (
+            ("RGBA", "PNG", ".png") if has_alpha else ("RGB", "JPEG", ".jpg"))
+        widths = [size for size in RENDITION_WIDTHS if size < width]
+        largest = max(widths, default=width)
+        image.draft(mode, (largest, round(height * largest / width)))
+        image = image.convert(mode)
+
+        renditions = []
+        for rendition_width in widths:
+            rendition_height = max(1, round(height * rendition_width / width))
+            rendition = image.resize(
+                (rendition_width, rendition_height),
+                Image.LANCZOS, reducing_gap=3.0)
+            rendition_name = storage.save_derived(
+                f"{os.path.splitext(name)[0]}_w{rendition_width}{extension}",
+                ContentFile(_encode(rendition, image_format)))
+            renditions.append({
+                "width": rendition_width,
+                "height": rendition_height,
+                "name": rendition_name,
+            })
+        instance.renditions = renditions
+
+        image.thumbnail((PLACEHOLDER_SIZE, PLACEHOLDER_SIZE))
+        placeholder = base64.b64encode(_encode(image, image_format))
+        instance.placeholder = (
+            f"data:image/{image_format.lower()};base64,"
+            f"{placeholder.decode()}")
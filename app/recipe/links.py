@@ -0,0 +1,129 @@
+"""Set based changes to the links between recipes and their attributes."""
+
+from django.db import connection, transaction
+
+from .similarity import refresh_similarities_on_commit
+from .stats import invalidate_stats_on_commit
+
+
+def _extra_fields(through, field):
+    """
+    Return the fields of a link table besides its key, recipe and
+    attribute, such as the quantity and position of recipe ingredients.
+    """
+    return [
+        link_field for link_field in through._meta.concrete_fields
+        if not link_field.primary_key and
+        link_field.name not in ("recipe", field)
+    ]
+
+
+def attach_recipes(through, field, attribute, recipes):
+    """
+    Link a tag or ingredient to a queryset of recipes with one INSERT ...
+    SELECT, skipping links which already exist. Return the number of links
+    created.
+    """
+    quote = connection.ops.quote_name
+    table = quote(through._meta.db_table)
+    recipe_column = through._meta.get_field("recipe").column
+    attribute_column = through._meta.get_field(field).column
+    columns, values, value_params = [], [], []
+    for extra_field in _extra_fields(through, field):
+        columns.append(f", {quote(extra_field.column)}")
+        if extra_field.name == "position":
+            # Attached ingredients go after the existing ones.
+            values.append(
+                f", (SELECT COALESCE(MAX(links.{quote(extra_field.column)})"
+                f" + 1, 0) FROM {table} AS links "
+                f"WHERE links.{quote(recipe_column)} = recipes.id)")
+        else:
+            values.append(", %s")
+            value_params.append(extra_field.get_db_prep_save(
+                extra_field.get_default(), connection))
+    query, params = recipes.values("id").query.sql_with_params()
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f"INSERT INTO {table} "
+            f"({quote(recipe_column)}, {quote(attribute_column)}"
+            f"{''.join(columns)}) "
+            f"SELECT recipes.id, %s{''.join(values)} "
+            f"FROM ({query}) AS recipes "
+            f"ON CONFLICT DO NOTHING "
+            f"RETURNING {quote(recipe_column)}",
+            [attribute.id, *value_params, *params],
+        )
+        recipe_ids = [row[0] for row in cursor.fetchall()]
+    refresh_similarities_on_commit(recipe_ids)
+    invalidate_stats_on_commit([attribute.user_id])
+    return len(recipe_ids)
+
+
+def detach_recipes(through, field, attribute, recipes):
+    """
+    Unlink a tag or ingredient from a queryset of recipes with one DELETE.
+    Return the number of links removed.
+    """
+    quote = connection.ops.quote_name
+    recipe_column = through._meta.get_field("recipe").column
+    attribute_column = through._meta.get_field(field).column
+    query, params = recipes.values("id").query.sql_with_params()
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f"DELETE FROM {quote(through._meta.db_table)} "
+            f"WHERE {quote(attribute_column)} = %s "
+            f"AND {quote(recipe_column)} IN ({query}) "
+            f"RETURNING {quote(recipe_column)}",
+            [attribute.id, *params],
+        )
+        recipe_ids = [row[0] for row in cursor.fetchall()]
+    refresh_similarities_on_commit(recipe_ids)
+    invalidate_stats_on_commit([attribute.user_id])
+    return len(recipe_ids)
+
+
+def merge_attributes(through, field, target, sources):
+    """
+    Merge tags or ingredients into a target and delete them. Their recipe
+    links are moved with one INSERT ... SELECT skipping links the target
+    already has, and rows pointing at them, such as ingredient images, are
+    repointed at the target. Return the number of merged items.
+    """
+    quote = connection.ops.quote_name
+    recipe_column = through._meta.get_field("recipe").column
+    attribute_column = through._meta.get_field(field).column
+    with transaction.atomic():
+        source_ids = list(
+            sources.exclude(pk=target.pk).values_list("id", flat=True))
+        if not source_ids:
+            return 0
+        with connection.cursor() as cursor:
+            # Merged links keep their quantities and positions.
+            extra_columns = "".join(
+                f", {quote(extra_field.column)}"
+                for extra_field in _extra_fields(through, field))
+            cursor.execute(
+                f"INSERT INTO {quote(through._meta.db_table)} "
+                f"({quote(recipe_column)}, {quote(attribute_column)}"
+                f"{extra_columns}) "
+                f"SELECT {quote(recipe_column)}, %s{extra_columns} "
+                f"FROM {quote(through._meta.db_table)} "
+                f"WHERE {quote(attribute_column)} = ANY(%s) "
+                f"ON CONFLICT DO NOTHING",
+                [target.id, source_ids],
+            )
+            cursor.execute(
+                f"DELETE FROM {quote(through._meta.db_table)} "
+                f"WHERE {quote(attribute_column)} = ANY(%s) "
+                f"RETURNING {quote(recipe_column)}",
+                [source_ids],
+            )
+            refresh_similarities_on_commit(
+                row[0] for row in cursor.fetchall())
+        for relation in target._meta.related_objects:
+            if relation.one_to_many:
+                relation.related_model.objects.filter(**{
+                    f"{relation.field.name}__in": source_ids,
+                }).update(**{relation.field.name: target})
+        target._meta.model.objects.filter(id__in=source_ids).delete()
+        return len(source_ids)
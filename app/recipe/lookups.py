@@ -0,0 +1,26 @@
+"""Custom query lookups for the recipe app."""
+
+from django.db.models import IntegerField, Lookup
+
+
+@IntegerField.register_lookup
+class Any(Lookup):
+    """
+    Match any value of a list sent as one array parameter, written as
+    field = ANY(%s) instead of an IN clause with a parameter per value.
+    The SQL stays the same whatever the length of the list.
+    """
+
+    lookup_name = 'any'
+    prepare_rhs = False
+
+    def get_db_prep_lookup(self, value, connection):
+        return ('%s', [[
+            self.lhs.output_field.get_db_prep_value(item, connection)
+            for item in value
+        ]])
+
+    def as_sql(self, compiler, connection):
+        lhs, lhs_params = self.process_lhs(compiler, connection)
+        rhs, rhs_params = self.process_rhs(compiler, connection)
+        return f'{lhs} = ANY({rhs})', [*lhs_params, *rhs_params]
@@ -0,0 +1,101 @@
+# time scaling and converting the ingredient lines of many recipes
+import time
+import uuid
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+
+from recipe.models import Ingredient, Recipe, RecipeIngredient
+from recipe.scaling import CONVERSIONS, METRIC, scale_recipes
+from recipe.serializers import MAX_BULK_IDS
+
+
+# Units of the generated lines: the converted ones and a few kept as is.
+UNITS = [*CONVERSIONS[METRIC], "g", "ml", "pinch", ""]
+
+
+class Command(BaseCommand):
+    """
+    Command to fill a temporary account with ingredient lines and time
+    scaling them to another number of servings in metric units, as the
+    recipe scale endpoint does for the largest batch of recipes.
+
+    Everything runs inside a transaction which is rolled back, so the
+    benchmark leaves no data behind.
+    """
+
+    help = "Benchmark scaling the ingredient lines of many recipes."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--lines", type=int, default=10_000,
+            help="Number of ingredient lines generated.")
+        parser.add_argument(
+            "--recipes", type=int, default=MAX_BULK_IDS,
+            help="Number of recipes the lines are spread over.")
+        parser.add_argument(
+            "--repeat", type=int, default=5,
+            help="Number of times the scaling is timed.")
+
+    def handle(self, *args, **options):
+        """ Entry point for command. """
+        with transaction.atomic():
+            user = get_user_model().objects.create_user(
+                f"benchmark-{uuid.uuid4().hex}@example.com")
+            recipe_ids = self._generate_lines(
+                user, options["lines"], options["recipes"])
+
+            timings = []
+            for _ in range(options["repeat"]):
+                start = time.perf_counter()
+                recipes = scale_recipes(
+                    user, recipe_ids, servings=6, system=METRIC)
+                timings.append(time.perf_counter() - start)
+            count = sum(len(recipe["ingredients"]) for recipe in recipes)
+            self.stdout.write(
+                f"{count} ingredient lines of {len(recipes)} recipes, "
+                f"best of {options['repeat']}: "
+                f"{min(timings) * 1000:.1f} ms")
+
+            transaction.set_rollback(True)
+        self.stdout.write(self.style.SUCCESS("Benchmark data rolled back."))
+
+    def _generate_lines(self, user, lines, count):
+        """
+        Insert recipes sharing the lines evenly, then analyze. Return the
+        IDs of the recipes.
+        """
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f"INSERT INTO {Recipe._meta.db_table} "
+                "(user_id, title, time_minutes, servings, price, "
+                "description, link, created) "
+                "SELECT %s, 'Recipe ' || n, 30, 1 + n %% 8, 10, '', '', "
+                "now() FROM generate_series(1, %s) AS n RETURNING id",
+                [user.id, count],
+            )
+            recipe_ids = [row[0] for row in cursor.fetchall()]
+            per_recipe = -(-lines // count)
+            cursor.execute(
+                f"INSERT INTO {Ingredient._meta.db_table} (user_id, name) "
+                "SELECT %s, 'Ingredient ' || n "
+                "FROM generate_series(1, %s) AS n RETURNING id",
+                [user.id, per_recipe],
+            )
+            ingredient_ids = [row[0] for row in cursor.fetchall()]
+            cursor.execute(
+                f"INSERT INTO {RecipeIngredient._meta.db_table} "
+                "(recipe_id, ingredient_id, quantity, unit, position) "
+                "SELECT recipes[n / %s + 1], ingredients[n %% %s + 1], "
+                "(n %% 500) / 4.0, units[n %% %s + 1], n %% %s "
+                "FROM generate_series(0, %s - 1) AS n, "
+                "(SELECT %s::bigint[] AS recipes, "
+                "%s::bigint[] AS ingredients, %s::varchar[] AS units) "
+                "AS generated",
+                [per_recipe, per_recipe, len(UNITS), per_recipe, lines,
+                 recipe_ids, ingredient_ids, UNITS],
+            )
+            cursor.execute(f"ANALYZE {Recipe._meta.db_table}")
+            cursor.execute(f"ANALYZE {RecipeIngredient._meta.db_table}")
+        return recipe_ids
@@ -0,0 +1,21 @@
+# rebuild the index of the most similar recipes of every recipe
+from django.core.management.base import BaseCommand
+
+from recipe.similarity import SIMILAR_RECIPES, build_similarities
+
+
+class Command(BaseCommand):
+    """
+    Command to rebuild the similar recipes index from scratch, for
+    example after loading data without signals. Recipe changes keep it
+    up to date afterwards.
+    """
+
+    help = "Rebuild the similar recipes index."
+
+    def handle(self, *args, **options):
+        """ Entry point for command. """
+        count = build_similarities()
+        self.stdout.write(self.style.SUCCESS(
+            f"Stored {count} similarities, up to {SIMILAR_RECIPES} "
+            f"per recipe."))
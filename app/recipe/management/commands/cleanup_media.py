@@ -0,0 +1,191 @@
+# delete uploaded files no image references anymore
+from datetime import timedelta
+import os
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from recipe.images import rendition_source_prefix
+from recipe.models import (
+    IngredientImage,
+    RecipeImage,
+    RecipeImageUpload,
+    image_storage,
+)
+
+
+UPLOADS_DIR = "uploads"
+
+
+def iter_directories(path):
+    """
+    Yield each directory under a path with the file entries it holds. The
+    tree is walked one directory at a time instead of being listed upfront.
+    """
+    stack = [path]
+    while stack:
+        directory = stack.pop()
+        files = []
+        try:
+            with os.scandir(directory) as entries:
+                for entry in entries:
+                    if entry.is_dir(follow_symlinks=False):
+                        stack.append(entry.path)
+                    elif entry.is_file(follow_symlinks=False):
+                        files.append(entry)
+        except FileNotFoundError:
+            continue
+        if files:
+            yield directory, files
+
+
+def iter_batches(path, batch_size):
+    """
+    Yield lists of file entries of about the batch size. A directory is
+    never split, so renditions are checked in the batch of their source.
+    """
+    batch = []
+    for _, files in iter_directories(path):
+        batch.extend(files)
+        if len(batch) >= batch_size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def referenced_names(names):
+    """Return the names among the given ones that an image references."""
+    referenced = set()
+    for model in [RecipeImage, IngredientImage]:
+        referenced.update(model.objects.filter(
+            image__in=names).values_list("image", flat=True))
+    return referenced
+
+
+def is_source_referenced(source):
+    """Return true if an image uses a file with the given name stem."""
+    return any(
+        model.objects.filter(image__startswith=f"{source}.").exists() or
+        model.objects.filter(image=source).exists()
+        for model in [RecipeImage, IngredientImage]
+    )
+
+
+class Command(BaseCommand):
+    """
+    Command to delete files under uploads/ which no recipe or ingredient
+    image references, along with abandoned resumable uploads.
+
+    Files are checked against the database in batches while the directory
+    tree is walked, so memory use does not grow with the number of files.
+    Recently modified files are skipped, they may belong to an upload
+    whose row has not been committed yet.
+    """
+
+    help = "Delete orphaned media files and abandoned uploads."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--dry-run", action="store_true",
+            help="Report orphaned files without deleting them.")
+        parser.add_argument(
+            "--batch-size", type=int, default=1000,
+            help="Number of files checked per database query.")
+        parser.add_argument(
+            "--min-age", type=int, default=3600,
+            help="Seconds since a file was modified before it can be deleted.")
+        parser.add_argument(
+            "--upload-max-age", type=int, default=24,
+            help="Hours after which unfinished resumable uploads are deleted.")
+
+    def handle(self, *args, **options):
+        """ Entry point for command. """
+        self.dry_run = options["dry_run"]
+        cutoff = time.time() - options["min_age"]
+        scanned = orphaned = freed = 0
+        for batch in iter_batches(
+            image_storage.path(UPLOADS_DIR), options["batch_size"]
+        ):
+            scanned += len(batch)
+            for name, size in self._find_orphans(batch, cutoff):
+                orphaned += 1
+                freed += size
+                self._delete(name)
+
+        uploads = self._cleanup_uploads(
+            cutoff, timezone.now() - timedelta(
+                hours=options["upload_max_age"]))
+
+        verb = "Would delete" if self.dry_run else "Deleted"
+        self.stdout.write(self.style.SUCCESS(
+            f"Scanned {scanned} files. {verb} {orphaned} orphaned files "
+            f"({freed} bytes) and {uploads} abandoned uploads."))
+
+    def _delete(self, name):
+        """Delete a media file, or only report it on a dry run."""
+        if self.dry_run:
+            self.stdout.write(f"Would delete {name}")
+        else:
+            image_storage.delete(name)
+
+    def _find_orphans(self, batch, cutoff):
+        """Return the names and sizes of unreferenced files in a batch."""
+        files = {}
+        for entry in batch:
+            name = os.path.relpath(
+                entry.path, image_storage.location).replace(os.sep, "/")
+            files[name] = entry.stat(follow_symlinks=False)
+
+        sources = [
+            name for name in files if rendition_source_prefix(name) is None]
+        referenced = referenced_names(sources)
+        referenced_stems = {os.path.splitext(name)[0] for name in referenced}
+        source_stems = {os.path.splitext(name)[0] for name in sources}
+
+        orphans = []
+        for name, stat in files.items():
+            if stat.st_mtime > cutoff or name in referenced:
+                continue
+            source = rendition_source_prefix(name)
+            if source is not None and (
+                source in referenced_stems or
+                # The source lives elsewhere, e.g. it was never migrated.
+                source not in source_stems and is_source_referenced(source)
+            ):
+                continue
+            orphans.append((name, stat.st_size))
+        return orphans
+
+    def _cleanup_uploads(self, cutoff, created_before):
+        """
+        Delete resumable uploads started before a date and partial files
+        left without an upload, returning how many were found.
+        """
+        stale = RecipeImageUpload.objects.filter(created__lt=created_before)
+        paths = {upload.path for upload in stale}
+        if not self.dry_run:
+            stale.delete()
+
+        known = {
+            upload.path for upload in RecipeImageUpload.objects.exclude(
+                created__lt=created_before)}
+        for _, files in iter_directories(settings.CHUNKED_UPLOAD_ROOT):
+            for entry in files:
+                if (
+                    entry.path not in known and
+                    entry.stat(follow_symlinks=False).st_mtime <= cutoff
+                ):
+                    paths.add(entry.path)
+
+        for path in sorted(paths):
+            if self.dry_run:
+                self.stdout.write(f"Would delete {path}")
+                continue
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+        return len(paths)
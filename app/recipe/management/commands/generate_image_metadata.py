@@ -0,0 +1,65 @@
+# fill in the metadata of images stored before it was computed on upload
+from django.core.management.base import BaseCommand
+
+from recipe.images import populate_image_metadata
+from recipe.models import (
+    IngredientImage,
+    RecipeImage,
+)
+
+
+METADATA_FIELDS = ["width", "height", "size", "placeholder", "renditions"]
+
+
+class Command(BaseCommand):
+    """
+    Command to compute the dimensions, placeholder and renditions of
+    images uploaded before they were stored with the image.
+
+    Only rows without dimensions are processed, so the command can be
+    interrupted and run again.
+    """
+
+    help = "Generate metadata and renditions for existing images."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--batch-size", type=int, default=100,
+            help="Number of image rows updated per query.")
+
+    def handle(self, *args, **options):
+        """ Entry point for command. """
+        generated = missing = 0
+        for model in [RecipeImage, IngredientImage]:
+            counts = self._generate_model(model, options["batch_size"])
+            generated += counts[0]
+            missing += counts[1]
+
+        if missing:
+            self.stdout.write(self.style.WARNING(
+                f"{missing} images have no readable file."))
+        self.stdout.write(self.style.SUCCESS(
+            f"Generated metadata for {generated} images."))
+
+    def _generate_model(self, model, batch_size):
+        """Generate the metadata of one model batch by batch."""
+        queryset = model.objects.exclude(image="").filter(
+            width__isnull=True).order_by("id")
+        generated = missing = 0
+        last_id = 0
+        while True:
+            batch = list(queryset.filter(id__gt=last_id)[:batch_size])
+            if not batch:
+                return generated, missing
+            last_id = batch[-1].id
+
+            updated = []
+            for image in batch:
+                if image.image.storage.exists(image.image.name):
+                    populate_image_metadata(image)
+                if image.width is None:
+                    missing += 1
+                    continue
+                updated.append(image)
+            model.objects.bulk_update(updated, METADATA_FIELDS)
+            generated += len(updated)
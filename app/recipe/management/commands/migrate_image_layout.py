@@ -0,0 +1,111 @@
+# move images into the sharded content addressed layout
+from concurrent.futures import ThreadPoolExecutor
+import os
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from recipe.models import (
+    INGREDIENT_IMAGE_DIR,
+    RECIPE_IMAGE_DIR,
+    IngredientImage,
+    RecipeImage,
+    image_storage,
+)
+from recipe.signals import is_image_referenced
+
+
+def layout_regex(directory):
+    """Return a regex matching names in the current image layout."""
+    return (
+        rf'^{directory}/[0-9a-f]{{2}}/[0-9a-f]{{2}}/[0-9a-f]{{64}}'
+        r'(\.[^/]*)?$'
+    )
+
+
+def copy_image(name, directory):
+    """
+    Copy an image into the content addressed layout and return its new
+    name, or None if the source file is missing.
+    """
+    if not image_storage.exists(name):
+        return None
+    extension = os.path.splitext(name)[1]
+    with image_storage.open(name) as content:
+        return image_storage.save(
+            os.path.join(directory, f"image{extension}"), content)
+
+
+class Command(BaseCommand):
+    """
+    Command to copy images stored in an old layout into the sharded
+    content addressed layout and point their rows at the copies.
+
+    Rows are processed in batches and updated once their files have been
+    copied, so an interrupted run resumes where it stopped.
+    """
+
+    help = "Move recipe and ingredient images into the sharded layout."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--batch-size", type=int, default=500,
+            help="Number of image rows updated per transaction.")
+        parser.add_argument(
+            "--workers", type=int, default=8,
+            help="Number of files copied in parallel.")
+        parser.add_argument(
+            "--delete-source", action="store_true",
+            help="Delete old files once no image references them.")
+
+    def handle(self, *args, **options):
+        """ Entry point for command. """
+        migrated = missing = 0
+        with ThreadPoolExecutor(max_workers=options["workers"]) as pool:
+            for model, directory in [
+                (RecipeImage, RECIPE_IMAGE_DIR),
+                (IngredientImage, INGREDIENT_IMAGE_DIR),
+            ]:
+                counts = self._migrate_model(
+                    model, directory, pool, options)
+                migrated += counts[0]
+                missing += counts[1]
+
+        if missing:
+            self.stdout.write(self.style.WARNING(
+                f"{missing} images have no file and were left unchanged."))
+        self.stdout.write(self.style.SUCCESS(
+            f"Migrated {migrated} images."))
+
+    def _migrate_model(self, model, directory, pool, options):
+        """Migrate the images of one model batch by batch."""
+        queryset = model.objects.exclude(image="").exclude(
+            image__regex=layout_regex(directory)).order_by("id")
+        migrated = missing = 0
+        last_id = 0
+        while True:
+            batch = list(queryset.filter(id__gt=last_id).only(
+                "id", "image")[:options["batch_size"]])
+            if not batch:
+                return migrated, missing
+            last_id = batch[-1].id
+
+            old_names = [image.image.name for image in batch]
+            new_names = pool.map(
+                copy_image, old_names, [directory] * len(batch))
+            updated = []
+            for image, new_name in zip(batch, new_names):
+                if new_name is None:
+                    missing += 1
+                    continue
+                image.image.name = new_name
+                updated.append(image)
+            with transaction.atomic():
+                model.objects.bulk_update(updated, ["image"])
+            migrated += len(updated)
+
+            if options["delete_source"]:
+                for name in set(old_names):
+                    if not is_image_referenced(name):
+                        image_storage.delete(name)
+            self.stdout.write(f"{model.__name__}: {migrated} migrated...")
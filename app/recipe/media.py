@@ -0,0 +1,77 @@
+"""Helpers for serving uploaded recipe and ingredient images."""
+
+import time
+
+from django.core import signing
+from django.utils import baseconv
+from django.db.models import Q
+
+from .images import rendition_source_prefix
+from .models import (
+    IngredientImage,
+    RecipeImage,
+)
+
+
+# Seconds a signed media URL stays valid at least after it was issued.
+MEDIA_URL_MAX_AGE = 24 * 60 * 60
+
+
+class WindowTimestampSigner(signing.TimestampSigner):
+    """
+    Timestamp signer rounding the time down to the start of a window of
+    MEDIA_URL_MAX_AGE seconds, so a file gets the same signed URL for the
+    whole window and browsers and proxies can reuse their cached copy.
+    """
+
+    def timestamp(self):
+        now = int(time.time())
+        return baseconv.base62.encode(
+            now // MEDIA_URL_MAX_AGE * MEDIA_URL_MAX_AGE)
+
+
+SIGNER = WindowTimestampSigner(salt="recipe.media")
+
+
+def sign_media_url(url, name):
+    """
+    Append a signature for the media file name to its URL, with the start
+    of the window it was issued in.
+    """
+    signature = SIGNER.sign(name)[len(name) + len(SIGNER.sep):]
+    return f"{url}?sig={signature}"
+
+
+def has_valid_signature(name, signature):
+    """
+    Check that the signature was issued for the media file name and has
+    not expired. Expiry counts from the end of the window the signature
+    was issued in, so it lasts at least MEDIA_URL_MAX_AGE.
+    """
+    try:
+        SIGNER.unsign(
+            f"{name}{SIGNER.sep}{signature}", max_age=2 * MEDIA_URL_MAX_AGE)
+    except signing.BadSignature:
+        return False
+    return True
+
+
+def user_can_access_media(user, name):
+    """
+    Return true if the user owns the recipe or ingredient the image
+    belongs to. Staff can view every image from the admin site.
+    """
+    if not user.is_authenticated:
+        return False
+    if user.is_staff:
+        return True
+    images = Q(image=name)
+    source = rendition_source_prefix(name)
+    if source is not None:
+        # Renditions share the name of their source image up to its extension.
+        images |= Q(image=source) | Q(image__startswith=f"{source}.")
+    return (
+        RecipeImage.objects.filter(images, recipe__user=user).exists() or
+        IngredientImage.objects.filter(
+            images, ingredient__user=user).exists()
+    )
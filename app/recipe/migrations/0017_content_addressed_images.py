@@ -0,0 +1,26 @@
+# Generated by Django 3.2.25 on 2026-10-19 09:33
+
+from django.db import migrations, models
+import recipe.models
+import recipe.storage
+import recipe.validators
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipe', '0016_index_image_names'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='ingredientimage',
+            name='image',
+            field=models.ImageField(db_index=True, max_length=255, storage=recipe.storage.ContentAddressedStorage(), upload_to=recipe.models.ingredient_image_file_path, validators=[recipe.validators.validate_file_size]),
+        ),
+        migrations.AlterField(
+            model_name='recipeimage',
+            name='image',
+            field=models.ImageField(db_index=True, max_length=255, storage=recipe.storage.ContentAddressedStorage(), upload_to=recipe.models.recipe_image_file_path, validators=[recipe.validators.validate_file_size]),
+        ),
+    ]
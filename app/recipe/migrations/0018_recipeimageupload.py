@@ -0,0 +1,26 @@
+# Generated by Django 3.2.25 on 2026-10-19 09:40
+
+from django.db import migrations, models
+import django.db.models.deletion
+import uuid
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipe', '0017_content_addressed_images'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RecipeImageUpload',
+            fields=[
+                ('id', models.UUIDField(default=uuid.uuid4, editable=False, primary_key=True, serialize=False)),
+                ('filename', models.CharField(max_length=255)),
+                ('size', models.PositiveIntegerField()),
+                ('offset', models.PositiveIntegerField(default=0)),
+                ('created', models.DateTimeField(auto_now_add=True)),
+                ('recipe', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='image_uploads', to='recipe.recipe')),
+            ],
+        ),
+    ]
@@ -0,0 +1,69 @@
+from django.db import migrations
+
+
+def merge_duplicates_sql(table, through, column, repoint=""):
+    """
+    Return SQL merging names of a user which only differ by case or
+    surrounding whitespace into the oldest one and trimming names. The
+    repoint statements move other rows from duplicates to the kept row.
+    """
+    duplicates = f"""
+        SELECT id, keep_id FROM (
+            SELECT id, MIN(id) OVER (
+                PARTITION BY user_id, UPPER(TRIM(name))) AS keep_id
+            FROM {table}
+        ) AS names WHERE id <> keep_id
+    """
+    return f"""
+        CREATE TEMPORARY TABLE {table}_duplicates ON COMMIT DROP AS
+            {duplicates};
+        INSERT INTO {through} (recipe_id, {column})
+            SELECT links.recipe_id, duplicates.keep_id
+            FROM {through} AS links
+            JOIN {table}_duplicates AS duplicates
+                ON links.{column} = duplicates.id
+            ON CONFLICT DO NOTHING;
+        DELETE FROM {through} WHERE {column} IN (
+            SELECT id FROM {table}_duplicates);
+        {repoint}
+        DELETE FROM {table} WHERE id IN (SELECT id FROM {table}_duplicates);
+        UPDATE {table} SET name = TRIM(name) WHERE name <> TRIM(name);
+        -- Run deferred foreign key checks so the table can be indexed.
+        SET CONSTRAINTS ALL IMMEDIATE;
+    """
+
+
+MERGE_TAGS = merge_duplicates_sql(
+    "recipe_tag", "recipe_recipe_tags", "tag_id")
+
+MERGE_INGREDIENTS = merge_duplicates_sql(
+    "recipe_ingredient", "recipe_recipe_ingredients", "ingredient_id",
+    repoint="""
+        UPDATE recipe_ingredientimage AS images
+            SET ingredient_id = duplicates.keep_id
+            FROM recipe_ingredient_duplicates AS duplicates
+            WHERE images.ingredient_id = duplicates.id;
+    """,
+)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipe', '0019_image_metadata'),
+    ]
+
+    operations = [
+        migrations.RunSQL(MERGE_TAGS, migrations.RunSQL.noop),
+        migrations.RunSQL(MERGE_INGREDIENTS, migrations.RunSQL.noop),
+        migrations.RunSQL(
+            'CREATE UNIQUE INDEX "recipe_tag_user_id_upper_name_uniq" '
+            'ON "recipe_tag" ("user_id", UPPER("name"));',
+            'DROP INDEX "recipe_tag_user_id_upper_name_uniq";',
+        ),
+        migrations.RunSQL(
+            'CREATE UNIQUE INDEX "recipe_ingredient_user_id_upper_name_uniq" '
+            'ON "recipe_ingredient" ("user_id", UPPER("name"));',
+            'DROP INDEX "recipe_ingredient_user_id_upper_name_uniq";',
+        ),
+    ]
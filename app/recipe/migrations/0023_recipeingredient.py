@@ -0,0 +1,102 @@
+import django.core.validators
+from django.db import migrations, models, transaction
+import django.db.models.deletion
+
+
+# Recipes whose ingredients are numbered per transaction.
+BATCH_SIZE = 1000
+
+# Columns are added without a table rewrite, as the defaults are constants,
+# and the check constraint is validated without blocking writes. The
+# defaults are then dropped, as Django's schema does not keep them.
+ADD_COLUMNS = """
+    ALTER TABLE "recipe_recipe_ingredients"
+        ADD COLUMN "quantity" numeric(10, 3) NULL,
+        ADD COLUMN "unit" varchar(32) NOT NULL DEFAULT '',
+        ADD COLUMN "position" integer NOT NULL DEFAULT 0;
+    ALTER TABLE "recipe_recipe_ingredients"
+        ALTER COLUMN "unit" DROP DEFAULT,
+        ALTER COLUMN "position" DROP DEFAULT,
+        ADD CONSTRAINT "recipe_recipe_ingredients_position_check"
+            CHECK ("position" >= 0) NOT VALID;
+    ALTER TABLE "recipe_recipe_ingredients"
+        VALIDATE CONSTRAINT "recipe_recipe_ingredients_position_check";
+"""
+
+DROP_COLUMNS = """
+    ALTER TABLE "recipe_recipe_ingredients"
+        DROP COLUMN "quantity",
+        DROP COLUMN "unit",
+        DROP COLUMN "position";
+"""
+
+NUMBER_POSITIONS = """
+    UPDATE "recipe_recipe_ingredients" AS links
+    SET "position" = numbered.position
+    FROM (
+        SELECT id, ROW_NUMBER() OVER (
+            PARTITION BY recipe_id ORDER BY id) - 1 AS position
+        FROM "recipe_recipe_ingredients"
+        WHERE recipe_id >= %s AND recipe_id < %s
+    ) AS numbered
+    WHERE links.id = numbered.id AND links.position <> numbered.position
+"""
+
+
+def number_positions(apps, schema_editor):
+    """
+    Number the ingredients of existing recipes in the order they were
+    added, a batch of recipes per transaction so rows are not locked for
+    the whole migration.
+    """
+    with schema_editor.connection.cursor() as cursor:
+        cursor.execute(
+            'SELECT MIN(recipe_id), MAX(recipe_id) '
+            'FROM "recipe_recipe_ingredients"')
+        first, last = cursor.fetchone()
+        if first is None:
+            return
+        for start in range(first, last + 1, BATCH_SIZE):
+            with transaction.atomic(using=schema_editor.connection.alias):
+                cursor.execute(NUMBER_POSITIONS, [start, start + BATCH_SIZE])
+
+
+class Migration(migrations.Migration):
+
+    atomic = False
+
+    dependencies = [
+        ('recipe', '0022_recipesimilarity'),
+    ]
+
+    operations = [
+        migrations.SeparateDatabaseAndState(
+            database_operations=[
+                migrations.RunSQL(ADD_COLUMNS, DROP_COLUMNS),
+            ],
+            state_operations=[
+                migrations.CreateModel(
+                    name='RecipeIngredient',
+                    fields=[
+                        ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                        ('quantity', models.DecimalField(blank=True, decimal_places=3, max_digits=10, null=True, validators=[django.core.validators.MinValueValidator(0, 'The quantity cannot be negative')])),
+                        ('unit', models.CharField(blank=True, max_length=32)),
+                        ('position', models.PositiveIntegerField(default=0)),
+                        ('ingredient', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='recipe_ingredients', to='recipe.ingredient')),
+                        ('recipe', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='recipe_ingredients', to='recipe.recipe')),
+                    ],
+                    options={
+                        'db_table': 'recipe_recipe_ingredients',
+                        'ordering': ['position', 'id'],
+                        'unique_together': {('recipe', 'ingredient')},
+                    },
+                ),
+                migrations.AlterField(
+                    model_name='recipe',
+                    name='ingredients',
+                    field=models.ManyToManyField(blank=True, related_name='recipes', through='recipe.RecipeIngredient', to='recipe.Ingredient'),
+                ),
+            ],
+        ),
+        migrations.RunPython(number_positions, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,19 @@
+# Generated by Django 3.2.25 on 2026-10-19 10:43
+
+import django.core.validators
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipe', '0023_recipeingredient'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='recipe',
+            name='servings',
+            field=models.PositiveSmallIntegerField(default=1, validators=[django.core.validators.MinValueValidator(1, 'A recipe makes at least one serving')]),
+        ),
+    ]
@@ -1,41 +1,46 @@
 """Models for the recipe app"""
 
+from django.conf import settings
 from django.contrib.auth import get_user_model
+from django.core.exceptions import ValidationError
 from django.core.validators import MinValueValidator
 from django.db import models
 
 import os
 import uuid
 
+from .images import populate_image_metadata
+from .storage import ContentAddressedStorage
 from .validators import validate_file_size
 
 
+RECIPE_IMAGE_DIR = os.path.join("uploads", "recipes")
+INGREDIENT_IMAGE_DIR = os.path.join("uploads", "ingredients")
+
+
 def recipe_image_file_path(instance, filename):
-    """Generate file path for new recipe image."""
+    """
+    Generate file path for new recipe image. The storage renames the file
+    after its content.
+    """
 
     extension = os.path.splitext(filename)[1]
-    filename = f"{uuid.uuid4()}{extension}"
 
-    return os.path.join(
-        "uploads",
-        "recipes",
-        str(instance.recipe.id),
-        filename
-    )
+    return os.path.join(RECIPE_IMAGE_DIR, f"image{extension}")
 
 
 def ingredient_image_file_path(instance, filename):
-    """Generate file path for new ingredient image."""
+    """
+    Generate file path for new ingredient image. The storage renames the
+    file after its content.
+    """
 
     extension = os.path.splitext(filename)[1]
-    filename = f"{uuid.uuid4()}{extension}"
 
-    return os.path.join(
-        "uploads",
-        "recipes",
-        str(instance.ingredient.id),
-        filename
-    )
+    return os.path.join(INGREDIENT_IMAGE_DIR, f"image{extension}")
+
+
+image_storage = ContentAddressedStorage()
 
 
 class Recipe(models.Model):
@@ -45,6 +50,10 @@ class Recipe(models.Model):
         get_user_model(), on_delete=models.CASCADE)
     title = models.CharField(max_length=255)
     time_minutes = models.PositiveSmallIntegerField()
+    servings = models.PositiveSmallIntegerField(
+        default=1, validators=[
+            MinValueValidator(1, 'A recipe makes at least one serving')
+        ])
     price = models.DecimalField(
         max_digits=10, decimal_places=2, validators=[
             MinValueValidator(0, 'The price cannot be negative')
@@ -54,14 +63,49 @@ class Recipe(models.Model):
     tags = models.ManyToManyField(
         "Tag", related_name="recipes", blank=True)
     ingredients = models.ManyToManyField(
-        "Ingredient", related_name="recipes", blank=True)
+        "Ingredient", related_name="recipes", blank=True,
+        through="RecipeIngredient")
+    created = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        """Index the orderings offered by the API within a user's recipes."""
+        indexes = [
+            models.Index(
+                fields=['user', field, 'id'],
+                name=f'recipe_user_{field}_idx',
+            )
+            for field in ['title', 'price', 'time_minutes', 'created']
+        ]
 
     def __str__(self):
         """Return recipe title as object name"""
         return self.title
 
 
-class RecipeImage(models.Model):
+class BaseImage(models.Model):
+    """
+    Base class for images, storing the metadata clients need to render
+    them responsively. It is computed once when the image is stored.
+    """
+
+    width = models.PositiveIntegerField(null=True, editable=False)
+    height = models.PositiveIntegerField(null=True, editable=False)
+    size = models.PositiveIntegerField(null=True, editable=False)
+    placeholder = models.TextField(blank=True, editable=False)
+    renditions = models.JSONField(default=list, blank=True, editable=False)
+
+    class Meta:
+        abstract = True
+
+    def save(self, *args, **kwargs):
+        """Store a new image file and its metadata before the row."""
+        if self.image and not self.image._committed:
+            self.image.save(self.image.name, self.image.file, save=False)
+            populate_image_metadata(self)
+        super().save(*args, **kwargs)
+
+
+class RecipeImage(BaseImage):
     """Recipe image object."""
 
     recipe = models.ForeignKey(
@@ -70,11 +114,87 @@ class RecipeImage(models.Model):
     )
     image = models.ImageField(
         upload_to=recipe_image_file_path,
+        storage=image_storage,
+        max_length=255,
         validators=[validate_file_size],
+        db_index=True,
+    )
+
+
+class RecipeImageUpload(models.Model):
+    """Resumable upload of a recipe image received in chunks."""
+
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    recipe = models.ForeignKey(
+        Recipe, on_delete=models.CASCADE,
+        related_name='image_uploads'
+    )
+    filename = models.CharField(max_length=255)
+    size = models.PositiveIntegerField()
+    offset = models.PositiveIntegerField(default=0)
+    created = models.DateTimeField(auto_now_add=True)
+
+    @property
+    def path(self):
+        """Return the path of the file the chunks are appended to."""
+        return os.path.join(settings.CHUNKED_UPLOAD_ROOT, f"{self.id}.part")
+
+
+class RecipeSimilarity(models.Model):
+    """
+    Precomputed similarity of a recipe to one of its most similar recipes,
+    by the tags and ingredients they share.
+    """
+
+    recipe = models.ForeignKey(
+        Recipe, on_delete=models.CASCADE,
+        related_name='similarities'
     )
+    similar = models.ForeignKey(
+        Recipe, on_delete=models.CASCADE,
+        related_name='+'
+    )
+    score = models.FloatField()
+
+    class Meta:
+        """Read the most similar recipes of a recipe from one index."""
+        constraints = [
+            models.UniqueConstraint(
+                fields=['recipe', 'similar'], name='unique similar recipes'
+            )
+        ]
+        indexes = [
+            models.Index(
+                fields=['recipe', '-score', 'similar'],
+                name='recipe_similarity_rank_idx',
+            ),
+        ]
+
+
+class UniqueNameMixin:
+    """
+    Validate that a user has no other object with the same name ignoring
+    case, as the unique index on the upper cased name requires. Model
+    constraints cannot express that index, so forms such as the admin's
+    would otherwise only find out from an IntegrityError.
+    """
 
+    def validate_unique(self, exclude=None):
+        super().validate_unique(exclude)
+        exclude = exclude or []
+        if "name" in exclude or "user" in exclude or self.user_id is None:
+            return
+        duplicates = type(self)._default_manager.filter(
+            user_id=self.user_id, name__iexact=self.name)
+        if self.pk is not None:
+            duplicates = duplicates.exclude(pk=self.pk)
+        if duplicates.exists():
+            raise ValidationError({"name": (
+                f"A {self._meta.verbose_name} named '{self.name}' "
+                "already exists.")})
 
-class Tag(models.Model):
+
+class Tag(UniqueNameMixin, models.Model):
     """Tag object."""
 
     user = models.ForeignKey(
@@ -94,7 +214,7 @@ class Tag(models.Model):
         return self.name
 
 
-class Ingredient(models.Model):
+class Ingredient(UniqueNameMixin, models.Model):
     """Ingredient object."""
 
     user = models.ForeignKey(
@@ -114,7 +234,32 @@ class Ingredient(models.Model):
         return self.name
 
 
-class IngredientImage(models.Model):
+class RecipeIngredient(models.Model):
+    """Ingredient of a recipe with its quantity, unit and position."""
+
+    recipe = models.ForeignKey(
+        Recipe, on_delete=models.CASCADE,
+        related_name='recipe_ingredients'
+    )
+    ingredient = models.ForeignKey(
+        Ingredient, on_delete=models.CASCADE,
+        related_name='recipe_ingredients'
+    )
+    quantity = models.DecimalField(
+        max_digits=10, decimal_places=3, null=True, blank=True, validators=[
+            MinValueValidator(0, 'The quantity cannot be negative')
+        ])
+    unit = models.CharField(max_length=32, blank=True)
+    position = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        """Keep the table and the unique links of the implicit model."""
+        db_table = 'recipe_recipe_ingredients'
+        unique_together = [['recipe', 'ingredient']]
+        ordering = ['position', 'id']
+
+
+class IngredientImage(BaseImage):
     """Ingredient image object"""
 
     ingredient = models.ForeignKey(
@@ -123,5 +268,8 @@ class IngredientImage(models.Model):
     )
     image = models.ImageField(
         upload_to=ingredient_image_file_path,
+        storage=image_storage,
+        max_length=255,
         validators=[validate_file_size],
+        db_index=True,
     )
@@ -0,0 +1,34 @@
+"""Ranking recipes by the ingredients a user has at hand."""
+
+from django.contrib.postgres.aggregates import JSONBAgg
+from django.db.models import Count, F, JSONField, Q, Value
+from django.db.models.functions import Coalesce, JSONObject
+
+
+def rank_recipes_by_pantry(recipes, ingredient_ids, limit):
+    """
+    Return the recipes sharing ingredients with the given IDs, ranked by
+    the number of their ingredients covered, then by the fewest missing.
+    Coverage is counted with one grouped query over the recipe ingredient
+    links, which also aggregates the missing ingredients of each recipe.
+    """
+    covered = Q(ingredients__id__any=ingredient_ids)
+    return (
+        recipes.prefetch_related(None)
+        .annotate(
+            ingredient_count=Count("ingredients"),
+            matched_count=Count("ingredients", filter=covered),
+            missing_ingredients=Coalesce(
+                JSONBAgg(
+                    JSONObject(
+                        id="ingredients__id", name="ingredients__name"),
+                    filter=~covered,
+                    ordering="ingredients__name",
+                ),
+                Value([], output_field=JSONField()),
+            ),
+        )
+        .filter(matched_count__gt=0)
+        .annotate(missing_count=F("ingredient_count") - F("matched_count"))
+        .order_by("-matched_count", "missing_count", "id")[:limit]
+    )
@@ -0,0 +1,114 @@
+"""
+Scaling the ingredient quantities of recipes to a number of servings and
+converting them between measuring systems.
+
+Quantities of any number of recipes are read, scaled and converted by one
+query. The conversion table is sent along as a VALUES list joined to the
+ingredient lines on their unit, and the arithmetic is done on numeric
+values inside the database, so quantities stay exact decimals and no
+Python code runs per ingredient line.
+"""
+
+from decimal import Decimal
+from itertools import groupby
+
+from django.db import connection
+
+from .models import Ingredient, Recipe, RecipeIngredient
+
+
+METRIC = "metric"
+IMPERIAL = "imperial"
+
+# Target unit and factor of the units converted to each measuring system,
+# by lower case unit. Other units are kept as they are.
+CONVERSIONS = {
+    METRIC: {
+        "oz": ("g", Decimal("28.349523125")),
+        "lb": ("g", Decimal("453.59237")),
+        "tsp": ("ml", Decimal("4.92892159375")),
+        "tbsp": ("ml", Decimal("14.78676478125")),
+        "fl oz": ("ml", Decimal("29.5735295625")),
+        "cup": ("ml", Decimal("236.5882365")),
+        "pt": ("ml", Decimal("473.176473")),
+        "qt": ("ml", Decimal("946.352946")),
+        "gal": ("l", Decimal("3.785411784")),
+    },
+    IMPERIAL: {
+        "g": ("oz", 1 / Decimal("28.349523125")),
+        "kg": ("lb", 1000 / Decimal("453.59237")),
+        "ml": ("fl oz", 1 / Decimal("29.5735295625")),
+        "l": ("qt", 1000 / Decimal("946.352946")),
+    },
+}
+
+# Decimal places of scaled quantities.
+QUANTITY_PLACES = 3
+
+
+def _conversions_sql(system):
+    """Return SQL and parameters of the conversion table of a system."""
+    rows = [
+        (unit, target_unit, factor)
+        for unit, (target_unit, factor)
+        in CONVERSIONS.get(system, {}).items()
+    ]
+    if not rows:
+        # A row matching no unit keeps the VALUES list valid.
+        rows = [(None, None, None)]
+    sql = ", ".join(["(%s::varchar, %s::varchar, %s::numeric)"] * len(rows))
+    return sql, [value for row in rows for value in row]
+
+
+def scale_recipes(user, recipe_ids, servings=None, system=None):
+    """
+    Return the recipes of a user with the given IDs, in the given order,
+    with their ingredients scaled to a number of servings and converted
+    to a measuring system. Recipes keep their own servings and units
+    when none are given. IDs of other users' recipes are ignored.
+    """
+    quote = connection.ops.quote_name
+    conversions, conversion_params = _conversions_sql(system)
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f"WITH conversions (unit, target_unit, factor) AS ("
+            f"    VALUES {conversions}"
+            f") "
+            f"SELECT recipe.id, recipe.title, "
+            f"    COALESCE(%s::integer, recipe.servings) AS servings, "
+            f"    ingredient.id, ingredient.name, "
+            f"    ROUND(link.quantity "
+            f"        * COALESCE(%s::integer, recipe.servings) "
+            f"        / NULLIF(recipe.servings, 0) "
+            f"        * COALESCE(conversions.factor, 1), %s), "
+            f"    COALESCE(conversions.target_unit, link.unit) "
+            f"FROM UNNEST(%s::bigint[]) WITH ORDINALITY "
+            f"    AS requested (id, position) "
+            f"JOIN {quote(Recipe._meta.db_table)} AS recipe "
+            f"    ON recipe.id = requested.id "
+            f"LEFT JOIN {quote(RecipeIngredient._meta.db_table)} AS link "
+            f"    ON link.recipe_id = recipe.id "
+            f"LEFT JOIN {quote(Ingredient._meta.db_table)} AS ingredient "
+            f"    ON ingredient.id = link.ingredient_id "
+            f"LEFT JOIN conversions "
+            f"    ON conversions.unit = LOWER(TRIM(link.unit)) "
+            f"WHERE recipe.user_id = %s "
+            f"ORDER BY requested.position, link.position, link.id",
+            [*conversion_params, servings, servings, QUANTITY_PLACES,
+             recipe_ids, user.id],
+        )
+        rows = cursor.fetchall()
+    recipes = []
+    for (recipe_id, title, recipe_servings), lines in groupby(
+            rows, key=lambda row: row[:3]):
+        recipes.append({
+            "id": recipe_id,
+            "title": title,
+            "servings": recipe_servings,
+            "ingredients": [
+                {"id": line[3], "name": line[4], "quantity": line[5],
+                 "unit": line[6]}
+                for line in lines if line[3] is not None
+            ],
+        })
+    return recipes
@@ -1,14 +1,116 @@
 """Serializers for the recipe app APIs."""
 
+import re
+
+from django.db import models
+from django.db.models.functions import Upper
+
 from rest_framework import serializers
+from rest_framework.settings import api_settings
 
+from .deletion import raw_delete
+from .media import sign_media_url
 from .models import (
     Ingredient,
     IngredientImage,
     Recipe,
     RecipeImage,
+    RecipeImageUpload,
+    RecipeIngredient,
+    RecipeSimilarity,
     Tag,
+    image_storage,
 )
+from .scaling import CONVERSIONS, QUANTITY_PLACES
+from .similarity import refresh_similarities_on_commit
+from .validators import MAX_FILE_SIZE_KB
+
+
+class SignedImageField(serializers.ImageField):
+    """Image field whose URL carries a signature granting read access."""
+
+    def to_representation(self, value):
+        url = super().to_representation(value)
+        use_url = getattr(
+            self, 'use_url', api_settings.UPLOADED_FILES_USE_URL)
+        if url is None or not use_url:
+            return url
+        return sign_media_url(url, value.name)
+
+
+# Largest number of recipes a bulk action applies to.
+MAX_BULK_IDS = 1000
+
+# Largest number of IDs a list filter accepts and the largest valid ID.
+MAX_FILTER_IDS = 100
+MAX_ID = 2 ** 63 - 1
+
+# Largest number of servings recipes can be scaled to.
+MAX_SERVINGS = 1000
+
+# Largest number of images uploaded in one batch. The proxy accepts batch
+# bodies up to 45 MB, this many files of MAX_FILE_SIZE_KB plus overhead.
+MAX_BATCH_IMAGES = 20
+
+# Default and largest number of recipes the pantry ranking returns.
+PANTRY_RESULTS = 10
+MAX_PANTRY_RESULTS = 50
+
+IMAGE_FIELDS = [
+    'id',
+    'image',
+    'width',
+    'height',
+    'size',
+    'placeholder',
+    'renditions',
+]
+
+
+class RenditionsField(serializers.ReadOnlyField):
+    """Resized copies of an image, with signed URLs."""
+
+    def to_representation(self, value):
+        request = self.context.get('request', None)
+        renditions = []
+        for rendition in value:
+            url = image_storage.url(rendition['name'])
+            if request is not None:
+                url = request.build_absolute_uri(url)
+            renditions.append({
+                'width': rendition['width'],
+                'height': rendition['height'],
+                'url': sign_media_url(url, rendition['name']),
+            })
+        return renditions
+
+
+class BaseImageSerializer(serializers.ModelSerializer):
+    """Base serializer for recipe and ingredient images."""
+
+    renditions = RenditionsField()
+
+    serializer_field_mapping = {
+        **serializers.ModelSerializer.serializer_field_mapping,
+        models.ImageField: SignedImageField,
+    }
+
+
+class ImageBatchUploadSerializer(serializers.Serializer):
+    """Serializer for uploading a batch of images."""
+
+    images = serializers.ListField(
+        child=serializers.FileField(), allow_empty=False,
+        max_length=MAX_BATCH_IMAGES)
+
+
+class ImageBatchResultSerializer(serializers.Serializer):
+    """Serializer documenting the result of one file in a batch upload."""
+
+    name = serializers.CharField()
+    id = serializers.IntegerField(required=False)
+    image = serializers.CharField(required=False)
+    errors = serializers.DictField(required=False)
 
 
 class BaseRecipeAttrSerializer(serializers.ModelSerializer):
@@ -23,13 +125,31 @@ class BaseRecipeAttrSerializer(serializers.ModelSerializer):
             'recipe_count',
         ]
 
-
-class IngredientImageSerializer(serializers.ModelSerializer):
+    def validate_name(self, value):
+        """
+        Reject names the user already has, ignoring case. Nested in a
+        recipe, existing names are reused instead.
+        """
+        request = self.context.get('request')
+        if request is None or self.parent is not None:
+            return value
+        duplicates = self.Meta.model.objects.filter(
+            user=request.user, name__iexact=value)
+        if self.instance is not None:
+            duplicates = duplicates.exclude(pk=self.instance.pk)
+        if duplicates.exists():
+            raise serializers.ValidationError(
+                f"A {self.Meta.model._meta.verbose_name} named '{value}' "
+                "already exists.")
+        return value
+
+
+class IngredientImageSerializer(BaseImageSerializer):
     """Serializer for ingredient images."""
 
     class Meta:
         model = IngredientImage
-        fields = ['id', 'image']
+        fields = IMAGE_FIELDS
 
     def create(self, validated_data):
         """
@@ -57,12 +177,12 @@ class TagSerializer(BaseRecipeAttrSerializer):
         model = Tag
 
 
-class RecipeImageSerializer(serializers.ModelSerializer):
+class RecipeImageSerializer(BaseImageSerializer):
     """Serializer for recipe images."""
 
     class Meta:
         model = RecipeImage
-        fields = ['id', 'image']
+        fields = IMAGE_FIELDS
 
     def create(self, validated_data):
         """
@@ -73,6 +193,205 @@ class RecipeImageSerializer(serializers.ModelSerializer):
             recipe_id=self.context['recipe_id'], **validated_data)
 
 
+class RecipeImageUploadSerializer(serializers.ModelSerializer):
+    """Serializer for resumable recipe image uploads."""
+
+    class Meta:
+        model = RecipeImageUpload
+        fields = ['id', 'filename', 'size', 'offset']
+        read_only_fields = ['id', 'offset']
+
+    def validate_size(self, value):
+        """Ensure the announced file size is within the image size limit."""
+        if value > MAX_FILE_SIZE_KB * 1024:
+            raise serializers.ValidationError(
+                f"The image cannot be larger than {MAX_FILE_SIZE_KB}KB")
+        return value
+
+    def create(self, validated_data):
+        """
+        Create and return an upload for a recipe by getting its id from
+        the view.
+        """
+        return RecipeImageUpload.objects.create(
+            recipe_id=self.context['recipe_id'], **validated_data)
+
+
+class RecipeBulkSerializer(serializers.Serializer):
+    """Serializer for the recipes a bulk action applies to."""
+
+    ids = serializers.ListField(
+        child=serializers.IntegerField(min_value=1),
+        allow_empty=False,
+        max_length=MAX_BULK_IDS,
+    )
+
+
+class RecipeBulkUpdateSerializer(RecipeBulkSerializer,
+                                 serializers.ModelSerializer):
+    """Serializer for changes applied to many recipes at once."""
+
+    class Meta:
+        model = Recipe
+        fields = [
+            'ids',
+            'title',
+            'time_minutes',
+            'price',
+            'link',
+            'description',
+        ]
+        extra_kwargs = {
+            field: {'required': False} for field in fields if field != 'ids'
+        }
+
+    def validate(self, attrs):
+        """Require at least one field to change."""
+        if len(attrs) < 2:
+            raise serializers.ValidationError(
+                "Provide at least one field to update.")
+        return attrs
+
+
+class RecipeBulkResultSerializer(serializers.Serializer):
+    """Serializer documenting the number of recipes a bulk action changed."""
+
+    count = serializers.IntegerField()
+
+
+class AttributeMergeSerializer(serializers.Serializer):
+    """Serializer for the tags or ingredients merged into another one."""
+
+    ids = serializers.ListField(
+        child=serializers.IntegerField(min_value=1),
+        allow_empty=False,
+        max_length=MAX_BULK_IDS,
+    )
+
+
+class RecipeLinkResultSerializer(RecipeBulkResultSerializer):
+    """
+    Serializer documenting the links a tag or ingredient action changed
+    and the number of recipes it is now assigned to.
+    """
+
+    recipe_count = serializers.IntegerField()
+
+
+class CommaSeparatedIdsField(serializers.CharField):
+    """
+    Field parsing a comma separated list of IDs, dropping duplicates and
+    empty items. Lists longer than max_ids are rejected.
+    """
+
+    default_error_messages = {
+        'invalid_id': '"{value}" is not a valid ID.',
+        'too_many_ids': 'Ensure this list has no more than {max_ids} IDs.',
+    }
+
+    def __init__(self, max_ids=MAX_FILTER_IDS, **kwargs):
+        self.max_ids = max_ids
+        kwargs.setdefault('allow_blank', True)
+        super().__init__(**kwargs)
+
+    def to_internal_value(self, data):
+        ids = {}
+        for value in super().to_internal_value(data).split(','):
+            value = value.strip()
+            if not value:
+                continue
+            if not re.fullmatch(r'[0-9]+', value) or not (
+                0 < int(value) <= MAX_ID
+            ):
+                self.fail('invalid_id', value=value)
+            ids[int(value)] = None
+        if len(ids) > self.max_ids:
+            self.fail('too_many_ids', max_ids=self.max_ids)
+        return list(ids)
+
+
+class RecipeRelationFilterSerializer(serializers.Serializer):
+    """Serializer validating the tag and ingredient IDs recipes have."""
+
+    tags = CommaSeparatedIdsField(required=False)
+    ingredients = CommaSeparatedIdsField(required=False)
+
+
+class AttributeFilterSerializer(serializers.Serializer):
+    """Serializer validating the filters of tags and ingredients."""
+
+    assigned_only = serializers.ChoiceField(choices=[0, 1], required=False)
+
+
+class RecipeRangeFilterSerializer(serializers.Serializer):
+    """Serializer validating the price and time ranges of recipes."""
+
+    price_min = serializers.DecimalField(
+        max_digits=10, decimal_places=2, min_value=0, required=False)
+    price_max = serializers.DecimalField(
+        max_digits=10, decimal_places=2, min_value=0, required=False)
+    time_min = serializers.IntegerField(min_value=0, required=False)
+    time_max = serializers.IntegerField(min_value=0, required=False)
+
+    def validate(self, attrs):
+        """Check that no range ends before it starts."""
+        for minimum, maximum in [
+            ('price_min', 'price_max'),
+            ('time_min', 'time_max'),
+        ]:
+            if (
+                minimum in attrs and maximum in attrs and
+                attrs[minimum] > attrs[maximum]
+            ):
+                raise serializers.ValidationError(
+                    {maximum: f"Must not be less than {minimum}."})
+        return attrs
+
+
+class PantrySerializer(serializers.Serializer):
+    """Serializer validating the ingredients a user has at hand."""
+
+    ingredients = CommaSeparatedIdsField(max_ids=MAX_BULK_IDS)
+    limit = serializers.IntegerField(
+        min_value=1, max_value=MAX_PANTRY_RESULTS, default=PANTRY_RESULTS)
+
+    def validate_ingredients(self, value):
+        """Require at least one ingredient."""
+        if not value:
+            raise serializers.ValidationError(
+                "Provide at least one ingredient ID.")
+        return value
+
+
+class PantryIngredientSerializer(serializers.Serializer):
+    """Serializer for an ingredient a ranked recipe is missing."""
+
+    id = serializers.IntegerField()
+    name = serializers.CharField()
+
+
+class PantryRecipeSerializer(serializers.ModelSerializer):
+    """Serializer for a recipe ranked by the ingredients at hand."""
+
+    ingredient_count = serializers.IntegerField()
+    matched_count = serializers.IntegerField()
+    missing_ingredients = PantryIngredientSerializer(many=True)
+
+    class Meta:
+        model = Recipe
+        fields = [
+            'id',
+            'title',
+            'time_minutes',
+            'price',
+            'link',
+            'ingredient_count',
+            'matched_count',
+            'missing_ingredients',
+        ]
+        read_only_fields = fields
+
+
 class RecipeSerializer(serializers.ModelSerializer):
     """Simple recipe serializer(No description nor ingredients)."""
 
@@ -85,6 +404,7 @@ class RecipeSerializer(serializers.ModelSerializer):
             'id',
             'title',
             'time_minutes',
+            'servings',
             'price',
             'link',
             'tags',
@@ -92,11 +412,127 @@ class RecipeSerializer(serializers.ModelSerializer):
         ]
 
 
+class ShoppingListQuerySerializer(serializers.Serializer):
+    """Serializer validating the recipes a shopping list is built from."""
+
+    recipes = CommaSeparatedIdsField()
+
+    def validate_recipes(self, value):
+        """Require at least one recipe."""
+        if not value:
+            raise serializers.ValidationError(
+                "Provide at least one recipe ID.")
+        return value
+
+
+class ShoppingListRecipeSerializer(serializers.Serializer):
+    """Serializer for a recipe using an ingredient of a shopping list."""
+
+    id = serializers.IntegerField()
+    title = serializers.CharField()
+
+
+class ShoppingListItemSerializer(serializers.Serializer):
+    """Serializer for an ingredient of a shopping list and its recipes."""
+
+    id = serializers.IntegerField(source='ingredient_id')
+    name = serializers.CharField()
+    recipe_count = serializers.IntegerField()
+    recipes = ShoppingListRecipeSerializer(many=True)
+
+
+class RecipeScaleQuerySerializer(serializers.Serializer):
+    """
+    Serializer validating the recipes to scale, the number of servings
+    and the measuring system to convert their quantities to.
+    """
+
+    recipes = CommaSeparatedIdsField(max_ids=MAX_BULK_IDS)
+    servings = serializers.IntegerField(
+        min_value=1, max_value=MAX_SERVINGS, required=False)
+    system = serializers.ChoiceField(
+        choices=list(CONVERSIONS), required=False)
+
+    def validate_recipes(self, value):
+        """Require at least one recipe."""
+        if not value:
+            raise serializers.ValidationError(
+                "Provide at least one recipe ID.")
+        return value
+
+
+class ScaledIngredientSerializer(serializers.Serializer):
+    """Serializer for a scaled ingredient line of a recipe."""
+
+    id = serializers.IntegerField()
+    name = serializers.CharField()
+    quantity = serializers.DecimalField(
+        max_digits=None, decimal_places=QUANTITY_PLACES, allow_null=True)
+    unit = serializers.CharField()
+
+
+class ScaledRecipeSerializer(serializers.Serializer):
+    """Serializer for a recipe with its scaled ingredient lines."""
+
+    id = serializers.IntegerField()
+    title = serializers.CharField()
+    servings = serializers.IntegerField()
+    ingredients = ScaledIngredientSerializer(many=True)
+
+
+class AttributeCountSerializer(serializers.Serializer):
+    """Serializer for a tag or ingredient and its number of recipes."""
+
+    id = serializers.IntegerField()
+    name = serializers.CharField()
+    recipe_count = serializers.IntegerField()
+
+
+class RecipeStatsSerializer(serializers.Serializer):
+    """Serializer for the recipe statistics of a user."""
+
+    recipe_count = serializers.IntegerField()
+    average_price = serializers.DecimalField(
+        max_digits=10, decimal_places=2, allow_null=True)
+    average_time_minutes = serializers.DecimalField(
+        max_digits=10, decimal_places=1, allow_null=True)
+    top_tags = AttributeCountSerializer(many=True)
+    top_ingredients = AttributeCountSerializer(many=True)
+
+
+class SimilarRecipeSerializer(serializers.ModelSerializer):
+    """Serializer for a recipe similar to another one and its score."""
+
+    recipe = RecipeSerializer(source='similar', read_only=True)
+
+    class Meta:
+        model = RecipeSimilarity
+        fields = ['score', 'recipe']
+        read_only_fields = fields
+
+
+class RecipeIngredientSerializer(serializers.ModelSerializer):
+    """
+    Serializer for an ingredient of a recipe with its quantity and unit.
+    Ingredients are listed in their position in the recipe.
+    """
+
+    id = serializers.IntegerField(source='ingredient.id', read_only=True)
+    name = serializers.CharField(source='ingredient.name', max_length=255)
+    images = IngredientImageSerializer(
+        source='ingredient.images', many=True, read_only=True)
+
+    class Meta:
+        model = RecipeIngredient
+        fields = ['id', 'name', 'images', 'quantity', 'unit']
+
+
 class RecipeDetailSerializer(RecipeSerializer):
     """Recipe detail serializer"""
 
     tags = TagSerializer(many=True, required=False)
-    ingredients = IngredientSerializer(many=True, required=False)
+    ingredients = RecipeIngredientSerializer(
+        source='recipe_ingredients', many=True, required=False)
     images = RecipeImageSerializer(many=True, read_only=True)
 
     class Meta(RecipeSerializer.Meta):
@@ -116,41 +552,93 @@ class RecipeDetailSerializer(RecipeSerializer):
             user = request.user
         return user
 
-    def _get_or_create_tags(self, instance, tags):
-        """Get or create tags."""
-        user = self._get_user()
-
-        for tag in tags:
-            tag_object, created = Tag.objects.get_or_create(**tag, user=user)
-            instance.tags.add(tag_object)
-
-    def _get_or_create_ingredients(self, instance, ingredients):
-        """Get or create ingredients."""
+    def _get_or_create_named(self, model, names):
+        """
+        Return the tags or ingredients of the current user with the given
+        names, ignoring case, by upper cased name in the order of the
+        names. Missing ones are created with one bulk insert, so any number
+        of names takes a constant number of queries.
+        """
         user = self._get_user()
-
-        for ingredient in ingredients:
-            ingredient_object, created = Ingredient.objects.get_or_create(
-                **ingredient, user=user)
-            instance.ingredients.add(ingredient_object)
+        by_key = {}
+        for name in names:
+            by_key.setdefault(name.upper(), name)
+
+        def find(keys):
+            return {
+                item.upper_name: item
+                for item in model.objects.annotate(
+                    upper_name=Upper('name')).filter(
+                    user=user, upper_name__in=keys)
+            }
+
+        found = find(list(by_key)) if by_key else {}
+        missing = [key for key in by_key if key not in found]
+        if missing:
+            model.objects.bulk_create(
+                [model(user=user, name=by_key[key]) for key in missing],
+                ignore_conflicts=True)
+            found.update(find(missing))
+        for key, name in by_key.items():
+            if key not in found:
+                # The database upper cases some letters unlike Python.
+                found[key], _ = model.objects.get_or_create(
+                    user=user, name__iexact=name, defaults={'name': name})
+        return {key: found[key] for key in by_key}
+
+    def _set_tags(self, instance, tags):
+        """
+        Replace the tags of the recipe with the named ones, creating
+        missing ones. The links are written in the given order with one
+        delete and one bulk insert.
+        """
+        found = self._get_or_create_named(Tag, [tag['name'] for tag in tags])
+        through = Recipe.tags.through
+        raw_delete(through.objects.filter(recipe=instance))
+        through.objects.bulk_create(
+            through(recipe=instance, tag=tag) for tag in found.values())
+        refresh_similarities_on_commit([instance.id])
+
+    def _set_ingredients(self, instance, ingredients):
+        """
+        Replace the ingredients of the recipe with the named ones in the
+        given order, with their quantities and units. The links are
+        written with one delete and one bulk insert.
+        """
+        found = self._get_or_create_named(
+            Ingredient, [item['ingredient']['name'] for item in ingredients])
+        links = {}
+        for item in ingredients:
+            ingredient = found[item['ingredient']['name'].upper()]
+            links.setdefault(ingredient.id, RecipeIngredient(
+                recipe=instance,
+                ingredient=ingredient,
+                quantity=item.get('quantity'),
+                unit=item.get('unit', ''),
+                position=len(links),
+            ))
+        raw_delete(RecipeIngredient.objects.filter(recipe=instance))
+        RecipeIngredient.objects.bulk_create(links.values())
+        refresh_similarities_on_commit([instance.id])
 
     def create(self, validated_data):
         """Handle recipe creation and its many to many relations."""
         tags = validated_data.pop('tags', [])
-        ingredients = validated_data.pop('ingredients', [])
+        ingredients = validated_data.pop('recipe_ingredients', [])
         instance = Recipe.objects.create(**validated_data)
-        self._get_or_create_tags(instance, tags)
-        self._get_or_create_ingredients(instance, ingredients)
+        if tags:
+            self._set_tags(instance, tags)
+        if ingredients:
+            self._set_ingredients(instance, ingredients)
         return instance
 
     def update(self, instance, validated_data):
         """Handle recipe updates and those of its many to many relations."""
         tags = validated_data.pop('tags', None)
-        ingredients = validated_data.pop('ingredients', None)
+        ingredients = validated_data.pop('recipe_ingredients', None)
         instance = super().update(instance, validated_data)
         if tags is not None:
-            instance.tags.clear()
-            self._get_or_create_tags(instance, tags)
+            self._set_tags(instance, tags)
         if ingredients is not None:
-            instance.ingredients.clear()
-            self._get_or_create_ingredients(instance, ingredients)
+            self._set_ingredients(instance, ingredients)
         return instance
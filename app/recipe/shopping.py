@@ -0,0 +1,29 @@
+"""Shopping lists merging the ingredients of several recipes."""
+
+from django.contrib.postgres.aggregates import JSONBAgg
+from django.db.models import Count, F
+from django.db.models.functions import JSONObject
+
+from .models import Recipe
+
+
+def build_shopping_list(user, recipe_ids):
+    """
+    Return the distinct ingredients of a user's recipes with the given
+    IDs, each with the recipes using it, from one grouped query over the
+    recipe ingredient links.
+    """
+    return (
+        Recipe.ingredients.through.objects
+        .filter(recipe__user=user, recipe__id__any=recipe_ids)
+        .values("ingredient_id")
+        .annotate(
+            name=F("ingredient__name"),
+            recipe_count=Count("recipe_id"),
+            recipes=JSONBAgg(
+                JSONObject(id="recipe_id", title="recipe__title"),
+                ordering=("recipe__title", "recipe_id"),
+            ),
+        )
+        .order_by("name", "ingredient_id")
+    )
@@ -0,0 +1,154 @@
+"""Signal receivers for the recipe app."""
+
+import os
+import time
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models.signals import (
+    m2m_changed,
+    post_delete,
+    post_save,
+    pre_delete,
+    pre_save,
+)
+from django.dispatch import receiver
+
+from .models import (
+    Ingredient,
+    IngredientImage,
+    Recipe,
+    RecipeImage,
+    RecipeIngredient,
+    RecipeSimilarity,
+    Tag,
+    image_storage,
+)
+from .similarity import refresh_similarities_on_commit
+from .stats import invalidate_stats_on_commit
+
+
+def is_image_referenced(name):
+    """Return true if any recipe or ingredient image uses the file."""
+    return (
+        RecipeImage.objects.filter(image=name).exists() or
+        IngredientImage.objects.filter(image=name).exists()
+    )
+
+
+def is_recently_modified(name, cutoff):
+    """Return true if a stored file was modified after the cutoff time."""
+    try:
+        return os.stat(image_storage.path(name)).st_mtime > cutoff
+    except FileNotFoundError:
+        return False
+
+
+def delete_unreferenced_image(name, renditions):
+    """
+    Delete an image file and its renditions unless an image still
+    references it. Identical uploads share one file in the content
+    addressed storage.
+
+    An identical upload running concurrently only touches the existing
+    file before its row is committed, so files modified in the last
+    MEDIA_DELETE_MIN_AGE seconds are kept. They are removed by the
+    orphaned media cleanup if they stay unreferenced.
+    """
+    if not name or is_image_referenced(name):
+        return
+    cutoff = time.time() - settings.MEDIA_DELETE_MIN_AGE
+    if is_recently_modified(name, cutoff):
+        return
+    image_storage.delete(name)
+    for rendition in renditions:
+        if not is_recently_modified(rendition["name"], cutoff):
+            image_storage.delete(rendition["name"])
+
+
+def delete_image_on_commit(name, renditions):
+    """
+    Delete an image file once the transaction releasing it commits, so a
+    rolled back delete or update keeps its file.
+    """
+    transaction.on_commit(
+        lambda: delete_unreferenced_image(name, renditions))
+
+
+@receiver(post_delete, sender=RecipeImage)
+@receiver(post_delete, sender=IngredientImage)
+def delete_image_file(sender, instance, **kwargs):
+    """Delete the file of a deleted image, cascades included."""
+    delete_image_on_commit(instance.image.name, instance.renditions)
+
+
+@receiver(pre_save, sender=RecipeImage)
+@receiver(pre_save, sender=IngredientImage)
+def delete_replaced_image_file(sender, instance, update_fields=None,
+                               **kwargs):
+    """Delete the old file of an image whose file is being replaced."""
+    if instance._state.adding or (
+        update_fields is not None and "image" not in update_fields
+    ):
+        return
+    old = sender.objects.filter(pk=instance.pk).values(
+        "image", "renditions").first()
+    if old is not None and old["image"] != instance.image.name:
+        delete_image_on_commit(old["image"], old["renditions"])
+
+
+@receiver(m2m_changed, sender=Recipe.tags.through)
+@receiver(m2m_changed, sender=Recipe.ingredients.through)
+def refresh_changed_recipe_similarities(sender, instance, action, reverse,
+                                        pk_set, **kwargs):
+    """Refresh the similar recipes of recipes whose tags changed."""
+    if not reverse:
+        if action in ("post_add", "post_remove", "post_clear"):
+            refresh_similarities_on_commit([instance.pk])
+    elif action in ("post_add", "post_remove"):
+        refresh_similarities_on_commit(pk_set)
+    elif action == "pre_clear":
+        refresh_similarities_on_commit(
+            instance.recipes.values_list("id", flat=True))
+
+
+@receiver(post_save, sender=RecipeIngredient)
+@receiver(post_delete, sender=RecipeIngredient)
+def refresh_linked_recipe_similarities(sender, instance, **kwargs):
+    """
+    Refresh the similar recipes of a recipe whose ingredient line was saved
+    or deleted itself, as by the admin inlines, which sends no m2m_changed.
+    The tags through model is auto created and sends no signals, the admin
+    refreshes the recipes of the tag links it saves.
+    """
+    refresh_similarities_on_commit([instance.recipe_id])
+
+
+@receiver(pre_delete, sender=Tag)
+@receiver(pre_delete, sender=Ingredient)
+def refresh_detached_recipe_similarities(sender, instance, **kwargs):
+    """Refresh the similar recipes of recipes losing a tag or ingredient."""
+    refresh_similarities_on_commit(
+        instance.recipes.values_list("id", flat=True))
+
+
+@receiver(pre_delete, sender=Recipe)
+def refresh_listing_recipe_similarities(sender, instance, **kwargs):
+    """Refresh the recipes listing a deleted recipe as similar."""
+    refresh_similarities_on_commit(
+        RecipeSimilarity.objects.filter(similar=instance).values_list(
+            "recipe_id", flat=True))
+
+
+@receiver(post_save, sender=Recipe)
+@receiver(post_save, sender=Tag)
+@receiver(post_save, sender=Ingredient)
+@receiver(post_delete, sender=Recipe)
+@receiver(post_delete, sender=Tag)
+@receiver(post_delete, sender=Ingredient)
+@receiver(m2m_changed, sender=Recipe.tags.through)
+@receiver(m2m_changed, sender=Recipe.ingredients.through)
+def invalidate_owner_stats(sender, instance, **kwargs):
+    """Drop the cached statistics of the owner of a changed object."""
+    if kwargs.get("action") in (None, "post_add", "post_remove", "post_clear"):
+        invalidate_stats_on_commit([instance.user_id])
@@ -0,0 +1,238 @@
+"""
+Precomputed index of the recipes most similar to each recipe.
+
+Recipes are compared by the Jaccard similarity of their tag and
+ingredient sets: the number of tags and ingredients they share divided
+by the number they have together. Scores are computed inside the
+database by joining the link tables with themselves on the shared tags
+and ingredients, and only the best SIMILAR_RECIPES of each recipe are
+stored, so reading them is a single indexed query.
+"""
+
+import logging
+import weakref
+
+from django.db import connection, transaction
+
+from .models import Recipe, RecipeSimilarity
+
+
+# Number of similar recipes kept for each recipe.
+SIMILAR_RECIPES = 10
+
+logger = logging.getLogger(__name__)
+
+# Refresh scheduled in the current transaction of each connection.
+_pending = weakref.WeakKeyDictionary()
+
+
+def _features_sql():
+    """
+    Return SQL selecting the tags and ingredients of recipes as (recipe,
+    kind, item) rows. Kept out of a CTE so filters on recipe_id reach
+    the link table indexes.
+    """
+    quote = connection.ops.quote_name
+    tags = Recipe.tags.through._meta.db_table
+    ingredients = Recipe.ingredients.through._meta.db_table
+    return (
+        f"SELECT recipe_id, 0 AS kind, tag_id AS item_id "
+        f"FROM {quote(tags)} "
+        f"UNION ALL "
+        f"SELECT recipe_id, 1 AS kind, ingredient_id AS item_id "
+        f"FROM {quote(ingredients)}"
+    )
+
+
+def _scores_sql(where):
+    """
+    Return a WITH clause defining "scored" as the Jaccard similarity of
+    pairs of recipes of a user sharing a tag or an ingredient, for the
+    source recipes matching a condition on source.recipe_id.
+    """
+    quote = connection.ops.quote_name
+    features = _features_sql()
+    recipes = quote(Recipe._meta.db_table)
+    return (
+        f"WITH shared AS ("
+        f"    SELECT source.recipe_id, target.recipe_id AS similar_id, "
+        f"        COUNT(*) AS shared "
+        f"    FROM ({features}) AS source "
+        f"    JOIN ({features}) AS target "
+        f"        ON target.kind = source.kind "
+        f"        AND target.item_id = source.item_id "
+        f"        AND target.recipe_id <> source.recipe_id "
+        f"    {where} "
+        f"    GROUP BY source.recipe_id, target.recipe_id"
+        f"), sizes AS ("
+        f"    SELECT recipe_id, COUNT(*) AS size FROM ({features}) AS items "
+        f"    WHERE recipe_id IN ("
+        f"        SELECT recipe_id FROM shared "
+        f"        UNION SELECT similar_id FROM shared) "
+        f"    GROUP BY recipe_id"
+        f"), scored AS ("
+        f"    SELECT shared.recipe_id, shared.similar_id, "
+        f"        shared.shared::float "
+        f"            / (source.size + target.size - shared.shared) AS score "
+        f"    FROM shared "
+        f"    JOIN sizes AS source ON source.recipe_id = shared.recipe_id "
+        f"    JOIN sizes AS target ON target.recipe_id = shared.similar_id "
+        f"    JOIN {recipes} AS owner ON owner.id = shared.recipe_id "
+        f"    JOIN {recipes} AS neighbour "
+        f"        ON neighbour.id = shared.similar_id "
+        f"        AND neighbour.user_id = owner.user_id"
+        f") "
+    )
+
+
+def _insert_similarities(cursor, recipe_ids=None):
+    """
+    Compute and insert the most similar recipes of the given recipes, or
+    of every recipe when recipe_ids is None.
+    """
+    table = connection.ops.quote_name(RecipeSimilarity._meta.db_table)
+    where, params = "", []
+    if recipe_ids is not None:
+        where, params = "WHERE source.recipe_id = ANY(%s)", [recipe_ids]
+    cursor.execute(
+        f"INSERT INTO {table} (recipe_id, similar_id, score) "
+        f"{_scores_sql(where)}"
+        f"SELECT recipe_id, similar_id, score FROM ("
+        f"    SELECT *, ROW_NUMBER() OVER ("
+        f"        PARTITION BY recipe_id ORDER BY score DESC, similar_id"
+        f"    ) AS position FROM scored"
+        f") AS ranked "
+        f"WHERE position <= %s",
+        [*params, SIMILAR_RECIPES],
+    )
+    return cursor.rowcount
+
+
+def _insert_neighbour_candidates(cursor, recipe_ids, recomputed_ids):
+    """
+    Offer the changed recipes to the other recipes sharing tags or
+    ingredients with them. A pair is stored when it beats the last of
+    the most similar recipes of the neighbour. Return the neighbours
+    which received a row.
+    """
+    table = connection.ops.quote_name(RecipeSimilarity._meta.db_table)
+    cursor.execute(
+        f"INSERT INTO {table} (recipe_id, similar_id, score) "
+        f"{_scores_sql('WHERE source.recipe_id = ANY(%s)')}"
+        f"SELECT similar_id, recipe_id, score FROM scored "
+        f"WHERE NOT similar_id = ANY(%s) AND ("
+        f"    NOT EXISTS ("
+        f"        SELECT 1 FROM {table} AS current "
+        f"        WHERE current.recipe_id = scored.similar_id OFFSET %s) "
+        f"    OR (score, -recipe_id) > ("
+        f"        SELECT current.score, -current.similar_id "
+        f"        FROM {table} AS current "
+        f"        WHERE current.recipe_id = scored.similar_id "
+        f"        ORDER BY current.score DESC, current.similar_id "
+        f"        OFFSET %s LIMIT 1)"
+        f") "
+        f"RETURNING recipe_id",
+        [recipe_ids, recomputed_ids, SIMILAR_RECIPES - 1,
+         SIMILAR_RECIPES - 1],
+    )
+    return list({row[0] for row in cursor.fetchall()})
+
+
+def _trim_similarities(cursor, recipe_ids):
+    """Delete the rows beyond the most similar recipes of each recipe."""
+    table = connection.ops.quote_name(RecipeSimilarity._meta.db_table)
+    cursor.execute(
+        f"DELETE FROM {table} WHERE id IN ("
+        f"    SELECT id FROM ("
+        f"        SELECT id, ROW_NUMBER() OVER ("
+        f"            PARTITION BY recipe_id ORDER BY score DESC, similar_id"
+        f"        ) AS position FROM {table} WHERE recipe_id = ANY(%s)"
+        f"    ) AS ranked WHERE position > %s"
+        f")",
+        [recipe_ids, SIMILAR_RECIPES],
+    )
+
+
+def build_similarities():
+    """Rebuild the whole index. Return the number of rows stored."""
+    with transaction.atomic(), connection.cursor() as cursor:
+        cursor.execute(
+            f"DELETE FROM "
+            f"{connection.ops.quote_name(RecipeSimilarity._meta.db_table)}")
+        return _insert_similarities(cursor)
+
+
+def refresh_similarities(recipe_ids):
+    """
+    Update the index after the tags or ingredients of recipes changed.
+
+    The changed recipes and the recipes listing them are recomputed.
+    Other recipes sharing tags or ingredients with the changed ones only
+    gain a row when a changed recipe now ranks among their most similar
+    ones, so the work grows with the changed recipes, not their
+    neighbourhood.
+    """
+    recipe_ids = list(recipe_ids)
+    with transaction.atomic(), connection.cursor() as cursor:
+        recomputed_ids = list(set(recipe_ids).union(
+            RecipeSimilarity.objects.filter(
+                similar_id__in=recipe_ids).values_list(
+                "recipe_id", flat=True)))
+        RecipeSimilarity.objects.filter(
+            recipe_id__in=recomputed_ids).delete()
+        _insert_similarities(cursor, recomputed_ids)
+        neighbour_ids = _insert_neighbour_candidates(
+            cursor, recipe_ids, recomputed_ids)
+        _trim_similarities(cursor, neighbour_ids)
+
+
+def _refresh_after_commit(recipe_ids):
+    """
+    Refresh the recipes once the transaction has committed. Failures are
+    logged rather than raised, since the changes are already committed;
+    the index is then repaired by the next refresh of the recipes or by
+    the build_recipe_similarities command.
+    """
+    try:
+        refresh_similarities(recipe_ids)
+    except Exception:
+        logger.exception(
+            "Refreshing the similar recipes of %s failed.", sorted(recipe_ids))
+
+
+class _PendingRefresh:
+    """Recipes of a transaction to refresh once it commits."""
+
+    def __init__(self, connection):
+        self.connection = connection
+        self.recipe_ids = set()
+
+    def __call__(self):
+        scheduled = _pending.get(self.connection)
+        if scheduled is not None and scheduled() is self:
+            del _pending[self.connection]
+        _refresh_after_commit(self.recipe_ids)
+
+
+def refresh_similarities_on_commit(recipe_ids):
+    """
+    Refresh the index for changed recipes once the transaction commits.
+
+    Recipes changed several times in a transaction are refreshed once:
+    their ids are added to the refresh already scheduled on the connection.
+    It is only referenced weakly, so when a rollback discards it, the ids
+    go with it and the next change schedules a new refresh.
+    """
+    recipe_ids = set(recipe_ids)
+    if not recipe_ids:
+        return
+    connection = transaction.get_connection()
+    scheduled = _pending.get(connection)
+    pending = scheduled() if scheduled is not None else None
+    if pending is not None:
+        pending.recipe_ids |= recipe_ids
+        return
+    pending = _PendingRefresh(connection)
+    pending.recipe_ids |= recipe_ids
+    _pending[connection] = weakref.ref(pending)
+    transaction.on_commit(pending)
@@ -0,0 +1,72 @@
+"""
+Per user statistics of recipes, computed with aggregate queries and
+cached until the user's recipes, tags or ingredients change.
+
+Cached statistics are keyed by a generation stored next to them. Writes
+delete the generation once they commit, so statistics computed from data
+read before the commit are stored under a generation nobody reads again.
+"""
+
+import uuid
+
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import Avg, Count
+
+from .models import Ingredient, Recipe, Tag
+
+
+# Number of tags and ingredients listed in the statistics.
+TOP_ATTRIBUTES = 5
+
+# Seconds statistics stay cached when no write invalidates them first.
+STATS_TIMEOUT = 60 * 60
+
+
+def _generation_key(user_id):
+    """Return the cache key of the statistics generation of a user."""
+    return f"recipe-stats-generation:{user_id}"
+
+
+def _top_attributes(model, user):
+    """Return the tags or ingredients of a user used by most recipes."""
+    return list(
+        model.objects.filter(user=user)
+        .annotate(recipe_count=Count("recipes"))
+        .filter(recipe_count__gt=0)
+        .order_by("-recipe_count", "name")
+        .values("id", "name", "recipe_count")[:TOP_ATTRIBUTES]
+    )
+
+
+def compute_stats(user):
+    """Compute the statistics of a user with three aggregate queries."""
+    stats = Recipe.objects.filter(user=user).aggregate(
+        recipe_count=Count("id"),
+        average_price=Avg("price"),
+        average_time_minutes=Avg("time_minutes"),
+    )
+    stats["top_tags"] = _top_attributes(Tag, user)
+    stats["top_ingredients"] = _top_attributes(Ingredient, user)
+    return stats
+
+
+def get_stats(user):
+    """Return the statistics of a user, from the cache when possible."""
+    generation = cache.get(_generation_key(user.id))
+    if generation is None:
+        generation = uuid.uuid4().hex
+        cache.add(_generation_key(user.id), generation, STATS_TIMEOUT)
+    key = f"recipe-stats:{user.id}:{generation}"
+    stats = cache.get(key)
+    if stats is None:
+        stats = compute_stats(user)
+        cache.set(key, stats, STATS_TIMEOUT)
+    return stats
+
+
+def invalidate_stats_on_commit(user_ids):
+    """Drop the cached statistics of users once the transaction commits."""
+    keys = [_generation_key(user_id) for user_id in set(user_ids)]
+    if keys:
+        transaction.on_commit(lambda: cache.delete_many(keys))
@@ -0,0 +1,83 @@
+"""Content addressed storage for recipe and ingredient images."""
+
+import hashlib
+import os
+import uuid
+
+from django.core.exceptions import SuspiciousFileOperation
+from django.core.files import File
+from django.core.files.storage import FileSystemStorage
+from django.utils.deconstruct import deconstructible
+
+
+def file_content_hash(content):
+    """Return the SHA-256 hex digest of a file, read chunk by chunk."""
+    hasher = hashlib.sha256()
+    for chunk in content.chunks():
+        hasher.update(chunk)
+    return hasher.hexdigest()
+
+
+@deconstructible
+class ContentAddressedStorage(FileSystemStorage):
+    """
+    File system storage naming files after the SHA-256 of their content.
+
+    The directory given by upload_to is kept as a namespace and the file is
+    stored as <namespace>/<ab>/<cd>/<sha256><ext>, the first two byte pairs
+    of the digest fanning files out over sub directories. Identical uploads
+    map to the same name and are only written once, so a stored file never
+    changes and can be cached forever.
+    """
+
+    def save(self, name, content, max_length=None):
+        """Rename the file after its content before saving it."""
+        if name is None:
+            name = content.name
+        if not hasattr(content, 'chunks'):
+            content = File(content, name)
+        # Upload handlers hash files while streaming them in.
+        digest = getattr(content, 'content_hash', None)
+        if digest is None:
+            digest = file_content_hash(content)
+        return super().save(
+            self.content_name(name, digest), content, max_length)
+
+    def save_derived(self, name, content):
+        """
+        Save a file derived from a stored file, such as a resized copy,
+        under the given name. A file derived from immutable content is
+        immutable as well, so existing files are kept.
+        """
+        return super().save(name, content)
+
+    def content_name(self, name, digest):
+        """Return the content addressed name for a file."""
+        directory, filename = os.path.split(str(name).replace('\\', '/'))
+        extension = os.path.splitext(filename)[1].lower()
+        return '/'.join(
+            [directory, digest[:2], digest[2:4], digest + extension])
+
+    def get_available_name(self, name, max_length=None):
+        """Reuse the name of an existing file, it has the same content."""
+        if max_length and len(name) > max_length:
+            raise SuspiciousFileOperation(
+                f'Storage name "{name}" is longer than {max_length} '
+                'characters.')
+        return name
+
+    def _save(self, name, content):
+        """
+        Write new content atomically, skipping files already stored. A
+        file deleted meanwhile as unreferenced is written again.
+        """
+        try:
+            # Mark the file as in use again, so neither the orphaned media
+            # cleanup nor the deletion of a released image removes it.
+            os.utime(self.path(name))
+            return name
+        except FileNotFoundError:
+            pass
+        temporary_name = super()._save(f'{name}.{uuid.uuid4().hex}', content)
+        os.replace(self.path(temporary_name), self.path(name))
+        return name
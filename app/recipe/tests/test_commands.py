@@ -0,0 +1,337 @@
+"""Recipe app management command tests."""
+
+from datetime import timedelta
+from decimal import Decimal
+import hashlib
+import os
+import shutil
+
+from django.contrib.auth import get_user_model
+from django.core.files.base import ContentFile
+from django.core.files.storage import FileSystemStorage
+from django.core.management import call_command
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.test import override_settings
+from django.test import TestCase
+from django.utils import timezone
+
+from recipe.models import (
+    Ingredient,
+    IngredientImage,
+    Recipe,
+    RecipeImage,
+    RecipeImageUpload,
+    RecipeSimilarity,
+    Tag,
+    image_storage,
+)
+
+from io import BytesIO, StringIO
+
+from PIL import Image
+
+
+TESTS_FILE_DIR = '/vol/web/test_data'
+
+
+def create_recipe(user, **params):
+    """Creates and returns new recipe"""
+    defaults = {
+        "title": "Sample recipe title",
+        "time_minutes": 5,
+        "description": "Sample recipe description",
+        "price": Decimal('34.12'),
+    }
+    defaults.update(params)
+    return Recipe.objects.create(user=user, **defaults)
+
+
+def content_name(directory, content, extension=".jpg"):
+    """Return the content addressed name of some bytes."""
+    digest = hashlib.sha256(content).hexdigest()
+    return f"{directory}/{digest[:2]}/{digest[2:4]}/{digest}{extension}"
+
+
+@override_settings(MEDIA_ROOT=(TESTS_FILE_DIR + '/media'))
+class MigrateImageLayoutTests(TestCase):
+    """Test moving images into the sharded layout."""
+
+    def setUp(self):
+        self.user = get_user_model().objects.create_user(
+            "user@example.com", "testPass123")
+        self.recipe = create_recipe(user=self.user)
+        self.ingredient = Ingredient.objects.create(
+            user=self.user, name="Sample Ingredient")
+        self.legacy_storage = FileSystemStorage()
+
+    def tearDown(self):
+        """Delete the temporary directory for storing test data."""
+        try:
+            shutil.rmtree(TESTS_FILE_DIR)
+        except OSError:
+            pass
+
+    def create_legacy_file(self, name, content):
+        """Store a file under its legacy name and return the name."""
+        return self.legacy_storage.save(name, ContentFile(content))
+
+    def test_images_moved_into_their_namespaces(self):
+        """Test legacy recipe and ingredient images are copied and renamed."""
+        recipe_name = self.create_legacy_file(
+            f"uploads/recipes/{self.recipe.id}/a.jpg", b"recipe")
+        ingredient_name = self.create_legacy_file(
+            f"uploads/recipes/{self.ingredient.id}/b.jpg", b"ingredient")
+        recipe_image = RecipeImage.objects.create(
+            recipe=self.recipe, image=recipe_name)
+        ingredient_image = IngredientImage.objects.create(
+            ingredient=self.ingredient, image=ingredient_name)
+
+        call_command("migrate_image_layout", stdout=StringIO())
+
+        recipe_image.refresh_from_db()
+        ingredient_image.refresh_from_db()
+        self.assertEqual(
+            recipe_image.image.name,
+            content_name("uploads/recipes", b"recipe"))
+        self.assertEqual(
+            ingredient_image.image.name,
+            content_name("uploads/ingredients", b"ingredient"))
+        self.assertTrue(image_storage.exists(recipe_image.image.name))
+        self.assertTrue(image_storage.exists(ingredient_image.image.name))
+        self.assertTrue(self.legacy_storage.exists(recipe_name))
+
+    def test_migration_is_resumable(self):
+        """Test images already in the layout are not processed again."""
+        name = self.create_legacy_file("uploads/recipes/1/a.jpg", b"recipe")
+        RecipeImage.objects.create(recipe=self.recipe, image=name)
+        call_command("migrate_image_layout", stdout=StringIO())
+
+        out = StringIO()
+        call_command("migrate_image_layout", stdout=out)
+
+        self.assertIn("Migrated 0 images.", out.getvalue())
+
+    def test_delete_source_keeps_shared_files(self):
+        """Test old files are only deleted once nothing references them."""
+        name = self.create_legacy_file("uploads/recipes/1/a.jpg", b"recipe")
+        RecipeImage.objects.create(recipe=self.recipe, image=name)
+        IngredientImage.objects.create(
+            ingredient=self.ingredient, image=name)
+
+        call_command(
+            "migrate_image_layout", "--batch-size=1", "--delete-source",
+            stdout=StringIO())
+
+        self.assertFalse(self.legacy_storage.exists(name))
+        self.assertEqual(RecipeImage.objects.filter(image=name).count(), 0)
+        self.assertEqual(IngredientImage.objects.filter(image=name).count(), 0)
+
+    def test_missing_files_left_unchanged(self):
+        """Test rows whose file is missing keep their name."""
+        image = RecipeImage.objects.create(
+            recipe=self.recipe, image="uploads/recipes/1/missing.jpg")
+        out = StringIO()
+
+        call_command("migrate_image_layout", stdout=out)
+
+        image.refresh_from_db()
+        self.assertEqual(image.image.name, "uploads/recipes/1/missing.jpg")
+        self.assertIn("1 images have no file", out.getvalue())
+
+
+@override_settings(MEDIA_ROOT=(TESTS_FILE_DIR + '/media'))
+class GenerateImageMetadataTests(TestCase):
+    """Test filling in the metadata of existing images."""
+
+    def setUp(self):
+        self.user = get_user_model().objects.create_user(
+            "user@example.com", "testPass123")
+        self.recipe = create_recipe(user=self.user)
+
+    def tearDown(self):
+        """Delete the temporary directory for storing test data."""
+        try:
+            shutil.rmtree(TESTS_FILE_DIR)
+        except OSError:
+            pass
+
+    def test_metadata_generated_for_existing_images(self):
+        """Test images stored without metadata get it generated."""
+        image_file = BytesIO()
+        Image.new("RGB", (400, 200)).save(image_file, format="JPEG")
+        image = RecipeImage.objects.create(
+            recipe=self.recipe,
+            image=SimpleUploadedFile("image.jpg", image_file.getvalue()))
+        RecipeImage.objects.filter(id=image.id).update(
+            width=None, height=None, size=None, placeholder="",
+            renditions=[])
+        out = StringIO()
+
+        call_command("generate_image_metadata", stdout=out)
+
+        image.refresh_from_db()
+        self.assertEqual((image.width, image.height), (400, 200))
+        self.assertEqual(len(image.renditions), 2)
+        self.assertTrue(image.placeholder)
+        self.assertIn("Generated metadata for 1 images.", out.getvalue())
+
+    def test_missing_files_reported(self):
+        """Test rows whose file is missing are reported."""
+        RecipeImage.objects.create(
+            recipe=self.recipe, image="uploads/recipes/1/missing.jpg")
+        out = StringIO()
+
+        call_command("generate_image_metadata", stdout=out)
+
+        self.assertIn("1 images have no readable file.", out.getvalue())
+
+
+@override_settings(
+    MEDIA_ROOT=(TESTS_FILE_DIR + '/media'),
+    CHUNKED_UPLOAD_ROOT=(TESTS_FILE_DIR + '/chunked_uploads'),
+)
+class CleanupMediaTests(TestCase):
+    """Test deleting orphaned media files."""
+
+    def setUp(self):
+        self.user = get_user_model().objects.create_user(
+            "user@example.com", "testPass123")
+        self.recipe = create_recipe(user=self.user)
+        image_file = BytesIO()
+        Image.new("RGB", (400, 200)).save(image_file, format="JPEG")
+        self.image = RecipeImage.objects.create(
+            recipe=self.recipe,
+            image=SimpleUploadedFile("image.jpg", image_file.getvalue()))
+        self.orphan = image_storage.save(
+            "uploads/recipes/image.jpg", ContentFile(b"orphan"))
+        self.orphan_rendition = image_storage.save_derived(
+            self.orphan.replace(".jpg", "_w160.jpg"), ContentFile(b"small"))
+
+    def tearDown(self):
+        """Delete the temporary directory for storing test data."""
+        try:
+            shutil.rmtree(TESTS_FILE_DIR)
+        except OSError:
+            pass
+
+    def test_orphaned_files_deleted(self):
+        """Test unreferenced files and renditions are deleted."""
+        out = StringIO()
+
+        call_command(
+            "cleanup_media", "--min-age=0", "--batch-size=1", stdout=out)
+
+        self.assertFalse(image_storage.exists(self.orphan))
+        self.assertFalse(image_storage.exists(self.orphan_rendition))
+        self.assertTrue(image_storage.exists(self.image.image.name))
+        for rendition in self.image.renditions:
+            self.assertTrue(image_storage.exists(rendition["name"]))
+        self.assertIn("Deleted 2 orphaned files", out.getvalue())
+
+    def test_dry_run_reports_orphans(self):
+        """Test a dry run lists orphaned files without deleting them."""
+        out = StringIO()
+
+        call_command("cleanup_media", "--min-age=0", "--dry-run", stdout=out)
+
+        self.assertTrue(image_storage.exists(self.orphan))
+        self.assertIn(f"Would delete {self.orphan}", out.getvalue())
+        self.assertIn("Would delete 2 orphaned files", out.getvalue())
+
+    def test_recent_files_kept(self):
+        """Test files modified recently are not deleted."""
+        call_command("cleanup_media", stdout=StringIO())
+
+        self.assertTrue(image_storage.exists(self.orphan))
+
+    def test_abandoned_uploads_deleted(self):
+        """Test old resumable uploads and their partial files are deleted."""
+        os.makedirs(TESTS_FILE_DIR + '/chunked_uploads')
+        uploads = []
+        for created in [timezone.now() - timedelta(days=2), timezone.now()]:
+            upload = RecipeImageUpload.objects.create(
+                recipe=self.recipe, filename="image.jpg", size=10)
+            RecipeImageUpload.objects.filter(id=upload.id).update(
+                created=created)
+            open(upload.path, "wb").close()
+            uploads.append(upload)
+
+        call_command("cleanup_media", "--min-age=0", stdout=StringIO())
+
+        self.assertFalse(
+            RecipeImageUpload.objects.filter(id=uploads[0].id).exists())
+        self.assertFalse(os.path.exists(uploads[0].path))
+        self.assertTrue(os.path.exists(uploads[1].path))
+
+
+class BenchmarkRecipeFiltersTests(TestCase):
+    """Test benchmarking the recipe range filters."""
+
+    def test_benchmark_prints_plans_and_rolls_back(self):
+        """Test each scenario is explained and no data is left behind."""
+        out = StringIO()
+
+        call_command(
+            "benchmark_recipe_filters", "--recipes=100", "--repeat=1",
+            stdout=out)
+
+        self.assertIn("time_max=30&price_max=10", out.getvalue())
+        self.assertIn("Execution Time", out.getvalue())
+        self.assertFalse(Recipe.objects.exists())
+        self.assertFalse(get_user_model().objects.exists())
+
+
+class BuildRecipeSimilaritiesTests(TestCase):
+    """Test rebuilding the similar recipes index."""
+
+    def test_index_rebuilt_from_links(self):
+        """Test stale rows are replaced by Jaccard scores within a user."""
+        user = get_user_model().objects.create_user("user@example.com")
+        other_user = get_user_model().objects.create_user(
+            "other@example.com")
+        tags = [Tag.objects.create(user=user, name=f"Tag {i}")
+                for i in range(3)]
+        recipe1 = create_recipe(user)
+        recipe2 = create_recipe(user)
+        recipe3 = create_recipe(user)
+        other_recipe = create_recipe(other_user)
+        recipe1.tags.add(*tags)
+        recipe2.tags.add(tags[0], tags[1])
+        recipe3.tags.add(tags[2])
+        # Links across users must never be reported as similar.
+        other_recipe.tags.add(tags[0])
+        RecipeSimilarity.objects.create(
+            recipe=recipe2, similar=recipe3, score=1)
+        out = StringIO()
+
+        call_command("build_recipe_similarities", stdout=out)
+
+        self.assertEqual(
+            list(RecipeSimilarity.objects.filter(recipe=recipe1).order_by(
+                "-score").values_list("similar", "score")),
+            [(recipe2.id, 2 / 3), (recipe3.id, 1 / 3)],
+        )
+        self.assertEqual(
+            list(RecipeSimilarity.objects.filter(
+                recipe=recipe2).values_list("similar", "score")),
+            [(recipe1.id, 2 / 3)],
+        )
+        self.assertFalse(RecipeSimilarity.objects.filter(
+            similar=other_recipe).exists())
+        self.assertIn("Stored 4 similarities", out.getvalue())
+
+
+class BenchmarkRecipeScalingTests(TestCase):
+    """Test benchmarking the scaling of recipe ingredient lines."""
+
+    def test_benchmark_scales_lines_and_rolls_back(self):
+        """Test every generated line is scaled and no data is left behind."""
+        out = StringIO()
+
+        call_command(
+            "benchmark_recipe_scaling", "--lines=25", "--recipes=5",
+            "--repeat=1", stdout=out)
+
+        self.assertIn("25 ingredient lines of 5 recipes", out.getvalue())
+        self.assertFalse(Recipe.objects.exists())
+        self.assertFalse(get_user_model().objects.exists())
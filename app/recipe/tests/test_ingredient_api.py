@@ -8,7 +8,9 @@ from django.urls import reverse
 
 from recipe.models import (
     Ingredient,
+    IngredientImage,
     Recipe,
+    RecipeIngredient,
 )
 from recipe.serializers import IngredientSerializer
 
@@ -24,6 +26,33 @@ def ingredient_detail_url(ingredient_id):
     return reverse("recipe:ingredient-detail", args=[ingredient_id])
 
 
+def ingredient_attach_url(ingredient_id):
+    """Return the URL attaching a ingredient to recipes."""
+    return reverse('recipe:ingredient-attach', args=[ingredient_id])
+
+
+def ingredient_detach_url(ingredient_id):
+    """Return the URL detaching a ingredient from recipes."""
+    return reverse('recipe:ingredient-detach', args=[ingredient_id])
+
+
+def ingredient_merge_url(ingredient_id):
+    """Return the URL merging ingredients into a ingredient."""
+    return reverse('recipe:ingredient-merge', args=[ingredient_id])
+
+
+def create_recipe(user, **params):
+    """Creates and returns new recipe"""
+    defaults = {
+        "title": "Sample recipe title",
+        "time_minutes": 5,
+        "description": "Sample recipe description",
+        "price": Decimal("34.12"),
+    }
+    defaults.update(params)
+    return Recipe.objects.create(user=user, **defaults)
+
+
 def create_ingredient(user, **params):
     """Creates and returns new ingredient"""
     defaults = {
@@ -293,3 +322,138 @@ class PrivateIngredientAPITests(TestCase):
         response = self.client.get(INGREDIENTS_URL, params)
 
         self.assertEqual(len(response.data), 2)
+
+    def test_attach_ingredient_to_recipes_returns_200(self):
+        """Test a ingredient is linked to many recipes with one insert."""
+        ingredient = create_ingredient(user=self.user1)
+        recipes = [create_recipe(user=self.user1) for _ in range(3)]
+        recipes[0].ingredients.add(ingredient)
+        other_recipe = create_recipe(user=self.user2)
+        payload = {"ids": [recipe.id for recipe in recipes] + [
+            other_recipe.id]}
+
+        with self.assertNumQueries(3):
+            response = self.client.post(
+                ingredient_attach_url(ingredient.id), payload, format="json")
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data["count"], 2)
+        self.assertEqual(response.data["recipe_count"], 3)
+        self.assertEqual(
+            set(ingredient.recipes.all()), set(recipes))
+
+    def test_detach_ingredient_from_recipes_returns_200(self):
+        """Test a ingredient is unlinked from the given recipes only."""
+        ingredient = create_ingredient(user=self.user1)
+        recipes = [create_recipe(user=self.user1) for _ in range(3)]
+        for recipe in recipes:
+            recipe.ingredients.add(ingredient)
+        payload = {"ids": [recipes[0].id, recipes[1].id]}
+
+        response = self.client.post(
+            ingredient_detach_url(ingredient.id), payload, format="json")
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data["count"], 2)
+        self.assertEqual(response.data["recipe_count"], 1)
+        self.assertEqual(list(ingredient.recipes.all()), [recipes[2]])
+
+    def test_attach_other_user_ingredient_returns_404(self):
+        """Test users cannot link ingredients of other users."""
+        ingredient = create_ingredient(user=self.user2)
+        recipe = create_recipe(user=self.user1)
+
+        response = self.client.post(
+            ingredient_attach_url(ingredient.id), {"ids": [recipe.id]},
+            format="json")
+
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+        self.assertFalse(recipe.ingredients.exists())
+
+    def test_create_ingredient_with_name_differing_by_case_returns_400(self):
+        """Test names are unique per user regardless of case."""
+        create_ingredient(user=self.user1, name="Tomato")
+        create_ingredient(user=self.user2, name="Basil")
+
+        response = self.client.post(INGREDIENTS_URL, {"name": " tomato "})
+        other_response = self.client.post(INGREDIENTS_URL, {"name": "BASIL"})
+
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn("name", response.data)
+        self.assertEqual(
+            other_response.status_code, status.HTTP_201_CREATED)
+
+    def test_merge_ingredients_returns_200(self):
+        """Test recipes of merged ingredients move to the target ingredient."""
+        target = create_ingredient(user=self.user1, name="Tomato")
+        source1 = create_ingredient(user=self.user1, name="Roma tomato")
+        source2 = create_ingredient(user=self.user1, name="Tomatoes")
+        other_ingredient = create_ingredient(user=self.user2, name="TOMATO")
+        recipe1 = create_recipe(user=self.user1)
+        recipe2 = create_recipe(user=self.user1)
+        recipe1.ingredients.add(target, source1)
+        recipe2.ingredients.add(source2)
+        payload = {"ids": [source1.id, source2.id, other_ingredient.id]}
+
+        response = self.client.post(
+            ingredient_merge_url(target.id), payload, format="json")
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data["recipe_count"], 2)
+        self.assertEqual(set(target.recipes.all()), {recipe1, recipe2})
+        self.assertFalse(Ingredient.objects.filter(
+            id__in=[source1.id, source2.id]).exists())
+        self.assertTrue(
+            Ingredient.objects.filter(id=other_ingredient.id).exists())
+
+    def test_attach_ingredient_appends_to_recipe(self):
+        """Test an attached ingredient is listed after existing ones."""
+        recipe = create_recipe(user=self.user1)
+        first = create_ingredient(user=self.user1, name="Milk")
+        second = create_ingredient(user=self.user1, name="Flour")
+        recipe.ingredients.add(first, through_defaults={"position": 0})
+        recipe.ingredients.add(second, through_defaults={"position": 1})
+        ingredient = create_ingredient(user=self.user1, name="Salt")
+
+        response = self.client.post(
+            ingredient_attach_url(ingredient.id), {"ids": [recipe.id]},
+            format="json")
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        link = RecipeIngredient.objects.get(
+            recipe=recipe, ingredient=ingredient)
+        self.assertEqual((link.position, link.quantity, link.unit),
+                         (2, None, ""))
+
+    def test_merge_ingredients_keeps_quantities(self):
+        """Test moved links keep their quantity, unit and position."""
+        target = create_ingredient(user=self.user1, name="Tomato")
+        source = create_ingredient(user=self.user1, name="Tomatoes")
+        recipe = create_recipe(user=self.user1)
+        recipe.ingredients.add(source, through_defaults={
+            "quantity": Decimal("2.5"), "unit": "kg", "position": 3})
+
+        response = self.client.post(
+            ingredient_merge_url(target.id), {"ids": [source.id]},
+            format="json")
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        link = RecipeIngredient.objects.get(recipe=recipe)
+        self.assertEqual(
+            (link.ingredient, link.quantity, link.unit, link.position),
+            (target, Decimal("2.5"), "kg", 3))
+
+    def test_merge_ingredients_moves_images(self):
+        """Test images of merged ingredients move to the target."""
+        target = create_ingredient(user=self.user1, name="Tomato")
+        source = create_ingredient(user=self.user1, name="Tomatoes")
+        image = IngredientImage.objects.create(
+            ingredient=source, image="uploads/ingredients/tomato.jpg")
+
+        response = self.client.post(
+            ingredient_merge_url(target.id), {"ids": [source.id]},
+            format="json")
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        image.refresh_from_db()
+        self.assertEqual(image.ingredient, target)
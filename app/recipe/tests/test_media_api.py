@@ -0,0 +1,219 @@
+"""Protected media API tests."""
+
+from decimal import Decimal
+from io import BytesIO
+import shutil
+import time
+from unittest.mock import patch
+
+from django.contrib.auth import get_user_model
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.test import override_settings
+from django.test import TestCase
+from django.urls import reverse
+
+from recipe.media import MEDIA_URL_MAX_AGE, sign_media_url
+from recipe.models import (
+    Ingredient,
+    IngredientImage,
+    Recipe,
+    RecipeImage,
+)
+
+from PIL import Image
+
+from rest_framework import status
+from rest_framework.test import APIClient
+
+
+TESTS_FILE_DIR = '/vol/web/test_data'
+
+
+def media_url(name):
+    """Return the URL serving a media file."""
+    return reverse('media', args=[name])
+
+
+def create_recipe(user, **params):
+    """Creates and returns new recipe"""
+    defaults = {
+        "title": "Sample recipe title",
+        "time_minutes": 5,
+        "description": "Sample recipe description",
+        "price": Decimal('34.12'),
+    }
+    defaults.update(params)
+    return Recipe.objects.create(user=user, **defaults)
+
+
+def create_image_file(content=b"image-bytes"):
+    """Creates and returns an uploaded file."""
+    return SimpleUploadedFile("image.jpg", content, "image/jpeg")
+
+
+@override_settings(
+    MEDIA_ROOT=(TESTS_FILE_DIR + '/media'),
+    MEDIA_ACCEL_REDIRECT_PREFIX='/protected-media/',
+)
+class MediaAPITests(TestCase):
+    """Test serving uploaded images."""
+
+    def setUp(self):
+        self.client = APIClient()
+        self.user1 = get_user_model().objects.create_user(
+            "user1@example.com", "testPass123")
+        self.user2 = get_user_model().objects.create_user(
+            "user2@example.com", "testPass123")
+        recipe = create_recipe(user=self.user1)
+        self.recipe_image = RecipeImage.objects.create(
+            recipe=recipe, image=create_image_file())
+        ingredient = Ingredient.objects.create(
+            user=self.user1, name="Sample Ingredient")
+        self.ingredient_image = IngredientImage.objects.create(
+            ingredient=ingredient,
+            image=create_image_file(b"ingredient-image-bytes"))
+
+    def tearDown(self):
+        """Delete the temporary directory for storing test data."""
+        try:
+            shutil.rmtree(TESTS_FILE_DIR)
+        except OSError:
+            pass
+
+    def test_anonymous_user_cannot_get_media_returns_401(self):
+        """Test unsigned media requires authentication."""
+        response = self.client.get(media_url(self.recipe_image.image.name))
+
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+        self.assertNotIn("X-Accel-Redirect", response)
+
+    def test_owner_gets_recipe_image_through_nginx(self):
+        """Test owners are redirected to the internal media location."""
+        self.client.force_authenticate(self.user1)
+        name = self.recipe_image.image.name
+
+        response = self.client.get(media_url(name))
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(
+            response["X-Accel-Redirect"], f"/protected-media/{name}")
+        self.assertEqual(response["Content-Type"], "image/jpeg")
+
+    def test_owner_gets_ingredient_image_through_nginx(self):
+        """Test ingredient images are served to their owners."""
+        self.client.force_authenticate(self.user1)
+        name = self.ingredient_image.image.name
+
+        response = self.client.get(media_url(name))
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(
+            response["X-Accel-Redirect"], f"/protected-media/{name}")
+
+    def test_other_user_cannot_get_media_returns_404(self):
+        """Test images are not served to users who do not own them."""
+        self.client.force_authenticate(self.user2)
+
+        response = self.client.get(media_url(self.recipe_image.image.name))
+
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+        self.assertNotIn("X-Accel-Redirect", response)
+
+    def test_signed_url_grants_access(self):
+        """Test a signed image URL works without authentication."""
+        name = self.recipe_image.image.name
+        url = sign_media_url(media_url(name), name)
+
+        response = self.client.get(url)
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(
+            response["X-Accel-Redirect"], f"/protected-media/{name}")
+        self.assertEqual(
+            response["Cache-Control"],
+            f"private, max-age={MEDIA_URL_MAX_AGE}, immutable")
+
+    def test_expired_signature_returns_404(self):
+        """Test a signed image URL stops working once it has expired."""
+        name = self.recipe_image.image.name
+        issued = time.time() - 2 * MEDIA_URL_MAX_AGE - 1
+        with patch("recipe.media.time.time", lambda: issued):
+            url = sign_media_url(media_url(name), name)
+
+        response = self.client.get(url)
+
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_signed_url_stable_within_window(self):
+        """Test a file is signed with the same URL for a whole window."""
+        name = self.recipe_image.image.name
+        start = time.time() // MEDIA_URL_MAX_AGE * MEDIA_URL_MAX_AGE
+        urls = []
+        for now in [start, start + MEDIA_URL_MAX_AGE - 1]:
+            with patch("recipe.media.time.time", lambda: now):
+                urls.append(sign_media_url(media_url(name), name))
+
+        self.assertEqual(urls[0], urls[1])
+
+    def test_signed_url_valid_for_max_age(self):
+        """Test a URL signed at the end of a window lasts the max age."""
+        name = self.recipe_image.image.name
+        issued = time.time() - MEDIA_URL_MAX_AGE + 60
+        with patch("recipe.media.time.time", lambda: issued):
+            url = sign_media_url(media_url(name), name)
+
+        response = self.client.get(url)
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+    def test_tampered_signature_returns_404(self):
+        """Test a signature issued for one file does not unlock another."""
+        url = sign_media_url(
+            media_url(self.ingredient_image.image.name),
+            self.recipe_image.image.name)
+
+        response = self.client.get(url)
+
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_serialized_image_url_is_signed(self):
+        """Test image URLs returned by the API can be fetched directly."""
+        self.client.force_authenticate(self.user1)
+        recipe = self.recipe_image.recipe
+        url = reverse("recipe:recipe-images-list", args=[recipe.id])
+
+        image_url = self.client.get(url).data[0]["image"]
+        self.client.force_authenticate(None)
+        response = self.client.get(image_url)
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+    def test_owner_gets_image_rendition(self):
+        """Test renditions are served to the owner of their image."""
+        image_file = BytesIO()
+        Image.new("RGB", (400, 200)).save(image_file, format="JPEG")
+        recipe_image = RecipeImage.objects.create(
+            recipe=self.recipe_image.recipe,
+            image=create_image_file(image_file.getvalue()))
+        name = recipe_image.renditions[0]["name"]
+
+        self.client.force_authenticate(self.user2)
+        other_response = self.client.get(media_url(name))
+        self.client.force_authenticate(self.user1)
+        response = self.client.get(media_url(name))
+
+        self.assertEqual(
+            other_response.status_code, status.HTTP_404_NOT_FOUND)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(
+            response["X-Accel-Redirect"], f"/protected-media/{name}")
+
+    @override_settings(MEDIA_ACCEL_REDIRECT_PREFIX='')
+    def test_media_streamed_without_redirect_prefix(self):
+        """Test Django streams the file itself when nginx is not in front."""
+        self.client.force_authenticate(self.user1)
+
+        response = self.client.get(media_url(self.recipe_image.image.name))
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(b"".join(response.streaming_content), b"image-bytes")
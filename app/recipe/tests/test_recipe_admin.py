@@ -1,12 +1,19 @@
 """Recipe admin tests"""
 from decimal import Decimal
+from io import BytesIO
 
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.forms import modelform_factory
 from django.test import TestCase, Client
 from django.contrib.auth import get_user_model
 from django.urls import reverse
 
+from PIL import Image
+
+from recipe.admin import ImageInlineForm
 from recipe.models import (
-    Recipe, Tag, Ingredient)
+    Recipe, RecipeImage, RecipeSimilarity, Tag, Ingredient)
+from recipe.stats import get_stats
 
 
 def create_recipe(user, **params):
@@ -81,6 +88,122 @@ class RecipeAdminSiteTests(TestCase):
 
         self.assertEqual(response.status_code, 200)
 
+    def test_list_editable_saves_with_bulk_update(self):
+        """Test rows edited on the list page are saved together."""
+        recipe = create_recipe(user=self.admin_user)
+        url = reverse('admin:recipe_recipe_changelist')
+        payload = {
+            'form-TOTAL_FORMS': 2,
+            'form-INITIAL_FORMS': 2,
+            '_save': 'Save',
+        }
+        for index, (item, price) in enumerate(
+            [(self.recipe, '1.00'), (recipe, '2.00')]
+        ):
+            payload[f'form-{index}-id'] = item.id
+            payload[f'form-{index}-price'] = price
+            payload[f'form-{index}-time_minutes'] = 30
+
+        response = self.client.post(url, payload)
+
+        self.assertEqual(response.status_code, 302)
+        self.recipe.refresh_from_db()
+        recipe.refresh_from_db()
+        self.assertEqual(self.recipe.price, Decimal('1.00'))
+        self.assertEqual(recipe.price, Decimal('2.00'))
+        self.assertEqual(recipe.time_minutes, 30)
+
+    def test_list_editable_invalidates_stats(self):
+        """Test cached statistics change after rows are edited in bulk."""
+        self.assertEqual(get_stats(self.admin_user)['average_price'],
+                         Decimal('34.12'))
+        url = reverse('admin:recipe_recipe_changelist')
+        payload = {
+            'form-TOTAL_FORMS': 1,
+            'form-INITIAL_FORMS': 1,
+            'form-0-id': self.recipe.id,
+            'form-0-price': '10.00',
+            'form-0-time_minutes': 45,
+            '_save': 'Save',
+        }
+
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.post(url, payload)
+
+        self.assertEqual(response.status_code, 302)
+        stats = get_stats(self.admin_user)
+        self.assertEqual(stats['average_price'], Decimal('10.00'))
+        self.assertEqual(stats['average_time_minutes'], 45)
+
+    def test_tag_inline_refreshes_similar_recipes(self):
+        """Test links saved by the inlines refresh the similar recipes."""
+        tag = create_tag(user=self.admin_user)
+        other = create_recipe(user=self.admin_user, title='Other')
+        with self.captureOnCommitCallbacks(execute=True):
+            other.tags.add(tag)
+        url = reverse('admin:recipe_recipe_change', args=[self.recipe.id])
+        payload = {
+            'user': self.admin_user.id,
+            'title': self.recipe.title,
+            'time_minutes': self.recipe.time_minutes,
+            'servings': self.recipe.servings,
+            'price': self.recipe.price,
+            'description': self.recipe.description,
+            'link': self.recipe.link,
+            'Recipe_tags-TOTAL_FORMS': 1,
+            'Recipe_tags-INITIAL_FORMS': 0,
+            'Recipe_tags-0-recipe': self.recipe.id,
+            'Recipe_tags-0-tag': tag.id,
+            'recipe_ingredients-TOTAL_FORMS': 0,
+            'recipe_ingredients-INITIAL_FORMS': 0,
+            'images-TOTAL_FORMS': 0,
+            'images-INITIAL_FORMS': 0,
+        }
+
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.post(url, payload)
+
+        self.assertEqual(response.status_code, 302)
+        self.assertTrue(RecipeSimilarity.objects.filter(
+            recipe=self.recipe, similar=other).exists())
+
+    def test_delete_selected_recipes(self):
+        """Test deleting recipes from the list page removes their links."""
+        tag = create_tag(user=self.admin_user)
+        self.recipe.tags.add(tag)
+        url = reverse('admin:recipe_recipe_changelist')
+
+        response = self.client.post(url, {
+            'action': 'delete_selected',
+            '_selected_action': [self.recipe.id],
+            'post': 'yes',
+        })
+
+        self.assertEqual(response.status_code, 302)
+        self.assertFalse(Recipe.objects.filter(id=self.recipe.id).exists())
+        self.assertFalse(tag.recipes.exists())
+
+    def test_image_inline_strips_exif(self):
+        """Test images uploaded on the admin site lose their EXIF data."""
+        image_file = BytesIO()
+        exif = Image.Exif()
+        exif[0x010f] = "Camera maker"
+        Image.new("RGB", (20, 10)).save(
+            image_file, format="JPEG", exif=exif)
+        form_class = modelform_factory(
+            RecipeImage, form=ImageInlineForm, fields=["image"])
+
+        form = form_class(
+            data={},
+            files={"image": SimpleUploadedFile(
+                "photo.jpg", image_file.getvalue())},
+            instance=RecipeImage(recipe=self.recipe),
+        )
+
+        self.assertTrue(form.is_valid())
+        with Image.open(form.cleaned_data["image"]) as image:
+            self.assertFalse(image.getexif())
+
 
 class TagAdminSiteTests(TestCase):
     """TagAdmin site tests."""
@@ -123,6 +246,22 @@ class TagAdminSiteTests(TestCase):
 
         self.assertEqual(response.status_code, 200)
 
+    def test_add_tag_with_name_differing_in_case(self):
+        """Test a duplicate name in another case is a form error."""
+        url = reverse('admin:recipe_tag_add')
+        payload = {
+            'user': self.admin_user.id,
+            'name': self.tag.name.upper(),
+            'Recipe_tags-TOTAL_FORMS': 0,
+            'Recipe_tags-INITIAL_FORMS': 0,
+        }
+
+        response = self.client.post(url, payload)
+
+        self.assertEqual(response.status_code, 200)
+        self.assertContains(response, 'already exists')
+        self.assertEqual(Tag.objects.count(), 1)
+
 
 class IngredientAdminSiteTests(TestCase):
     """IngredientAdmin site tests."""
@@ -1,13 +1,20 @@
 """Recipe API tests."""
 
 from decimal import Decimal
+import hashlib
+from io import BytesIO
 import os
 import shutil
 import tempfile
+from unittest.mock import patch
 
 from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.db import DatabaseError, connection, transaction
 from django.test import override_settings
 from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
 from django.urls import reverse
 
 from PIL import Image
@@ -17,18 +24,27 @@ from recipe.models import (
     IngredientImage,
     Recipe,
     RecipeImage,
+    RecipeIngredient,
+    RecipeSimilarity,
     Tag,
 )
 from recipe.serializers import (
+    MAX_FILTER_IDS,
     RecipeDetailSerializer,
     RecipeSerializer,
 )
+from recipe.similarity import refresh_similarities_on_commit
 
 from rest_framework import status
 from rest_framework.test import APIClient
 
 
 RECIPES_URL = reverse('recipe:recipe-list')
+RECIPES_BULK_URL = reverse('recipe:recipe-bulk')
+RECIPES_PANTRY_URL = reverse('recipe:recipe-pantry')
+RECIPE_STATS_URL = reverse('recipe:stats')
+SHOPPING_LIST_URL = reverse('recipe:recipe-shopping-list')
+RECIPES_SCALE_URL = reverse('recipe:recipe-scale')
 TESTS_FILE_DIR = '/vol/web/test_data'
 
 
@@ -37,6 +53,16 @@ def recipe_detail_url(recipe_id):
     return reverse('recipe:recipe-detail', args=[recipe_id])
 
 
+def recipe_similar_url(recipe_id):
+    """Create and return a similar recipes URL."""
+    return reverse('recipe:recipe-similar', args=[recipe_id])
+
+
+def recipe_clone_url(recipe_id):
+    """Return the URL copying a recipe."""
+    return reverse('recipe:recipe-clone', args=[recipe_id])
+
+
 def recipe_images_list_url(recipe_id):
     """Create and return a URL for a recipe's images."""
     return reverse("recipe:recipe-images-list", args=[recipe_id])
@@ -47,6 +73,11 @@ def recipe_image_detail_url(recipe_id, image_id):
     return reverse("recipe:recipe-images-detail", args=[recipe_id, image_id])
 
 
+def recipe_images_batch_url(recipe_id):
+    """Create and return a URL for uploading a batch of recipe images."""
+    return reverse("recipe:recipe-images-batch", args=[recipe_id])
+
+
 def ingredient_images_list_url(ingredient_id):
     """Create and return a URL for an ingredient's images."""
     return reverse("recipe:ingredient-images-list", args=[ingredient_id])
@@ -58,6 +89,14 @@ def ingredient_image_detail_url(ingredient_id, image_id):
         "recipe:ingredient-images-detail", args=[ingredient_id, image_id])
 
 
+def create_image_file(color="red"):
+    """Creates and returns an uploaded JPEG image."""
+    image_file = BytesIO()
+    Image.new("RGB", (10, 10), color).save(image_file, format="JPEG")
+    return SimpleUploadedFile(
+        f"{color}.jpg", image_file.getvalue(), "image/jpeg")
+
+
 def create_recipe(user, **params):
     """Creates and returns new recipe"""
     defaults = {
@@ -188,6 +227,14 @@ class PrivateRecipeAPITests(TestCase):
                 {"name": "NewIngredient2"}
             ]}
 
+    def tearDown(self):
+        """Delete the temporary directory for storing test data."""
+
+        try:
+            shutil.rmtree(TESTS_FILE_DIR)
+        except OSError:
+            pass
+
     def test_recipe_list_is_limited_to_user_and_returns_200(self):
         """Test that authenticated user can get only his/her recipes."""
         create_recipe(user=self.user1)
@@ -346,6 +393,191 @@ class PrivateRecipeAPITests(TestCase):
         self.assertEqual(response.status_code, status.HTTP_204_NO_CONTENT)
         self.assertFalse(Recipe.objects.filter(id=recipe.id).exists())
 
+    @override_settings(MEDIA_ROOT=(TESTS_FILE_DIR + '/media'))
+    @override_settings(MEDIA_DELETE_MIN_AGE=0)
+    def test_delete_recipe_deletes_relations(self):
+        """Test deleting a recipe removes its links, images and files."""
+        recipe = create_recipe(user=self.user1)
+        tag = Tag.objects.create(user=self.user1, name="Sample Tag")
+        ingredient = Ingredient.objects.create(
+            user=self.user1, name="Sample Ingredient")
+        recipe.tags.add(tag)
+        recipe.ingredients.add(ingredient)
+        recipe_image = RecipeImage.objects.create(
+            recipe=recipe, image=create_image_file())
+
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.delete(recipe_detail_url(recipe.id))
+
+        self.assertEqual(response.status_code, status.HTTP_204_NO_CONTENT)
+        self.assertFalse(Recipe.objects.filter(id=recipe.id).exists())
+        self.assertFalse(tag.recipes.exists())
+        self.assertFalse(ingredient.recipes.exists())
+        self.assertFalse(
+            RecipeImage.objects.filter(id=recipe_image.id).exists())
+        self.assertFalse(os.path.exists(recipe_image.image.path))
+        self.assertTrue(Tag.objects.filter(id=tag.id).exists())
+
+    def test_recipe_list_filtered_by_price_and_time(self):
+        """Test range filters combine with each other and with tags."""
+        tag = Tag.objects.create(user=self.user1, name="Quick")
+        match = create_recipe(
+            user=self.user1, price=Decimal("8.00"), time_minutes=20)
+        match.tags.add(tag)
+        untagged = create_recipe(
+            user=self.user1, price=Decimal("8.00"), time_minutes=20)
+        too_slow = create_recipe(
+            user=self.user1, price=Decimal("8.00"), time_minutes=45)
+        too_slow.tags.add(tag)
+        too_expensive = create_recipe(
+            user=self.user1, price=Decimal("12.00"), time_minutes=20)
+        too_expensive.tags.add(tag)
+
+        response = self.client.get(RECIPES_URL, {
+            "price_max": "10", "time_max": 30, "tags": str(tag.id)})
+        range_response = self.client.get(RECIPES_URL, {
+            "price_min": "8", "price_max": "8.00", "time_min": 45})
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual([item["id"] for item in response.data], [match.id])
+        self.assertEqual(
+            [item["id"] for item in range_response.data], [too_slow.id])
+        self.assertNotIn(
+            untagged.id, [item["id"] for item in response.data])
+
+    def test_recipe_list_invalid_range_returns_400(self):
+        """Test malformed and inverted ranges are rejected."""
+        for params, field in [
+            ({"price_max": "cheap"}, "price_max"),
+            ({"time_max": -1}, "time_max"),
+            ({"price_min": "10", "price_max": "5"}, "price_max"),
+        ]:
+            response = self.client.get(RECIPES_URL, params)
+
+            self.assertEqual(
+                response.status_code, status.HTTP_400_BAD_REQUEST)
+            self.assertIn(field, response.data)
+
+    def test_recipe_list_ordering(self):
+        """Test recipes are sorted by a whitelisted field, ties by ID."""
+        cheap = create_recipe(user=self.user1, price=Decimal("1.00"))
+        tied1 = create_recipe(user=self.user1, price=Decimal("5.00"))
+        tied2 = create_recipe(user=self.user1, price=Decimal("5.00"))
+
+        ascending = self.client.get(RECIPES_URL, {"ordering": "price"})
+        descending = self.client.get(RECIPES_URL, {"ordering": "-price"})
+
+        self.assertEqual(
+            [recipe["id"] for recipe in ascending.data],
+            [cheap.id, tied1.id, tied2.id])
+        self.assertEqual(
+            [recipe["id"] for recipe in descending.data],
+            [tied2.id, tied1.id, cheap.id])
+
+    def test_recipe_list_ignores_unknown_ordering(self):
+        """Test fields outside the whitelist fall back to newest first."""
+        recipe1 = create_recipe(user=self.user1, description="b")
+        recipe2 = create_recipe(user=self.user1, description="a")
+
+        response = self.client.get(RECIPES_URL, {"ordering": "description"})
+
+        self.assertEqual(
+            [recipe["id"] for recipe in response.data],
+            [recipe2.id, recipe1.id])
+
+    def test_bulk_update_recipes_returns_200(self):
+        """Test changes are applied to many recipes with one update."""
+        recipes = [create_recipe(user=self.user1) for _ in range(3)]
+        other_recipe = create_recipe(user=self.user2)
+        payload = {
+            "ids": [recipes[0].id, recipes[1].id, other_recipe.id],
+            "price": "9.50",
+            "time_minutes": 45,
+        }
+
+        with self.assertNumQueries(1):
+            response = self.client.patch(
+                RECIPES_BULK_URL, payload, format="json")
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data["count"], 2)
+        for recipe in recipes + [other_recipe]:
+            recipe.refresh_from_db()
+        self.assertEqual(recipes[0].price, Decimal("9.50"))
+        self.assertEqual(recipes[1].time_minutes, 45)
+        self.assertEqual(recipes[2].time_minutes, 5)
+        self.assertEqual(other_recipe.price, Decimal("34.12"))
+
+    def test_bulk_update_without_changes_returns_400(self):
+        """Test a bulk update needs IDs and at least one valid field."""
+        recipe = create_recipe(user=self.user1)
+
+        for payload in [
+            {"ids": [recipe.id]},
+            {"ids": [], "price": "1.00"},
+            {"ids": [recipe.id], "price": "-1.00"},
+        ]:
+            response = self.client.patch(
+                RECIPES_BULK_URL, payload, format="json")
+
+            self.assertEqual(
+                response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_bulk_delete_recipes_returns_200(self):
+        """Test many recipes of the user are deleted at once."""
+        recipes = [create_recipe(user=self.user1) for _ in range(2)]
+        recipes[0].tags.add(Tag.objects.create(user=self.user1, name="Tag"))
+        other_recipe = create_recipe(user=self.user2)
+        payload = {"ids": [recipe.id for recipe in recipes] + [
+            other_recipe.id]}
+
+        response = self.client.delete(
+            RECIPES_BULK_URL, payload, format="json")
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data["count"], 2)
+        self.assertFalse(Recipe.objects.filter(user=self.user1).exists())
+        self.assertTrue(Recipe.objects.filter(id=other_recipe.id).exists())
+
+    @override_settings(MEDIA_ROOT=(TESTS_FILE_DIR + '/media'))
+    def test_clone_recipe_returns_201(self):
+        """Test cloning copies a recipe with its links and images."""
+        recipe = create_recipe(user=self.user1)
+        for name in ["Tag1", "Tag2"]:
+            recipe.tags.add(Tag.objects.create(user=self.user1, name=name))
+        for name in ["Ingredient1", "Ingredient2"]:
+            recipe.ingredients.add(
+                Ingredient.objects.create(user=self.user1, name=name))
+        recipe_image = RecipeImage.objects.create(
+            recipe=recipe, image=create_image_file())
+
+        with self.assertNumQueries(12):
+            response = self.client.post(recipe_clone_url(recipe.id))
+
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        clone = Recipe.objects.get(id=response.data["id"])
+        self.assertNotEqual(clone.id, recipe.id)
+        self.assertEqual(clone.user, self.user1)
+        self.assertEqual(clone.title, recipe.title)
+        self.assertEqual(clone.price, recipe.price)
+        self.assertEqual(set(clone.tags.all()), set(recipe.tags.all()))
+        self.assertEqual(
+            set(clone.ingredients.all()), set(recipe.ingredients.all()))
+        clone_image = clone.images.get()
+        self.assertNotEqual(clone_image.id, recipe_image.id)
+        self.assertEqual(clone_image.image.name, recipe_image.image.name)
+        self.assertEqual(clone_image.width, recipe_image.width)
+        self.assertEqual(len(response.data["tags"]), 2)
+
+    def test_clone_other_user_recipe_returns_404(self):
+        """Test users cannot clone recipes of other users."""
+        recipe = create_recipe(user=self.user2)
+
+        response = self.client.post(recipe_clone_url(recipe.id))
+
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+        self.assertEqual(Recipe.objects.filter(user=self.user1).count(), 0)
+
     def test_delete_other_user_recipe_returns_404(self):
         """Test authenticated user cannot delete another user's recipe"""
         recipe = create_recipe(user=self.user2)
@@ -603,6 +835,23 @@ class PrivateRecipeAPITests(TestCase):
                     payload_ingredient_array[index][key],
                     recipe.ingredients.all()[index].name)
 
+    def test_create_recipe_reuses_tags_differing_by_case(self):
+        """Test tags are matched to existing ones ignoring case."""
+        tag = create_tag(name="Vegan", user=self.user1)
+        payload = {
+            "title": "Sample recipe title",
+            "time_minutes": 5,
+            "price": Decimal("5.00"),
+            "description": "Sample recipe description",
+            "tags": [{"name": "vegan"}],
+        }
+
+        response = self.client.post(RECIPES_URL, payload, format="json")
+
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(Tag.objects.filter(user=self.user1).count(), 1)
+        self.assertEqual(response.data["tags"][0]["id"], tag.id)
+
     def test_create_recipe_with_existing_ingredients(self):
         """
         Test users can create recipe with existing ingredients.
@@ -982,6 +1231,28 @@ class PrivateRecipeImageTests(TestCase):
         self.assertIn("image", response.data)
         self.assertTrue(os.path.exists(recipe_image.image.path))
 
+    @override_settings(MEDIA_ROOT=(TESTS_FILE_DIR + '/media'))
+    def test_upload_same_image_to_recipes_stores_one_file(self):
+        """Test identical uploads are deduplicated by content hash."""
+
+        recipe = create_recipe(user=self.user1)
+        with tempfile.NamedTemporaryFile(suffix=".jpg") as image_file:
+            img = Image.new("RGB", (10, 10))
+            img.save(image_file, format="JPEG")
+            for recipe_id in [self.recipe.id, recipe.id]:
+                image_file.seek(0)
+                response = self.client.post(
+                    recipe_images_list_url(recipe_id),
+                    {"image": image_file}, format="multipart")
+                self.assertEqual(
+                    response.status_code, status.HTTP_201_CREATED)
+            image_file.seek(0)
+            digest = hashlib.sha256(image_file.read()).hexdigest()
+
+        names = set(RecipeImage.objects.values_list("image", flat=True))
+        self.assertEqual(names, {
+            f"uploads/recipes/{digest[:2]}/{digest[2:4]}/{digest}.jpg"})
+
     @override_settings(MEDIA_ROOT=(TESTS_FILE_DIR + '/media'))
     def test_create_recipe_image_is_limited_to_recipe_owner(self):
         """Test non-owner of a recipe cannot upload an image."""
@@ -1032,6 +1303,209 @@ class PrivateRecipeImageTests(TestCase):
         self.assertIn("image", response.data)
         self.assertFalse(recipe_image.exists())
 
+    @override_settings(MEDIA_ROOT=(TESTS_FILE_DIR + '/media'))
+    def test_oversized_recipe_image_upload_fails(self):
+        """Test uploads over the size limit are rejected while streaming."""
+
+        url = recipe_images_list_url(self.recipe.id)
+        with tempfile.NamedTemporaryFile(suffix=".jpg") as image_file:
+            image_file.write(os.urandom(2001 * 1024))
+            image_file.seek(0)
+            payload = {"image": image_file}
+
+            response = self.client.post(url, payload, format="multipart")
+
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn("2000KB", response.data["detail"])
+        self.assertFalse(RecipeImage.objects.exists())
+
+    @override_settings(MEDIA_ROOT=(TESTS_FILE_DIR + '/media'))
+    def test_decompression_bomb_upload_fails(self):
+        """Test images with too many pixels are rejected from the header."""
+
+        url = recipe_images_list_url(self.recipe.id)
+        with tempfile.NamedTemporaryFile(suffix=".png") as image_file:
+            img = Image.new("1", (6000, 5000))
+            img.save(image_file, format="PNG")
+            image_file.seek(0)
+            payload = {"image": image_file}
+
+            response = self.client.post(url, payload, format="multipart")
+
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn("pixels", response.data["detail"])
+        self.assertFalse(RecipeImage.objects.exists())
+
+    @override_settings(MEDIA_ROOT=(TESTS_FILE_DIR + '/media'))
+    def test_recipe_image_exif_is_stripped(self):
+        """Test EXIF metadata is removed and orientation applied."""
+
+        url = recipe_images_list_url(self.recipe.id)
+        with tempfile.NamedTemporaryFile(suffix=".jpg") as image_file:
+            img = Image.new("RGB", (20, 10))
+            exif = Image.Exif()
+            exif[0x0112] = 6  # Rotated 90 degrees.
+            exif[0x010f] = "Camera maker"
+            img.save(image_file, format="JPEG", exif=exif)
+            image_file.seek(0)
+            payload = {"image": image_file}
+
+            response = self.client.post(url, payload, format="multipart")
+
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        recipe_image = RecipeImage.objects.get(id=response.data["id"])
+        with Image.open(recipe_image.image.path) as stored:
+            self.assertFalse(stored.getexif())
+            self.assertEqual(stored.size, (10, 20))
+
+    @override_settings(MEDIA_ROOT=(TESTS_FILE_DIR + '/media'))
+    def test_upload_recipe_image_stores_metadata(self):
+        """Test dimensions, placeholder and renditions are stored."""
+
+        url = recipe_images_list_url(self.recipe.id)
+        with tempfile.NamedTemporaryFile(suffix=".jpg") as image_file:
+            Image.new("RGB", (700, 350), "red").save(
+                image_file, format="JPEG")
+            image_file.seek(0)
+            payload = {"image": image_file}
+
+            response = self.client.post(url, payload, format="multipart")
+
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        recipe_image = RecipeImage.objects.get(id=response.data["id"])
+        self.assertEqual(response.data["width"], 700)
+        self.assertEqual(response.data["height"], 350)
+        self.assertEqual(
+            response.data["size"], os.path.getsize(recipe_image.image.path))
+        self.assertTrue(
+            response.data["placeholder"].startswith("data:image/jpeg;base64,"))
+        self.assertEqual(
+            [(rendition["width"], rendition["height"])
+             for rendition in response.data["renditions"]],
+            [(160, 80), (320, 160), (640, 320)])
+        self.assertIn("?sig=", response.data["renditions"][0]["url"])
+        for rendition in recipe_image.renditions:
+            with recipe_image.image.storage.open(rendition["name"]) as file:
+                with Image.open(file) as stored:
+                    self.assertEqual(
+                        stored.size,
+                        (rendition["width"], rendition["height"]))
+
+    @override_settings(MEDIA_ROOT=(TESTS_FILE_DIR + '/media'))
+    def test_small_recipe_image_has_no_renditions(self):
+        """Test images narrower than every rendition are not resized."""
+
+        url = recipe_images_list_url(self.recipe.id)
+
+        response = self.client.post(
+            url, {"image": create_image_file()}, format="multipart")
+
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(response.data["width"], 10)
+        self.assertEqual(response.data["renditions"], [])
+
+    @override_settings(MEDIA_ROOT=(TESTS_FILE_DIR + '/media'))
+    @override_settings(MEDIA_DELETE_MIN_AGE=0)
+    def test_deleting_recipe_image_deletes_renditions(self):
+        """Test renditions are deleted along with their image file."""
+
+        image_file = BytesIO()
+        Image.new("RGB", (400, 200)).save(image_file, format="JPEG")
+        recipe_image = RecipeImage.objects.create(
+            recipe=self.recipe,
+            image=SimpleUploadedFile("image.jpg", image_file.getvalue()))
+        storage = recipe_image.image.storage
+        names = [rendition["name"] for rendition in recipe_image.renditions]
+
+        with self.captureOnCommitCallbacks(execute=True):
+            recipe_image.delete()
+
+        self.assertEqual(len(names), 2)
+        self.assertFalse(any(storage.exists(name) for name in names))
+
+    @override_settings(MEDIA_ROOT=(TESTS_FILE_DIR + '/media'))
+    def test_batch_upload_recipe_images(self):
+        """Test uploading many images inserts them with one query."""
+
+        url = recipe_images_batch_url(self.recipe.id)
+        files = [create_image_file(color) for color in ["red", "blue"]]
+
+        # The insert runs in a transaction, a savepoint inside the test.
+        with self.assertNumQueries(4):
+            response = self.client.post(
+                url, {"images": files}, format="multipart")
+
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(len(response.data), 2)
+        recipe_images = RecipeImage.objects.filter(recipe=self.recipe)
+        self.assertEqual(
+            {image.id for image in recipe_images},
+            {result["id"] for result in response.data})
+        for recipe_image in recipe_images:
+            self.assertTrue(os.path.exists(recipe_image.image.path))
+            self.assertEqual(recipe_image.width, 10)
+
+    @override_settings(
+        MEDIA_ROOT=(TESTS_FILE_DIR + '/media'), MEDIA_DELETE_MIN_AGE=0)
+    def test_failed_batch_upload_deletes_stored_files(self):
+        """Test files of a batch whose insert fails are deleted."""
+
+        url = recipe_images_batch_url(self.recipe.id)
+        files = [create_image_file(color) for color in ["red", "blue"]]
+
+        with patch.object(
+            RecipeImage.objects, "bulk_create", side_effect=DatabaseError,
+        ), self.assertRaises(DatabaseError), \
+                self.captureOnCommitCallbacks(execute=True):
+            self.client.post(url, {"images": files}, format="multipart")
+
+        stored = [
+            name for _, _, names in os.walk(TESTS_FILE_DIR + '/media')
+            for name in names
+        ]
+        self.assertEqual(stored, [])
+
+    @override_settings(MEDIA_ROOT=(TESTS_FILE_DIR + '/media'))
+    def test_batch_upload_reports_invalid_files(self):
+        """Test invalid files in a batch are reported without failing it."""
+
+        url = recipe_images_batch_url(self.recipe.id)
+        invalid_file = SimpleUploadedFile("notes.jpg", b"not an image")
+        files = [create_image_file("red"), invalid_file]
+
+        response = self.client.post(
+            url, {"images": files}, format="multipart")
+
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertIn("id", response.data[0])
+        self.assertEqual(response.data[1]["name"], "notes.jpg")
+        self.assertIn("image", response.data[1]["errors"])
+        self.assertEqual(
+            RecipeImage.objects.filter(recipe=self.recipe).count(), 1)
+
+    @override_settings(MEDIA_ROOT=(TESTS_FILE_DIR + '/media'))
+    def test_batch_upload_is_limited_to_recipe_owner(self):
+        """Test non-owner of a recipe cannot upload a batch of images."""
+
+        recipe = create_recipe(user=self.user2)
+        url = recipe_images_batch_url(recipe.id)
+
+        response = self.client.post(
+            url, {"images": [create_image_file("red")]}, format="multipart")
+
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+        self.assertFalse(RecipeImage.objects.filter(recipe=recipe).exists())
+
+    def test_batch_upload_without_files_fails(self):
+        """Test a batch upload needs at least one file."""
+
+        url = recipe_images_batch_url(self.recipe.id)
+
+        response = self.client.post(url, {}, format="multipart")
+
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn("images", response.data)
+
     @override_settings(MEDIA_ROOT=(TESTS_FILE_DIR + '/media'))
     def test_get_recipe_image_list_successful(self):
         """Test view all images of a recipe is successful."""
@@ -1286,6 +1760,25 @@ class PrivateIngredientImageTests(TestCase):
         self.assertIn("image", response.data)
         self.assertTrue(os.path.exists(ingredient_image.image.path))
 
+    @override_settings(MEDIA_ROOT=(TESTS_FILE_DIR + '/media'))
+    def test_batch_upload_ingredient_images(self):
+        """Test uploading many images to an ingredient at once."""
+
+        url = reverse(
+            "recipe:ingredient-images-batch", args=[self.ingredient.id])
+        files = [create_image_file(color) for color in ["red", "blue"]]
+
+        response = self.client.post(
+            url, {"images": files}, format="multipart")
+
+        ingredient_images = IngredientImage.objects.filter(
+            ingredient=self.ingredient)
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(ingredient_images.count(), 2)
+        for ingredient_image in ingredient_images:
+            self.assertTrue(ingredient_image.image.name.startswith(
+                "uploads/ingredients/"))
+
     @override_settings(MEDIA_ROOT=(TESTS_FILE_DIR + '/media'))
     def test_create_ingredient_image_is_limited_to_ingredient_owner(self):
         """Test non-owner of an ingredient cannot upload an image."""
@@ -1531,3 +2024,653 @@ class RecipeFilterTests(TestCase):
         self.assertIn(self.serializer1.data, response.data)
         self.assertIn(self.serializer2.data, response.data)
         self.assertNotIn(self.serializer3.data, response.data)
+
+    def test_filter_recipes_by_repeated_ids(self):
+        """Test a recipe matching several or repeated IDs is listed once."""
+        self.recipe1.tags.add(self.tag2)
+        params = {"tags": f"{self.tag1.id}, {self.tag2.id},{self.tag1.id},"}
+
+        response = self.client.get(RECIPES_URL, params)
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(
+            sorted(item["id"] for item in response.data),
+            [self.recipe1.id, self.recipe2.id])
+
+    def test_filter_recipes_by_empty_list_is_ignored(self):
+        """Test an empty ID list does not filter recipes."""
+
+        response = self.client.get(RECIPES_URL, {"tags": ""})
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(len(response.data), 3)
+
+    def test_filter_recipes_by_invalid_ids_returns_400(self):
+        """Test malformed and overly long ID lists are rejected."""
+        too_many = ",".join(str(i) for i in range(1, MAX_FILTER_IDS + 2))
+        for params, field in [
+            ({"tags": "1,abc"}, "tags"),
+            ({"tags": "-1"}, "tags"),
+            ({"ingredients": "0"}, "ingredients"),
+            ({"ingredients": str(2 ** 63)}, "ingredients"),
+            ({"tags": too_many}, "tags"),
+        ]:
+            response = self.client.get(RECIPES_URL, params)
+
+            self.assertEqual(
+                response.status_code, status.HTTP_400_BAD_REQUEST)
+            self.assertIn(field, response.data)
+
+
+class RecipePantryTests(TestCase):
+    """Test ranking recipes by the ingredients at hand."""
+
+    def setUp(self):
+        self.user = get_user_model().objects.create_user(
+            "email@example.com",
+            "password123",
+        )
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        self.eggs = create_ingredient(user=self.user, name="Eggs")
+        self.flour = create_ingredient(user=self.user, name="Flour")
+        self.milk = create_ingredient(user=self.user, name="Milk")
+        self.sugar = create_ingredient(user=self.user, name="Sugar")
+
+    def test_pantry_ranks_recipes_by_coverage(self):
+        """Test recipes are ranked by covered, then missing ingredients."""
+        pancakes = create_recipe(user=self.user, title="Pancakes")
+        pancakes.ingredients.add(self.eggs, self.flour, self.milk)
+        omelette = create_recipe(user=self.user, title="Omelette")
+        omelette.ingredients.add(self.eggs, self.milk)
+        cake = create_recipe(user=self.user, title="Cake")
+        cake.ingredients.add(self.eggs, self.flour, self.sugar, self.milk)
+        unrelated = create_recipe(user=self.user, title="Candy")
+        unrelated.ingredients.add(self.sugar)
+        other_user = get_user_model().objects.create_user(
+            "other@example.com", "password123")
+        other_recipe = create_recipe(user=other_user)
+        other_recipe.ingredients.add(self.eggs)
+        params = {"ingredients": f"{self.eggs.id},{self.milk.id}"}
+
+        with self.assertNumQueries(1):
+            response = self.client.get(RECIPES_PANTRY_URL, params)
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(
+            [item["id"] for item in response.data],
+            [omelette.id, pancakes.id, cake.id])
+        self.assertEqual(response.data[0]["missing_ingredients"], [])
+        self.assertEqual(response.data[2]["ingredient_count"], 4)
+        self.assertEqual(response.data[2]["matched_count"], 2)
+        self.assertEqual(
+            response.data[2]["missing_ingredients"],
+            [
+                {"id": self.flour.id, "name": "Flour"},
+                {"id": self.sugar.id, "name": "Sugar"},
+            ],
+        )
+
+    def test_pantry_limits_results(self):
+        """Test only the top recipes are returned."""
+        for _ in range(3):
+            create_recipe(user=self.user).ingredients.add(self.eggs)
+
+        response = self.client.get(
+            RECIPES_PANTRY_URL, {"ingredients": self.eggs.id, "limit": 2})
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(len(response.data), 2)
+
+    def test_pantry_invalid_params_returns_400(self):
+        """Test missing ingredients and bad limits are rejected."""
+        for params, field in [
+            ({}, "ingredients"),
+            ({"ingredients": ","}, "ingredients"),
+            ({"ingredients": "eggs"}, "ingredients"),
+            ({"ingredients": self.eggs.id, "limit": 0}, "limit"),
+        ]:
+            response = self.client.get(RECIPES_PANTRY_URL, params)
+
+            self.assertEqual(
+                response.status_code, status.HTTP_400_BAD_REQUEST)
+            self.assertIn(field, response.data)
+
+
+class RecipeSimilarityTests(TestCase):
+    """Test the similar recipes index and endpoint."""
+
+    def setUp(self):
+        self.user = get_user_model().objects.create_user(
+            "email@example.com",
+            "password123",
+        )
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        self.tag = create_tag(user=self.user, name="Dinner")
+        self.eggs = create_ingredient(user=self.user, name="Eggs")
+        self.milk = create_ingredient(user=self.user, name="Milk")
+
+    def test_similar_recipes_follow_recipe_changes(self):
+        """Test the index is refreshed once the changes commit."""
+        recipe = create_recipe(user=self.user)
+        close = create_recipe(user=self.user)
+        far = create_recipe(user=self.user)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            recipe.tags.add(self.tag)
+            recipe.ingredients.add(self.eggs, self.milk)
+            close.ingredients.add(self.eggs, self.milk)
+            far.tags.add(self.tag)
+
+        self.assertEqual(
+            list(RecipeSimilarity.objects.filter(recipe=recipe).order_by(
+                "-score").values_list("similar", flat=True)),
+            [close.id, far.id],
+        )
+
+        with self.captureOnCommitCallbacks(execute=True):
+            close.ingredients.clear()
+
+        self.assertEqual(
+            list(RecipeSimilarity.objects.filter(
+                recipe=recipe).values_list("similar", flat=True)),
+            [far.id],
+        )
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.tag.delete()
+
+        self.assertFalse(RecipeSimilarity.objects.exists())
+
+    def test_similar_recipes_refreshed_after_api_writes(self):
+        """Test attach, bulk delete and clone keep the index current."""
+        recipe = create_recipe(user=self.user)
+        other = create_recipe(user=self.user)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.post(
+                reverse("recipe:tag-attach", args=[self.tag.id]),
+                {"ids": [recipe.id, other.id]}, format="json")
+
+        self.assertTrue(RecipeSimilarity.objects.filter(
+            recipe=recipe, similar=other, score=1).exists())
+
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.post(recipe_clone_url(recipe.id))
+
+        clone_id = response.data["id"]
+        self.assertTrue(RecipeSimilarity.objects.filter(
+            recipe=recipe, similar=clone_id).exists())
+        self.assertTrue(RecipeSimilarity.objects.filter(
+            recipe=clone_id).exists())
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.delete(
+                RECIPES_BULK_URL, {"ids": [other.id]}, format="json")
+
+        self.assertEqual(
+            list(RecipeSimilarity.objects.filter(
+                recipe=recipe).values_list("similar", flat=True)),
+            [clone_id],
+        )
+
+    def test_ingredient_lines_saved_directly_refresh_index(self):
+        """Test lines saved without the relation manager refresh the index."""
+        recipe = create_recipe(user=self.user)
+        other = create_recipe(user=self.user)
+        with self.captureOnCommitCallbacks(execute=True):
+            other.ingredients.add(self.eggs)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            line = RecipeIngredient.objects.create(
+                recipe=recipe, ingredient=self.eggs)
+
+        self.assertTrue(RecipeSimilarity.objects.filter(
+            recipe=recipe, similar=other).exists())
+
+        with self.captureOnCommitCallbacks(execute=True):
+            line.delete()
+
+        self.assertFalse(RecipeSimilarity.objects.filter(
+            recipe=recipe).exists())
+
+    def test_rolled_back_changes_are_not_refreshed(self):
+        """Test recipes are refreshed once, unless their changes roll back."""
+        with patch("recipe.similarity.refresh_similarities") as refresh, \
+                self.captureOnCommitCallbacks(execute=True) as callbacks:
+            with transaction.atomic():
+                refresh_similarities_on_commit([1])
+                transaction.set_rollback(True)
+            refresh_similarities_on_commit([2])
+            refresh_similarities_on_commit([2, 3])
+
+        self.assertEqual(len(callbacks), 1)
+        refresh.assert_called_once_with({2, 3})
+
+    def test_refresh_failure_is_logged(self):
+        """Test a failed refresh after the commit does not raise."""
+        with patch(
+            "recipe.similarity.refresh_similarities",
+            side_effect=DatabaseError,
+        ), self.assertLogs("recipe.similarity", "ERROR"), \
+                self.captureOnCommitCallbacks(execute=True):
+            refresh_similarities_on_commit([1])
+
+    def test_list_similar_recipes(self):
+        """Test the similar recipes are read in score order."""
+        recipe = create_recipe(user=self.user)
+        close = create_recipe(user=self.user, title="Close")
+        far = create_recipe(user=self.user, title="Far")
+        close.tags.add(self.tag)
+        RecipeSimilarity.objects.bulk_create([
+            RecipeSimilarity(recipe=recipe, similar=far, score=0.25),
+            RecipeSimilarity(recipe=recipe, similar=close, score=0.5),
+        ])
+
+        with self.assertNumQueries(4):
+            response = self.client.get(recipe_similar_url(recipe.id))
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(
+            [item["score"] for item in response.data], [0.5, 0.25])
+        self.assertEqual(response.data[0]["recipe"]["title"], "Close")
+        self.assertEqual(
+            response.data[0]["recipe"]["tags"][0]["name"], "Dinner")
+
+    def test_similar_recipes_of_other_user_returns_404(self):
+        """Test the similar recipes of another user's recipe are hidden."""
+        other_user = get_user_model().objects.create_user(
+            "other@example.com", "password123")
+        recipe = create_recipe(user=other_user)
+
+        response = self.client.get(recipe_similar_url(recipe.id))
+
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+
+class RecipeStatsTests(TestCase):
+    """Test the recipe statistics API."""
+
+    def setUp(self):
+        cache.clear()
+        self.user = get_user_model().objects.create_user(
+            "email@example.com",
+            "password123",
+        )
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def test_stats_computed_for_user(self):
+        """Test counts, averages and top attributes of the user only."""
+        quick = create_tag(user=self.user, name="Quick")
+        vegan = create_tag(user=self.user, name="Vegan")
+        create_tag(user=self.user, name="Unused")
+        eggs = create_ingredient(user=self.user, name="Eggs")
+        recipe1 = create_recipe(
+            user=self.user, price=Decimal("5.00"), time_minutes=10)
+        recipe2 = create_recipe(
+            user=self.user, price=Decimal("10.00"), time_minutes=25)
+        recipe1.tags.add(quick, vegan)
+        recipe2.tags.add(quick)
+        recipe2.ingredients.add(eggs)
+        other_user = get_user_model().objects.create_user(
+            "other@example.com", "password123")
+        create_recipe(user=other_user, price=Decimal("100.00"))
+
+        response = self.client.get(RECIPE_STATS_URL)
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data["recipe_count"], 2)
+        self.assertEqual(response.data["average_price"], Decimal("7.50"))
+        self.assertEqual(
+            response.data["average_time_minutes"], Decimal("17.5"))
+        self.assertEqual(
+            [(tag["name"], tag["recipe_count"])
+             for tag in response.data["top_tags"]],
+            [("Quick", 2), ("Vegan", 1)],
+        )
+        self.assertEqual(
+            response.data["top_ingredients"],
+            [{"id": eggs.id, "name": "Eggs", "recipe_count": 1}])
+
+    def test_stats_without_recipes(self):
+        """Test averages are null for a user without recipes."""
+
+        response = self.client.get(RECIPE_STATS_URL)
+
+        self.assertEqual(response.data["recipe_count"], 0)
+        self.assertIsNone(response.data["average_price"])
+        self.assertEqual(response.data["top_tags"], [])
+
+    def test_stats_cached_until_write(self):
+        """Test cached stats are served until a write commits."""
+        create_recipe(user=self.user)
+        self.client.get(RECIPE_STATS_URL)
+
+        with self.assertNumQueries(0):
+            response = self.client.get(RECIPE_STATS_URL)
+
+        self.assertEqual(response.data["recipe_count"], 1)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.post(RECIPES_URL, {
+                "title": "New recipe",
+                "time_minutes": 5,
+                "price": "1.00",
+                "description": "Description",
+            }, format="json")
+
+        response = self.client.get(RECIPE_STATS_URL)
+
+        self.assertEqual(response.data["recipe_count"], 2)
+
+    def test_stats_invalidated_by_set_based_writes(self):
+        """Test bulk updates and deletes drop the cached stats."""
+        recipe = create_recipe(user=self.user, price=Decimal("5.00"))
+        self.client.get(RECIPE_STATS_URL)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.patch(RECIPES_BULK_URL, {
+                "ids": [recipe.id], "price": "9.00"}, format="json")
+        response = self.client.get(RECIPE_STATS_URL)
+
+        self.assertEqual(response.data["average_price"], Decimal("9.00"))
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.delete(
+                RECIPES_BULK_URL, {"ids": [recipe.id]}, format="json")
+        response = self.client.get(RECIPE_STATS_URL)
+
+        self.assertEqual(response.data["recipe_count"], 0)
+
+    def test_stats_require_authentication(self):
+        """Test authentication is required for the stats."""
+
+        response = APIClient().get(RECIPE_STATS_URL)
+
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+
+
+class ShoppingListTests(TestCase):
+    """Test building shopping lists from several recipes."""
+
+    def setUp(self):
+        self.user = get_user_model().objects.create_user(
+            "email@example.com",
+            "password123",
+        )
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def test_shopping_list_merges_ingredients(self):
+        """Test each ingredient is listed once with its recipes."""
+        eggs = create_ingredient(user=self.user, name="Eggs")
+        flour = create_ingredient(user=self.user, name="Flour")
+        pancakes = create_recipe(user=self.user, title="Pancakes")
+        pancakes.ingredients.add(eggs, flour)
+        omelette = create_recipe(user=self.user, title="Omelette")
+        omelette.ingredients.add(eggs)
+        unselected = create_recipe(user=self.user)
+        unselected.ingredients.add(flour)
+        other_user = get_user_model().objects.create_user(
+            "other@example.com", "password123")
+        other_recipe = create_recipe(user=other_user)
+        other_recipe.ingredients.add(
+            create_ingredient(user=other_user, name="Milk"))
+        params = {"recipes": f"{pancakes.id},{omelette.id},{other_recipe.id}"}
+
+        with self.assertNumQueries(1):
+            response = self.client.get(SHOPPING_LIST_URL, params)
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data, [
+            {
+                "id": eggs.id,
+                "name": "Eggs",
+                "recipe_count": 2,
+                "recipes": [
+                    {"id": omelette.id, "title": "Omelette"},
+                    {"id": pancakes.id, "title": "Pancakes"},
+                ],
+            },
+            {
+                "id": flour.id,
+                "name": "Flour",
+                "recipe_count": 1,
+                "recipes": [{"id": pancakes.id, "title": "Pancakes"}],
+            },
+        ])
+
+    def test_shopping_list_requires_recipes(self):
+        """Test a missing or malformed recipe list is rejected."""
+        for params in [{}, {"recipes": ""}, {"recipes": "1,pancakes"}]:
+            response = self.client.get(SHOPPING_LIST_URL, params)
+
+            self.assertEqual(
+                response.status_code, status.HTTP_400_BAD_REQUEST)
+            self.assertIn("recipes", response.data)
+
+
+class RecipeIngredientQuantityTests(TestCase):
+    """Test quantities, units and order of recipe ingredients."""
+
+    def setUp(self):
+        self.user = get_user_model().objects.create_user(
+            "email@example.com",
+            "password123",
+        )
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def _payload(self, ingredients):
+        """Return a recipe payload with the given ingredients."""
+        return {
+            "title": "Pancakes",
+            "time_minutes": 20,
+            "price": Decimal("4.50"),
+            "description": "Sample recipe description",
+            "ingredients": ingredients,
+        }
+
+    def test_create_recipe_with_quantities(self):
+        """Test ingredients keep their quantity, unit and order."""
+        payload = self._payload([
+            {"name": "Milk", "quantity": "0.250", "unit": "l"},
+            {"name": "Flour", "quantity": "200", "unit": "g"},
+            {"name": "Salt"},
+        ])
+
+        response = self.client.post(RECIPES_URL, payload, format="json")
+
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(
+            [(item["name"], item["quantity"], item["unit"])
+             for item in response.data["ingredients"]],
+            [("Milk", Decimal("0.250"), "l"), ("Flour", Decimal("200"), "g"),
+             ("Salt", None, "")],
+        )
+        links = RecipeIngredient.objects.filter(
+            recipe_id=response.data["id"])
+        self.assertEqual(
+            [(link.ingredient.name, link.position) for link in links],
+            [("Milk", 0), ("Flour", 1), ("Salt", 2)],
+        )
+
+    def test_update_recipe_reorders_ingredients(self):
+        """Test replacing ingredients stores the new order and amounts."""
+        recipe = create_recipe(user=self.user)
+        milk = create_ingredient(user=self.user, name="Milk")
+        flour = create_ingredient(user=self.user, name="Flour")
+        recipe.ingredients.add(milk, flour)
+        payload = {"ingredients": [
+            {"name": "flour", "quantity": "1.5", "unit": "cup"},
+            {"name": "MILK", "quantity": "1", "unit": "cup"},
+        ]}
+
+        response = self.client.patch(
+            recipe_detail_url(recipe.id), payload, format="json")
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(
+            [item["id"] for item in response.data["ingredients"]],
+            [flour.id, milk.id])
+        self.assertEqual(
+            response.data["ingredients"][0]["quantity"], Decimal("1.5"))
+        self.assertEqual(Ingredient.objects.filter(user=self.user).count(), 2)
+
+    def test_duplicate_ingredient_names_are_stored_once(self):
+        """Test names differing by case only link one ingredient."""
+        payload = self._payload([
+            {"name": "Eggs", "quantity": "2"},
+            {"name": "EGGS", "quantity": "3"},
+        ])
+
+        response = self.client.post(RECIPES_URL, payload, format="json")
+
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(len(response.data["ingredients"]), 1)
+        self.assertEqual(
+            response.data["ingredients"][0]["quantity"], Decimal("2"))
+
+    def test_negative_quantity_returns_400(self):
+        """Test quantities cannot be negative."""
+        payload = self._payload([{"name": "Eggs", "quantity": "-1"}])
+
+        response = self.client.post(RECIPES_URL, payload, format="json")
+
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertFalse(Recipe.objects.exists())
+
+    def test_nested_writes_take_constant_queries(self):
+        """Test the number of ingredients does not change the queries."""
+        queries = []
+        for count in [2, 20]:
+            payload = self._payload([
+                {"name": f"Ingredient {count}-{index}", "quantity": "1"}
+                for index in range(count)
+            ])
+            payload["tags"] = [
+                {"name": f"Tag {count}-{index}"} for index in range(count)]
+
+            with self.captureOnCommitCallbacks() as callbacks:
+                with CaptureQueriesContext(connection) as context:
+                    response = self.client.post(
+                        RECIPES_URL, payload, format="json")
+
+            self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+            self.assertTrue(callbacks)
+            queries.append(len(context.captured_queries))
+
+        self.assertEqual(queries[0], queries[1])
+
+
+class RecipeScaleTests(TestCase):
+    """Test scaling and converting the ingredients of several recipes."""
+
+    def setUp(self):
+        self.user = get_user_model().objects.create_user(
+            "email@example.com",
+            "password123",
+        )
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def _add_line(self, recipe, name, quantity, unit, position):
+        """Add an ingredient line to a recipe."""
+        RecipeIngredient.objects.create(
+            recipe=recipe, ingredient=create_ingredient(self.user, name),
+            quantity=quantity, unit=unit, position=position)
+
+    def test_scale_recipes_to_servings(self):
+        """Test quantities scale exactly, keeping units and order."""
+        pancakes = create_recipe(user=self.user, title="Pancakes", servings=4)
+        self._add_line(pancakes, "Milk", Decimal("0.5"), "l", 1)
+        self._add_line(pancakes, "Flour", Decimal("250"), "g", 0)
+        self._add_line(pancakes, "Salt", None, "", 2)
+        omelette = create_recipe(user=self.user, title="Omelette", servings=3)
+        self._add_line(omelette, "Eggs", Decimal("1"), "", 0)
+        empty = create_recipe(user=self.user, title="Empty", servings=2)
+        params = {
+            "recipes": f"{omelette.id},{pancakes.id},{empty.id}",
+            "servings": 6,
+        }
+
+        with self.assertNumQueries(1):
+            response = self.client.get(RECIPES_SCALE_URL, params)
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual([recipe["id"] for recipe in response.data],
+                         [omelette.id, pancakes.id, empty.id])
+        self.assertEqual(response.data[0]["servings"], 6)
+        self.assertEqual(
+            response.data[0]["ingredients"][0]["quantity"], Decimal("2"))
+        self.assertEqual(
+            [(item["name"], item["quantity"], item["unit"])
+             for item in response.data[1]["ingredients"]],
+            [("Flour", Decimal("375"), "g"), ("Milk", Decimal("0.75"), "l"),
+             ("Salt", None, "")],
+        )
+        self.assertEqual(response.data[2]["ingredients"], [])
+
+    def test_scale_recipes_rounds_quantities(self):
+        """Test quantities divided unevenly are rounded to three places."""
+        recipe = create_recipe(user=self.user, servings=3)
+        self._add_line(recipe, "Sugar", Decimal("1"), "cup", 0)
+
+        response = self.client.get(
+            RECIPES_SCALE_URL, {"recipes": recipe.id, "servings": 2})
+
+        self.assertEqual(
+            response.data[0]["ingredients"][0]["quantity"], Decimal("0.667"))
+
+    def test_convert_recipes_between_systems(self):
+        """Test units of the table are converted, others kept."""
+        recipe = create_recipe(user=self.user, servings=2)
+        self._add_line(recipe, "Butter", Decimal("8"), "OZ", 0)
+        self._add_line(recipe, "Milk", Decimal("1"), "cup", 1)
+        self._add_line(recipe, "Salt", Decimal("1"), "pinch", 2)
+
+        metric = self.client.get(
+            RECIPES_SCALE_URL, {"recipes": recipe.id, "system": "metric"})
+        imperial = self.client.get(
+            RECIPES_SCALE_URL, {"recipes": recipe.id, "system": "imperial"})
+
+        self.assertEqual(metric.data[0]["servings"], 2)
+        self.assertEqual(
+            [(item["quantity"], item["unit"])
+             for item in metric.data[0]["ingredients"]],
+            [(Decimal("226.796"), "g"), (Decimal("236.588"), "ml"),
+             (Decimal("1"), "pinch")],
+        )
+        self.assertEqual(
+            [(item["quantity"], item["unit"])
+             for item in imperial.data[0]["ingredients"]],
+            [(Decimal("8"), "OZ"), (Decimal("1"), "cup"),
+             (Decimal("1"), "pinch")],
+        )
+
+    def test_scale_ignores_other_users_recipes(self):
+        """Test recipes of other users are left out."""
+        other_user = get_user_model().objects.create_user(
+            "other@example.com", "password123")
+        recipe = create_recipe(user=other_user)
+
+        response = self.client.get(RECIPES_SCALE_URL, {"recipes": recipe.id})
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data, [])
+
+    def test_scale_rejects_invalid_parameters(self):
+        """Test missing recipes, servings and systems are rejected."""
+        recipe = create_recipe(user=self.user)
+        for params, field in [
+            ({}, "recipes"),
+            ({"recipes": recipe.id, "servings": 0}, "servings"),
+            ({"recipes": recipe.id, "system": "nautical"}, "system"),
+        ]:
+            response = self.client.get(RECIPES_SCALE_URL, params)
+
+            self.assertEqual(
+                response.status_code, status.HTTP_400_BAD_REQUEST)
+            self.assertIn(field, response.data)
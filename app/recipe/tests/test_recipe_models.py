@@ -2,8 +2,15 @@
 Model Tests
 """
 from decimal import Decimal
+import hashlib
+import os
+import shutil
 
 from django.contrib.auth import get_user_model
+from django.core.exceptions import ValidationError
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.db import DatabaseError, transaction
+from django.test import override_settings
 from django.test import TestCase
 
 from recipe.models import (
@@ -15,7 +22,8 @@ from recipe.models import (
 )
 from recipe import models
 
-from unittest.mock import patch
+
+TESTS_FILE_DIR = '/vol/web/test_data'
 
 
 def create_recipe(user, **params):
@@ -86,33 +94,169 @@ class ModelTests(TestCase):
         self.assertEqual(ingredient.user, self.user)
         self.assertEqual(ingredient.name, name)
 
-    @patch("recipe.models.uuid.uuid4")
-    def test_recipe_image_file_name_uuid(self, mock_uuid):
+    def test_names_unique_ignoring_case(self):
+        """Test validation rejects a name the user has in another case."""
+        Ingredient.objects.create(user=self.user, name='Salt')
+        other_user = get_user_model().objects.create(
+            email='other@example.com', password='testPass123')
+
+        with self.assertRaises(ValidationError) as context:
+            Ingredient(user=self.user, name='SALT').full_clean()
+
+        self.assertIn('name', context.exception.message_dict)
+        Ingredient(user=other_user, name='SALT').full_clean()
+        Ingredient.objects.get(name='Salt').full_clean()
+
+    def test_recipe_image_file_path(self):
         """Test generating recipe image path."""
 
         recipe = create_recipe(user=self.user)
 
-        recipe_image = RecipeImage.objects.create(recipe=recipe)
-        uuid = 'test_uuid'
-        mock_uuid.return_value = uuid
+        recipe_image = RecipeImage(recipe=recipe)
         file_path = models.recipe_image_file_path(recipe_image, "example.jpg")
 
-        self.assertEqual(
-            file_path, f"uploads/recipes/{recipe.id}/{uuid}.jpg")
+        self.assertEqual(file_path, "uploads/recipes/image.jpg")
 
-    @patch("recipe.models.uuid.uuid4")
-    def test_ingredient_image_file_name_uuid(self, mock_uuid):
+    def test_ingredient_image_file_path(self):
         """Test generating ingredient image path."""
 
         ingredient = Ingredient.objects.create(
             user=self.user, name="Sample Ingredient")
 
-        ingredient_image = IngredientImage.objects.create(
-            ingredient=ingredient)
-        uuid = 'test_uuid'
-        mock_uuid.return_value = uuid
+        ingredient_image = IngredientImage(ingredient=ingredient)
         file_path = models.ingredient_image_file_path(
             ingredient_image, "example.jpg")
 
+        self.assertEqual(file_path, "uploads/ingredients/image.jpg")
+
+
+@override_settings(MEDIA_ROOT=(TESTS_FILE_DIR + '/media'))
+class ContentAddressedImageTests(TestCase):
+    """Test content addressed image storage."""
+
+    def setUp(self):
+        self.user = get_user_model().objects.create(
+            email='user@example.com',
+            password='testPass123',
+        )
+        self.recipe1 = create_recipe(user=self.user)
+        self.recipe2 = create_recipe(user=self.user)
+
+    def tearDown(self):
+        """Delete the temporary directory for storing test data."""
+        try:
+            shutil.rmtree(TESTS_FILE_DIR)
+        except OSError:
+            pass
+
+    def test_image_named_after_content_hash(self):
+        """Test images are stored under a sharded content hash path."""
+        content = b"image-bytes"
+        digest = hashlib.sha256(content).hexdigest()
+
+        recipe_image = RecipeImage.objects.create(
+            recipe=self.recipe1,
+            image=SimpleUploadedFile("Example.JPG", content))
+
         self.assertEqual(
-            file_path, f"uploads/recipes/{ingredient.id}/{uuid}.jpg")
+            recipe_image.image.name,
+            f"uploads/recipes/{digest[:2]}/{digest[2:4]}/{digest}.jpg")
+        self.assertTrue(os.path.exists(recipe_image.image.path))
+
+    def test_identical_images_stored_once(self):
+        """Test uploading the same bytes twice reuses the stored file."""
+        image1 = RecipeImage.objects.create(
+            recipe=self.recipe1,
+            image=SimpleUploadedFile("a.jpg", b"image-bytes"))
+        image2 = RecipeImage.objects.create(
+            recipe=self.recipe2,
+            image=SimpleUploadedFile("b.jpg", b"image-bytes"))
+
+        self.assertEqual(image1.image.name, image2.image.name)
+        directory = os.path.dirname(image1.image.path)
+        self.assertEqual(os.listdir(directory), [
+            os.path.basename(image1.image.name)])
+
+    @override_settings(MEDIA_DELETE_MIN_AGE=0)
+    def test_shared_file_deleted_with_last_reference(self):
+        """Test a shared file is only deleted with its last image."""
+        image1 = RecipeImage.objects.create(
+            recipe=self.recipe1,
+            image=SimpleUploadedFile("a.jpg", b"image-bytes"))
+        image2 = RecipeImage.objects.create(
+            recipe=self.recipe2,
+            image=SimpleUploadedFile("b.jpg", b"image-bytes"))
+        path = image1.image.path
+
+        with self.captureOnCommitCallbacks(execute=True):
+            image1.delete()
+        self.assertTrue(os.path.exists(path))
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.recipe2.delete()
+        self.assertFalse(RecipeImage.objects.filter(id=image2.id).exists())
+        self.assertFalse(os.path.exists(path))
+
+    def test_recently_reused_file_kept(self):
+        """Test a file an identical upload just reused is not deleted."""
+        image = RecipeImage.objects.create(
+            recipe=self.recipe1,
+            image=SimpleUploadedFile("a.jpg", b"image-bytes"))
+        path = image.image.path
+
+        with self.captureOnCommitCallbacks(execute=True):
+            image.delete()
+
+        self.assertTrue(os.path.exists(path))
+
+    @override_settings(MEDIA_DELETE_MIN_AGE=0)
+    def test_deleted_file_stored_again(self):
+        """Test an upload reusing a file deleted meanwhile writes it again."""
+        image = RecipeImage.objects.create(
+            recipe=self.recipe1,
+            image=SimpleUploadedFile("a.jpg", b"image-bytes"))
+        path = image.image.path
+        with self.captureOnCommitCallbacks(execute=True):
+            image.delete()
+
+        image = RecipeImage.objects.create(
+            recipe=self.recipe2,
+            image=SimpleUploadedFile("b.jpg", b"image-bytes"))
+
+        self.assertEqual(image.image.path, path)
+        with open(path, "rb") as image_file:
+            self.assertEqual(image_file.read(), b"image-bytes")
+
+    @override_settings(MEDIA_DELETE_MIN_AGE=0)
+    def test_replaced_file_deleted_on_commit(self):
+        """Test the old file of an updated image is deleted on commit."""
+        recipe_image = RecipeImage.objects.create(
+            recipe=self.recipe1,
+            image=SimpleUploadedFile("a.jpg", b"old-bytes"))
+        old_path = recipe_image.image.path
+
+        with self.captureOnCommitCallbacks(execute=True) as callbacks:
+            recipe_image.image = SimpleUploadedFile("b.jpg", b"new-bytes")
+            recipe_image.save()
+            self.assertTrue(os.path.exists(old_path))
+
+        self.assertEqual(len(callbacks), 1)
+        self.assertFalse(os.path.exists(old_path))
+        self.assertTrue(os.path.exists(recipe_image.image.path))
+
+    def test_rolled_back_delete_keeps_file(self):
+        """Test the file of an image is kept if its deletion rolls back."""
+        recipe_image = RecipeImage.objects.create(
+            recipe=self.recipe1,
+            image=SimpleUploadedFile("a.jpg", b"image-bytes"))
+
+        with self.captureOnCommitCallbacks(execute=True) as callbacks:
+            try:
+                with transaction.atomic():
+                    recipe_image.delete()
+                    raise DatabaseError("Simulated failure")
+            except DatabaseError:
+                pass
+
+        self.assertEqual(callbacks, [])
+        self.assertTrue(os.path.exists(recipe_image.image.path))
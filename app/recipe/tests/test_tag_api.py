@@ -24,6 +24,33 @@ def tag_detail_url(tag_id):
     return reverse('recipe:tag-detail', args=[tag_id])
 
 
+def tag_attach_url(tag_id):
+    """Return the URL attaching a tag to recipes."""
+    return reverse('recipe:tag-attach', args=[tag_id])
+
+
+def tag_detach_url(tag_id):
+    """Return the URL detaching a tag from recipes."""
+    return reverse('recipe:tag-detach', args=[tag_id])
+
+
+def tag_merge_url(tag_id):
+    """Return the URL merging tags into a tag."""
+    return reverse('recipe:tag-merge', args=[tag_id])
+
+
+def create_recipe(user, **params):
+    """Creates and returns new recipe"""
+    defaults = {
+        "title": "Sample recipe title",
+        "time_minutes": 5,
+        "description": "Sample recipe description",
+        "price": Decimal("34.12"),
+    }
+    defaults.update(params)
+    return Recipe.objects.create(user=user, **defaults)
+
+
 def create_tag(user, **params):
     """Creates and returns new tag"""
     defaults = {
@@ -263,6 +290,7 @@ class PrivateTagAPITests(TestCase):
         self.assertEqual(len(response.data), 1)
         self.assertEqual(
             tag1.id, response.data[0].get("id"))
+        self.assertEqual(response.data[0].get("recipe_count"), 2)
 
     def test_tag_filter_when_assigned_only_is_0(self):
         """Test no filter tags when assigned_only is 0."""
@@ -292,3 +320,106 @@ class PrivateTagAPITests(TestCase):
         response = self.client.get(TAGS_URL, params)
 
         self.assertEqual(len(response.data), 2)
+
+    def test_tag_filter_invalid_assigned_only_returns_400(self):
+        """Test assigned_only only accepts 0 or 1."""
+        for value in ["2", "abc"]:
+            response = self.client.get(TAGS_URL, {"assigned_only": value})
+
+            self.assertEqual(
+                response.status_code, status.HTTP_400_BAD_REQUEST)
+            self.assertIn("assigned_only", response.data)
+
+    def test_attach_tag_to_recipes_returns_200(self):
+        """Test a tag is linked to many recipes with one insert."""
+        tag = create_tag(user=self.user1)
+        recipes = [create_recipe(user=self.user1) for _ in range(3)]
+        recipes[0].tags.add(tag)
+        other_recipe = create_recipe(user=self.user2)
+        payload = {"ids": [recipe.id for recipe in recipes] + [
+            other_recipe.id]}
+
+        with self.assertNumQueries(3):
+            response = self.client.post(
+                tag_attach_url(tag.id), payload, format="json")
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data["count"], 2)
+        self.assertEqual(response.data["recipe_count"], 3)
+        self.assertEqual(
+            set(tag.recipes.all()), set(recipes))
+
+    def test_detach_tag_from_recipes_returns_200(self):
+        """Test a tag is unlinked from the given recipes only."""
+        tag = create_tag(user=self.user1)
+        recipes = [create_recipe(user=self.user1) for _ in range(3)]
+        for recipe in recipes:
+            recipe.tags.add(tag)
+        payload = {"ids": [recipes[0].id, recipes[1].id]}
+
+        response = self.client.post(
+            tag_detach_url(tag.id), payload, format="json")
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data["count"], 2)
+        self.assertEqual(response.data["recipe_count"], 1)
+        self.assertEqual(list(tag.recipes.all()), [recipes[2]])
+
+    def test_attach_other_user_tag_returns_404(self):
+        """Test users cannot link tags of other users."""
+        tag = create_tag(user=self.user2)
+        recipe = create_recipe(user=self.user1)
+
+        response = self.client.post(
+            tag_attach_url(tag.id), {"ids": [recipe.id]},
+            format="json")
+
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+        self.assertFalse(recipe.tags.exists())
+
+    def test_create_tag_with_name_differing_by_case_returns_400(self):
+        """Test names are unique per user regardless of case."""
+        create_tag(user=self.user1, name="Tomato")
+        create_tag(user=self.user2, name="Basil")
+
+        response = self.client.post(TAGS_URL, {"name": " tomato "})
+        other_response = self.client.post(TAGS_URL, {"name": "BASIL"})
+
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn("name", response.data)
+        self.assertEqual(
+            other_response.status_code, status.HTTP_201_CREATED)
+
+    def test_merge_tags_returns_200(self):
+        """Test recipes of merged tags move to the target tag."""
+        target = create_tag(user=self.user1, name="Tomato")
+        source1 = create_tag(user=self.user1, name="Roma tomato")
+        source2 = create_tag(user=self.user1, name="Tomatoes")
+        other_tag = create_tag(user=self.user2, name="TOMATO")
+        recipe1 = create_recipe(user=self.user1)
+        recipe2 = create_recipe(user=self.user1)
+        recipe1.tags.add(target, source1)
+        recipe2.tags.add(source2)
+        payload = {"ids": [source1.id, source2.id, other_tag.id]}
+
+        response = self.client.post(
+            tag_merge_url(target.id), payload, format="json")
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data["recipe_count"], 2)
+        self.assertEqual(set(target.recipes.all()), {recipe1, recipe2})
+        self.assertFalse(
+            Tag.objects.filter(id__in=[source1.id, source2.id]).exists())
+        self.assertTrue(Tag.objects.filter(id=other_tag.id).exists())
+
+    def test_tag_list_ordered_by_recipe_count(self):
+        """Test tags can be sorted by the number of recipes using them."""
+        unused = create_tag(user=self.user1, name="Unused")
+        popular = create_tag(user=self.user1, name="Popular")
+        for _ in range(2):
+            create_recipe(user=self.user1).tags.add(popular)
+
+        response = self.client.get(TAGS_URL, {"ordering": "-recipe_count"})
+
+        self.assertEqual(
+            [tag["id"] for tag in response.data], [popular.id, unused.id])
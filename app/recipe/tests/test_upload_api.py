@@ -0,0 +1,243 @@
+"""Resumable recipe image upload API tests."""
+
+from decimal import Decimal
+from io import BytesIO
+import os
+import shutil
+from unittest.mock import patch
+
+from django.contrib.auth import get_user_model
+from django.test import override_settings
+from django.test import TestCase
+from django.urls import reverse
+
+from PIL import Image
+
+from recipe.models import (
+    Recipe,
+    RecipeImage,
+    RecipeImageUpload,
+)
+from recipe.views import RecipeImageUploadViewSet
+
+from rest_framework import status
+from rest_framework.test import APIClient
+
+
+TESTS_FILE_DIR = '/vol/web/test_data'
+
+
+def uploads_url(recipe_id):
+    """Create and return a URL for a recipe's uploads."""
+    return reverse("recipe:recipe-uploads-list", args=[recipe_id])
+
+
+def upload_detail_url(recipe_id, upload_id):
+    """Create and return a URL for a recipe's upload."""
+    return reverse("recipe:recipe-uploads-detail", args=[recipe_id, upload_id])
+
+
+def upload_finalize_url(recipe_id, upload_id):
+    """Create and return a URL for finalizing a recipe's upload."""
+    return reverse(
+        "recipe:recipe-uploads-finalize", args=[recipe_id, upload_id])
+
+
+def create_recipe(user, **params):
+    """Creates and returns new recipe"""
+    defaults = {
+        "title": "Sample recipe title",
+        "time_minutes": 5,
+        "description": "Sample recipe description",
+        "price": Decimal('34.12'),
+    }
+    defaults.update(params)
+    return Recipe.objects.create(user=user, **defaults)
+
+
+def create_image_bytes():
+    """Creates and returns the bytes of a JPEG image."""
+    image_file = BytesIO()
+    Image.new("RGB", (100, 100), "red").save(image_file, format="JPEG")
+    return image_file.getvalue()
+
+
+@override_settings(
+    MEDIA_ROOT=(TESTS_FILE_DIR + '/media'),
+    CHUNKED_UPLOAD_ROOT=(TESTS_FILE_DIR + '/chunked_uploads'),
+)
+class RecipeImageUploadTests(TestCase):
+    """Tests for resumable recipe image uploads."""
+
+    def setUp(self):
+        self.client = APIClient()
+        self.user1 = get_user_model().objects.create_user(
+            "user1@example.com", "testPass123")
+        self.user2 = get_user_model().objects.create_user(
+            "user2@example.com", "testPass123")
+        self.client.force_authenticate(self.user1)
+        self.recipe = create_recipe(user=self.user1)
+        self.content = create_image_bytes()
+
+    def tearDown(self):
+        """Delete the temporary directory for storing test data."""
+        try:
+            shutil.rmtree(TESTS_FILE_DIR)
+        except OSError:
+            pass
+
+    def create_upload(self):
+        """Start an upload for the image bytes and return its id."""
+        response = self.client.post(
+            uploads_url(self.recipe.id),
+            {"filename": "photo.jpg", "size": len(self.content)})
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        return response.data["id"]
+
+    def put_chunk(self, upload_id, start, end):
+        """Send the bytes between start and end inclusive."""
+        return self.client.put(
+            upload_detail_url(self.recipe.id, upload_id),
+            self.content[start:end + 1],
+            content_type="application/octet-stream",
+            HTTP_CONTENT_RANGE=f"bytes {start}-{end}/{len(self.content)}",
+        )
+
+    def test_chunked_upload_creates_image_on_finalize(self):
+        """Test an image uploaded in chunks is created on finalize."""
+        upload_id = self.create_upload()
+        middle = len(self.content) // 2
+
+        response = self.put_chunk(upload_id, 0, middle - 1)
+        self.assertEqual(response.data["offset"], middle)
+        self.assertFalse(RecipeImage.objects.exists())
+        response = self.put_chunk(upload_id, middle, len(self.content) - 1)
+        self.assertEqual(response.data["offset"], len(self.content))
+        response = self.client.post(
+            upload_finalize_url(self.recipe.id, upload_id))
+
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        recipe_image = RecipeImage.objects.get(id=response.data["id"])
+        self.assertEqual(recipe_image.recipe, self.recipe)
+        with recipe_image.image.open() as image_file:
+            self.assertEqual(image_file.read(), self.content)
+        self.assertFalse(RecipeImageUpload.objects.exists())
+        self.assertEqual(
+            os.listdir(TESTS_FILE_DIR + '/chunked_uploads'), [])
+
+    def test_chunk_not_at_offset_returns_409(self):
+        """Test a client is told where to resume from."""
+        upload_id = self.create_upload()
+        self.put_chunk(upload_id, 0, 99)
+
+        response = self.put_chunk(upload_id, 200, 299)
+
+        self.assertEqual(response.status_code, status.HTTP_409_CONFLICT)
+        self.assertEqual(response.data["offset"], 100)
+        response = self.client.get(
+            upload_detail_url(self.recipe.id, upload_id))
+        self.assertEqual(response.data["offset"], 100)
+
+    def test_concurrent_chunk_returns_409(self):
+        """Test a chunk is not recorded once another one moved the offset."""
+        upload_id = self.create_upload()
+
+        def racing_open(path, mode):
+            RecipeImageUpload.objects.filter(pk=upload_id).update(offset=100)
+            return open(path, mode)
+
+        with patch("recipe.views.open", racing_open, create=True):
+            response = self.put_chunk(upload_id, 0, 49)
+
+        self.assertEqual(response.status_code, status.HTTP_409_CONFLICT)
+        self.assertEqual(response.data["offset"], 100)
+        self.assertEqual(
+            RecipeImageUpload.objects.get(pk=upload_id).offset, 100)
+
+    def test_finalize_incomplete_upload_returns_409(self):
+        """Test an upload cannot be finalized before all bytes arrived."""
+        upload_id = self.create_upload()
+        self.put_chunk(upload_id, 0, 99)
+
+        response = self.client.post(
+            upload_finalize_url(self.recipe.id, upload_id))
+
+        self.assertEqual(response.status_code, status.HTTP_409_CONFLICT)
+        self.assertFalse(RecipeImage.objects.exists())
+
+    def test_chunk_without_content_range_returns_400(self):
+        """Test chunks must describe their byte range."""
+        upload_id = self.create_upload()
+
+        response = self.client.put(
+            upload_detail_url(self.recipe.id, upload_id), self.content,
+            content_type="application/octet-stream")
+
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_finalize_invalid_image_returns_400(self):
+        """Test uploaded bytes must form a valid image."""
+        self.content = b"not an image"
+        upload_id = self.create_upload()
+        self.put_chunk(upload_id, 0, len(self.content) - 1)
+
+        response = self.client.post(
+            upload_finalize_url(self.recipe.id, upload_id))
+
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn("image", response.data)
+        self.assertFalse(RecipeImage.objects.exists())
+        self.assertTrue(RecipeImageUpload.objects.filter(
+            pk=upload_id).exists())
+
+    def test_concurrent_finalize_returns_404(self):
+        """Test only one request finalizes an upload into an image."""
+        upload_id = self.create_upload()
+        self.put_chunk(upload_id, 0, len(self.content) - 1)
+        get_object = RecipeImageUploadViewSet.get_object
+
+        def racing_get_object(view):
+            upload = get_object(view)
+            RecipeImageUpload.objects.filter(pk=upload.pk).delete()
+            return upload
+
+        with patch.object(
+            RecipeImageUploadViewSet, "get_object", racing_get_object,
+        ):
+            response = self.client.post(
+                upload_finalize_url(self.recipe.id, upload_id))
+
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+        self.assertFalse(RecipeImage.objects.exists())
+
+    def test_oversized_upload_rejected_on_create(self):
+        """Test uploads over the image size limit cannot be started."""
+        response = self.client.post(
+            uploads_url(self.recipe.id),
+            {"filename": "photo.jpg", "size": 2001 * 1024})
+
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn("size", response.data)
+
+    def test_upload_is_limited_to_recipe_owner(self):
+        """Test uploads cannot be started for other users' recipes."""
+        recipe = create_recipe(user=self.user2)
+
+        response = self.client.post(
+            uploads_url(recipe.id), {"filename": "photo.jpg", "size": 10})
+
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+        self.assertFalse(RecipeImageUpload.objects.exists())
+
+    def test_delete_upload_removes_partial_file(self):
+        """Test aborting an upload deletes what was received."""
+        upload_id = self.create_upload()
+        self.put_chunk(upload_id, 0, 99)
+
+        response = self.client.delete(
+            upload_detail_url(self.recipe.id, upload_id))
+
+        self.assertEqual(response.status_code, status.HTTP_204_NO_CONTENT)
+        self.assertFalse(RecipeImageUpload.objects.exists())
+        self.assertEqual(
+            os.listdir(TESTS_FILE_DIR + '/chunked_uploads'), [])
@@ -0,0 +1,82 @@
+"""Upload handlers for recipe and ingredient images."""
+
+import hashlib
+
+from django.core.exceptions import SuspiciousOperation, ValidationError
+from django.core.files.uploadhandler import (
+    MemoryFileUploadHandler,
+    TemporaryFileUploadHandler,
+)
+from django.http.multipartparser import MultiPartParserError
+
+from .images import strip_metadata
+from .validators import MAX_FILE_SIZE_KB
+
+
+class UploadRejected(MultiPartParserError, SuspiciousOperation):
+    """
+    Raised while parsing an upload which cannot be accepted. The API turns
+    parser errors into 400 responses and Django does the same for
+    suspicious operations, when the body is parsed by the CSRF check.
+    """
+
+
+class ContentHashMixin:
+    """
+    Hash the chunks of an uploaded file as they stream in and attach the
+    SHA-256 digest to the resulting file as `content_hash`.
+    """
+
+    def new_file(self, *args, **kwargs):
+        self.hasher = hashlib.sha256()
+        super().new_file(*args, **kwargs)
+
+    def receive_data_chunk(self, raw_data, start):
+        remaining = super().receive_data_chunk(raw_data, start)
+        # Only hash chunks this handler consumed, the rest is passed on.
+        if remaining is None:
+            self.hasher.update(raw_data)
+        return remaining
+
+    def file_complete(self, file_size):
+        file = super().file_complete(file_size)
+        if file is not None:
+            file.content_hash = self.hasher.hexdigest()
+        return file
+
+
+class ImageUploadMixin(ContentHashMixin):
+    """
+    Reject files over the image size limit as soon as the limit is crossed,
+    before the rest is buffered, and check the image header for decoded
+    size before stripping EXIF metadata from the completed file.
+    """
+
+    def receive_data_chunk(self, raw_data, start):
+        if start + len(raw_data) > MAX_FILE_SIZE_KB * 1024:
+            raise UploadRejected(
+                f"The image {self.file_name} cannot be larger than "
+                f"{MAX_FILE_SIZE_KB}KB")
+        return super().receive_data_chunk(raw_data, start)
+
+    def file_complete(self, file_size):
+        file = super().file_complete(file_size)
+        if file is None:
+            return None
+        try:
+            return strip_metadata(file)
+        except ValidationError as error:
+            file.close()
+            raise UploadRejected(
+                f"The image {self.file_name} was rejected: "
+                f"{' '.join(error.messages)}")
+
+
+class ImageMemoryFileUploadHandler(
+        ImageUploadMixin, MemoryFileUploadHandler):
+    """Memory upload handler for images."""
+
+
+class ImageTemporaryFileUploadHandler(
+        ImageUploadMixin, TemporaryFileUploadHandler):
+    """Temporary file upload handler for images."""
@@ -1,13 +1,16 @@
 """URL configuration for the recipe app APIs"""
 
-from rest_framework_nested import routers
+from django.urls import path
 
+from rest_framework_nested import routers
 
 from .views import (
     IngredientViewSet,
     IngredientImageViewSet,
     RecipeViewSet,
     RecipeImageViewSet,
+    RecipeImageUploadViewSet,
+    RecipeStatsView,
     TagViewSet,
 )
 
@@ -23,6 +26,8 @@ router.register('ingredients', IngredientViewSet)
 recipe_router = routers.NestedDefaultRouter(
     router, "recipes", lookup="recipe")
 recipe_router.register("images", RecipeImageViewSet, basename="recipe-images")
+recipe_router.register(
+    "uploads", RecipeImageUploadViewSet, basename="recipe-uploads")
 
 # Nested ingredient router for an ingredient's images(/ingredient/{id}/images/)
 ingredient_router = routers.NestedDefaultRouter(
@@ -30,4 +35,6 @@ ingredient_router = routers.NestedDefaultRouter(
 ingredient_router.register(
     "images", IngredientImageViewSet, basename="ingredient-images")
 
-urlpatterns = router.urls + recipe_router.urls + ingredient_router.urls
+urlpatterns = [
+    path("stats/", RecipeStatsView.as_view(), name="stats"),
+] + router.urls + recipe_router.urls + ingredient_router.urls
@@ -1,120 +1,369 @@
 """Views for the recipe APIs"""
 
-from django.db.models import Count
+from concurrent.futures import ThreadPoolExecutor
+import mimetypes
+import os
+import re
+from urllib.parse import quote
+
+from django.conf import settings
+from django.core.exceptions import ValidationError as DjangoValidationError
+from django.core.files.uploadedfile import UploadedFile
+from django.db import transaction
+from django.db.models import Count, Prefetch
+from django.http import FileResponse, Http404, HttpResponse
+from django.shortcuts import get_object_or_404
 
 from drf_spectacular.utils import (
-    extend_schema_view,
     extend_schema,
     OpenApiParameter,
     OpenApiTypes,
 )
 
+from rest_framework import mixins, status
+from rest_framework.authentication import (
+    SessionAuthentication,
+    TokenAuthentication,
+)
+from rest_framework.exceptions import NotAuthenticated, ValidationError
+from rest_framework.decorators import action
 from rest_framework.permissions import IsAuthenticated
-from rest_framework.viewsets import ModelViewSet
+from rest_framework.response import Response
+from rest_framework.views import APIView
+from rest_framework.viewsets import GenericViewSet, ModelViewSet
+
+from core.throttling import GlobalTokenBucketThrottle
+
+from .cloning import clone_recipe
+from .deletion import delete_recipes, raw_delete
+from .filters import (
+    AssignedOnlyFilter,
+    RecipeRangeFilter,
+    RecipeRelationFilter,
+    StableOrderingFilter,
+)
+from .images import populate_image_metadata, strip_metadata
+from .links import attach_recipes, detach_recipes, merge_attributes
+from .pantry import rank_recipes_by_pantry
+from .scaling import scale_recipes
+from .shopping import build_shopping_list
+from .signals import delete_image_on_commit
+from .stats import get_stats, invalidate_stats_on_commit
+from .uploadhandlers import (
+    ImageMemoryFileUploadHandler,
+    ImageTemporaryFileUploadHandler,
+)
+
+from .media import (
+    MEDIA_URL_MAX_AGE,
+    has_valid_signature,
+    user_can_access_media,
+)
 
 from .models import (
     Ingredient,
     IngredientImage,
     Recipe,
     RecipeImage,
+    RecipeImageUpload,
+    RecipeIngredient,
     Tag,
+    image_storage,
 )
 from .permissions import (
     IsRecipeOwner,
     IsIngredientOwner,
 )
 from .serializers import (
+    AttributeMergeSerializer,
+    RecipeBulkResultSerializer,
+    RecipeBulkSerializer,
+    RecipeBulkUpdateSerializer,
+    RecipeLinkResultSerializer,
+    PantryRecipeSerializer,
+    PantrySerializer,
     RecipeDetailSerializer,
+    RecipeScaleQuerySerializer,
     RecipeSerializer,
+    RecipeStatsSerializer,
+    ScaledRecipeSerializer,
+    ShoppingListItemSerializer,
+    ShoppingListQuerySerializer,
+    SimilarRecipeSerializer,
     TagSerializer,
     IngredientSerializer,
     RecipeImageSerializer,
+    RecipeImageUploadSerializer,
     IngredientImageSerializer,
+    ImageBatchResultSerializer,
+    ImageBatchUploadSerializer,
 )
 
 
-# Extend API documentation with filter documentation.
-@extend_schema_view(
-    list=extend_schema(
-        parameters=[
-            OpenApiParameter(
-                name="assigned_only",
-                type=OpenApiTypes.INT,
-                enum=[0, 1],
-                description="Filter items by those assigned to a recipe.",
-                required=False,
-            ),
-        ],
-    ),
-)
+CONTENT_RANGE_REGEX = re.compile(r"^bytes (\d+)-(\d+)/(\d+)$")
+CHUNK_SIZE = 64 * 1024
+
+
 class BaseRecipeOrAttrViewSet(ModelViewSet):
     """Base view set for recipe and its attributes."""
 
     permission_classes = [IsAuthenticated]
+    filter_backends = [AssignedOnlyFilter, StableOrderingFilter]
+    ordering_fields = ["name", "recipe_count"]
+    ordering = ["-id"]
+
+    throttle_scopes = {
+        "list": "list",
+        "attach": "bulk",
+        "detach": "bulk",
+        "merge": "bulk",
+    }
+
+    # Table linking recipes to the attribute and its foreign key to it.
+    through_model = None
+    through_field = None
 
     def get_queryset(self):
-        """
-        Return appropriate queryset considering current user and filters.
-        """
-        queryset = self.queryset.filter(
-            user=self.request.user.id).order_by("-id")
-        assigned_only = int(self.request.query_params.get("assigned_only", 0))
-        if assigned_only:
-            # Filter items by those that are assigned to at least
-            # one recipe
-            queryset = queryset.filter(recipes__isnull=False)
-        return queryset
+        """Return the items of the current user."""
+        return self.queryset.filter(user=self.request.user.id)
 
     def perform_create(self, serializer):
         """Provide serializer with current user."""
         serializer.save(user=self.request.user)
 
-
-# Extend API documentation with filter documentation.
-@extend_schema_view(
-    list=extend_schema(
-        parameters=[
-            OpenApiParameter(
-                name="tags",
-                type=OpenApiTypes.STR,
-                description="Comma-separated list of tag IDs",
-                required=False,
-            ),
-            OpenApiParameter(
-                name="ingredients",
-                type=OpenApiTypes.STR,
-                description="Comma-separated list of ingredient IDs",
-                required=False,
-            ),
-        ],
+    def _link_recipes(self, request, link):
+        """Attach or detach the attribute and the recipes given by ID."""
+        attribute = self.get_object()
+        serializer = RecipeBulkSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        recipes = Recipe.objects.filter(
+            user=request.user, id__in=serializer.validated_data["ids"])
+
+        count = link(
+            self.through_model, self.through_field, attribute, recipes)
+        recipe_count = self.through_model.objects.filter(
+            **{self.through_field: attribute}).count()
+        return Response({"count": count, "recipe_count": recipe_count})
+
+    @extend_schema(
+        request=RecipeBulkSerializer, responses=RecipeLinkResultSerializer)
+    @action(detail=True, methods=["post"])
+    def attach(self, request, pk=None):
+        """Add the item to the user's recipes with the given IDs."""
+        return self._link_recipes(request, attach_recipes)
+
+    @extend_schema(
+        request=RecipeBulkSerializer, responses=RecipeLinkResultSerializer)
+    @action(detail=True, methods=["post"])
+    def detach(self, request, pk=None):
+        """Remove the item from the user's recipes with the given IDs."""
+        return self._link_recipes(request, detach_recipes)
+
+    @extend_schema(request=AttributeMergeSerializer)
+    @action(detail=True, methods=["post"])
+    def merge(self, request, pk=None):
+        """
+        Merge the user's items with the given IDs into this one, moving
+        their recipes and images, and delete them.
+        """
+        target = self.get_object()
+        serializer = AttributeMergeSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        sources = self.queryset.model.objects.filter(
+            user=request.user, id__in=serializer.validated_data["ids"])
+
+        merge_attributes(
+            self.through_model, self.through_field, target, sources)
+        return Response(self.get_serializer(
+            self.get_queryset().get(pk=target.pk)).data)
+
+
+# Ingredients of a recipe detail, with their images, in two queries.
+RECIPE_INGREDIENTS = (
+    Prefetch(
+        "recipe_ingredients",
+        queryset=RecipeIngredient.objects.select_related("ingredient"),
     ),
+    "recipe_ingredients__ingredient__images",
 )
+
+
 class RecipeViewSet(ModelViewSet):
     """View set for the recipe API"""
 
     permission_classes = [IsAuthenticated]
-
-    queryset = Recipe.objects.all().prefetch_related(
-        "tags", "ingredients", "images")
+    filter_backends = [
+        RecipeRelationFilter,
+        RecipeRangeFilter,
+        StableOrderingFilter,
+    ]
+    ordering_fields = ["title", "price", "time_minutes", "created"]
+    ordering = ["-id"]
+    throttle_scopes = {
+        "list": "list",
+        "pantry": "list",
+        "similar": "list",
+        "bulk": "bulk",
+        "shopping_list": "bulk",
+        "scale": "bulk",
+    }
+
+    queryset = Recipe.objects.all().prefetch_related("tags", "images")
 
     def get_queryset(self):
         """Returns appropriate recipe queryset."""
 
-        queryset = self.queryset.filter(
-            user=self.request.user.id).order_by('-id')
-        tags = self.request.query_params.get("tags")
-        ingredients = self.request.query_params.get("ingredients")
-        if tags:
-            tag_ids = tags.split(",")
-            queryset = queryset.filter(tags__id__in=tag_ids)
-        if ingredients:
-            ingredient_ids = ingredients.split(",")
-            queryset = queryset.filter(ingredients__id__in=ingredient_ids)
-        return queryset.distinct()
+        queryset = self.queryset.filter(user=self.request.user.id)
+        if self.action != "list":
+            queryset = queryset.prefetch_related(*RECIPE_INGREDIENTS)
+        return queryset
+
+    def _reload(self, serializer):
+        """
+        Reload the saved recipe with its relations prefetched, so its
+        response takes the same queries whatever its ingredients.
+        """
+        serializer.instance = self.get_queryset().get(
+            pk=serializer.instance.pk)
 
     def perform_create(self, serializer):
         """Provide serializer with current user."""
         serializer.save(user=self.request.user)
+        self._reload(serializer)
+
+    def perform_update(self, serializer):
+        """Save the recipe and reload it for the response."""
+        serializer.save()
+        self._reload(serializer)
+
+    def perform_destroy(self, instance):
+        """Delete the recipe and its relations with set based deletes."""
+        delete_recipes(Recipe.objects.filter(pk=instance.pk))
+
+    @extend_schema(
+        methods=["PATCH"],
+        request=RecipeBulkUpdateSerializer,
+        responses=RecipeBulkResultSerializer,
+    )
+    @extend_schema(
+        methods=["DELETE"],
+        request=RecipeBulkSerializer,
+        responses=RecipeBulkResultSerializer,
+    )
+    @action(detail=False, methods=["patch", "delete"])
+    def bulk(self, request):
+        """
+        Apply the same changes to, or delete, the recipes of the user with
+        the given IDs. IDs of other users' recipes are ignored.
+        """
+        if request.method == "DELETE":
+            serializer = RecipeBulkSerializer(data=request.data)
+        else:
+            serializer = RecipeBulkUpdateSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        values = dict(serializer.validated_data)
+        recipes = Recipe.objects.filter(
+            user=request.user, id__in=values.pop("ids"))
+
+        if request.method == "DELETE":
+            count = delete_recipes(recipes)
+        else:
+            count = recipes.update(**values)
+            invalidate_stats_on_commit([request.user.id])
+        return Response({"count": count})
+
+    @extend_schema(
+        parameters=[PantrySerializer],
+        responses=PantryRecipeSerializer(many=True),
+    )
+    @action(detail=False, methods=["get"], filter_backends=[])
+    def pantry(self, request):
+        """
+        List the recipes which can best be cooked with the given
+        ingredients, with the ingredients each of them is missing.
+        """
+        serializer = PantrySerializer(data=request.query_params)
+        serializer.is_valid(raise_exception=True)
+        recipes = rank_recipes_by_pantry(
+            self.get_queryset(),
+            serializer.validated_data["ingredients"],
+            serializer.validated_data["limit"],
+        )
+        return Response(PantryRecipeSerializer(recipes, many=True).data)
+
+    @extend_schema(request=None, responses={201: RecipeDetailSerializer})
+    @action(detail=True, methods=["post"])
+    def clone(self, request, pk=None):
+        """Copy the recipe with its tags, ingredients and images."""
+        recipe = get_object_or_404(
+            self.get_queryset().prefetch_related(None), pk=pk)
+        self.check_object_permissions(request, recipe)
+        clone = clone_recipe(recipe)
+        serializer = RecipeDetailSerializer(
+            self.queryset.prefetch_related(*RECIPE_INGREDIENTS).get(
+                pk=clone.pk),
+            context=self.get_serializer_context(),
+        )
+        return Response(serializer.data, status=status.HTTP_201_CREATED)
+
+    @extend_schema(
+        parameters=[ShoppingListQuerySerializer],
+        responses=ShoppingListItemSerializer(many=True),
+    )
+    @action(
+        detail=False, methods=["get"], url_path="shopping-list",
+        filter_backends=[],
+    )
+    def shopping_list(self, request):
+        """
+        List the distinct ingredients of the given recipes, each with the
+        recipes it is used in. IDs of other users' recipes are ignored.
+        """
+        serializer = ShoppingListQuerySerializer(data=request.query_params)
+        serializer.is_valid(raise_exception=True)
+        items = build_shopping_list(
+            request.user, serializer.validated_data["recipes"])
+        return Response(ShoppingListItemSerializer(items, many=True).data)
+
+    @extend_schema(
+        parameters=[RecipeScaleQuerySerializer],
+        responses=ScaledRecipeSerializer(many=True),
+    )
+    @action(detail=False, methods=["get"], filter_backends=[])
+    def scale(self, request):
+        """
+        List the ingredients of the given recipes scaled to a number of
+        servings, converted to a measuring system when one is given.
+        IDs of other users' recipes are ignored.
+        """
+        serializer = RecipeScaleQuerySerializer(data=request.query_params)
+        serializer.is_valid(raise_exception=True)
+        recipes = scale_recipes(
+            request.user,
+            serializer.validated_data["recipes"],
+            servings=serializer.validated_data.get("servings"),
+            system=serializer.validated_data.get("system"),
+        )
+        return Response(ScaledRecipeSerializer(recipes, many=True).data)
+
+    @extend_schema(responses=SimilarRecipeSerializer(many=True))
+    @action(detail=True, methods=["get"], filter_backends=[])
+    def similar(self, request, pk=None):
+        """
+        List the recipes sharing the most tags and ingredients with the
+        recipe, read from the precomputed similarity index.
+        """
+        recipe = get_object_or_404(
+            self.get_queryset().prefetch_related(None), pk=pk)
+        self.check_object_permissions(request, recipe)
+        similarities = (
+            recipe.similarities.select_related("similar")
+            .prefetch_related("similar__tags", "similar__images")
+            .order_by("-score", "similar_id")
+        )
+        serializer = SimilarRecipeSerializer(
+            similarities, many=True, context=self.get_serializer_context())
+        return Response(serializer.data)
 
     def get_serializer_class(self):
         """Determines which serializer to use"""
@@ -129,6 +378,8 @@ class TagViewSet(BaseRecipeOrAttrViewSet):
 
     queryset = Tag.objects.all().annotate(recipe_count=Count('recipes'))
     serializer_class = TagSerializer
+    through_model = Recipe.tags.through
+    through_field = "tag"
 
 
 class IngredientViewSet(BaseRecipeOrAttrViewSet):
@@ -136,11 +387,139 @@ class IngredientViewSet(BaseRecipeOrAttrViewSet):
 
     queryset = Ingredient.objects.all().annotate(recipe_count=Count('recipes'))
     serializer_class = IngredientSerializer
+    through_model = Recipe.ingredients.through
+    through_field = "ingredient"
 
 
-class RecipeImageViewSet(ModelViewSet):
+class RecipeStatsView(APIView):
+    """View for the recipe statistics of the current user."""
+
+    permission_classes = [IsAuthenticated]
+
+    @extend_schema(responses=RecipeStatsSerializer)
+    def get(self, request):
+        """
+        Return the number of recipes, their average price and time and
+        the most used tags and ingredients.
+        """
+        return Response(RecipeStatsSerializer(get_stats(request.user)).data)
+
+
+class ImageUploadHandlersMixin:
+    """
+    Check, sanitize and hash uploaded images while they stream in. The
+    image upload handlers replace the default ones for the requests of
+    the view only.
+    """
+
+    upload_handler_classes = [
+        ImageMemoryFileUploadHandler,
+        ImageTemporaryFileUploadHandler,
+    ]
+
+    def initial(self, request, *args, **kwargs):
+        # Set before authentication, whose CSRF check may parse the body.
+        request._request.upload_handlers = [
+            handler(request._request)
+            for handler in self.upload_handler_classes
+        ]
+        super().initial(request, *args, **kwargs)
+
+
+class BatchImageUploadMixin:
+    """
+    Add a batch action to an image view set which uploads many images in
+    one multipart request. Files are validated and stored in parallel and
+    their rows are inserted with a single query. The stored files are
+    released again when the insert fails.
+    """
+
+    # Name of the foreign key to the image owner and its URL keyword.
+    parent_field = None
+    batch_workers = 4
+    throttle_scopes = {
+        "create": "uploads",
+        "update": "uploads",
+        "partial_update": "uploads",
+        "batch": "uploads",
+    }
+
+    def _store_image(self, upload):
+        """Validate an uploaded file and save it to storage if valid."""
+        serializer = self.get_serializer(data={"image": upload})
+        if not serializer.is_valid():
+            return None, serializer.errors
+        model = self.get_serializer_class().Meta.model
+        instance = model(**{
+            f"{self.parent_field}_id": self.kwargs[f"{self.parent_field}_pk"]
+        })
+        instance.image.save(upload.name, upload, save=False)
+        # Bulk creation skips save(), which fills in the metadata otherwise.
+        populate_image_metadata(instance)
+        return instance, None
+
+    @extend_schema(
+        request=ImageBatchUploadSerializer,
+        responses=ImageBatchResultSerializer(many=True),
+    )
+    @action(detail=False, methods=["post"])
+    def batch(self, request, *args, **kwargs):
+        """Upload many images at once and return a result per file."""
+        batch = ImageBatchUploadSerializer(data=request.data)
+        batch.is_valid(raise_exception=True)
+        uploads = batch.validated_data["images"]
+
+        with ThreadPoolExecutor(max_workers=self.batch_workers) as pool:
+            futures = [
+                pool.submit(self._store_image, upload) for upload in uploads]
+        stored = [
+            future.result() for future in futures
+            if future.exception() is None
+        ]
+        instances = [
+            instance for instance, _ in stored if instance is not None]
+        model = self.get_serializer_class().Meta.model
+        try:
+            # Raise the first error of storing a file, once all are stored.
+            for future in futures:
+                future.result()
+            with transaction.atomic():
+                model.objects.bulk_create(instances)
+        except Exception:
+            # Release the files stored for a batch which was not inserted.
+            for instance in instances:
+                delete_image_on_commit(
+                    instance.image.name, instance.renditions)
+            raise
+
+        results = []
+        for upload, (instance, errors) in zip(uploads, stored):
+            if instance is None:
+                results.append({"name": upload.name, "errors": errors})
+            else:
+                results.append({
+                    "name": upload.name,
+                    **self.get_serializer(instance).data,
+                })
+        created = any(instance is not None for instance, _ in stored)
+        return Response(
+            results,
+            status=(
+                status.HTTP_201_CREATED if created
+                else status.HTTP_400_BAD_REQUEST
+            ),
+        )
+
+
+class RecipeImageViewSet(
+    ImageUploadHandlersMixin,
+    BatchImageUploadMixin,
+    ModelViewSet,
+):
     """View set for recipe images."""
 
+    parent_field = "recipe"
+
     serializer_class = RecipeImageSerializer
     permission_classes = [IsRecipeOwner]
     queryset = RecipeImage.objects.all()
@@ -154,9 +533,156 @@ class RecipeImageViewSet(ModelViewSet):
         return {'recipe_id': self.kwargs['recipe_pk']}
 
 
-class IngredientImageViewSet(ModelViewSet):
+class RecipeImageUploadViewSet(
+    mixins.CreateModelMixin,
+    mixins.RetrieveModelMixin,
+    mixins.DestroyModelMixin,
+    GenericViewSet,
+):
+    """
+    View set for resumable recipe image uploads.
+
+    An upload is created with the file name and size, its bytes are sent
+    with any number of PUT requests carrying a Content-Range header and it
+    is finalized into a recipe image once complete. Retrieving an upload
+    returns the offset to resume from.
+    """
+
+    serializer_class = RecipeImageUploadSerializer
+    permission_classes = [IsRecipeOwner]
+    queryset = RecipeImageUpload.objects.all()
+    # Chunks of an upload are paced by the user bucket only.
+    throttle_scopes = {"create": "uploads", "finalize": "uploads"}
+
+    def get_queryset(self):
+        return self.queryset.filter(recipe_id=self.kwargs['recipe_pk'])
+
+    def get_serializer_context(self):
+        return {'recipe_id': self.kwargs['recipe_pk']}
+
+    def _offset_conflict(self, upload):
+        """Return the response telling a client where to resume from."""
+        return Response(
+            {
+                "detail": "The chunk does not start at the upload offset.",
+                "offset": upload.offset,
+            },
+            status=status.HTTP_409_CONFLICT,
+        )
+
+    @extend_schema(
+        request={"application/octet-stream": OpenApiTypes.BINARY},
+        parameters=[
+            OpenApiParameter(
+                name="Content-Range",
+                location=OpenApiParameter.HEADER,
+                type=OpenApiTypes.STR,
+                description="Byte range of the chunk, e.g. bytes 0-99/1000",
+                required=True,
+            ),
+        ],
+    )
+    def update(self, request, *args, **kwargs):
+        """Append a chunk of bytes to the upload."""
+        match = CONTENT_RANGE_REGEX.match(
+            request.headers.get("Content-Range", ""))
+        if match is None:
+            raise ValidationError(
+                {"detail": "A Content-Range header is required."})
+        start, end, total = (int(value) for value in match.groups())
+
+        upload = self.get_object()
+        if total != upload.size or end < start or end >= upload.size:
+            raise ValidationError(
+                {"detail": "The Content-Range does not fit the upload."})
+        if start != upload.offset:
+            return self._offset_conflict(upload)
+
+        # The body is read outside any transaction, so a slow client holds
+        # no row lock. Bytes past the offset, of chunks which were written
+        # but never recorded, are overwritten rather than truncated, since
+        # a concurrent request may be writing the same chunk.
+        with open(upload.path, "r+b") as partial_file:
+            partial_file.seek(start)
+            remaining = end - start + 1
+            stream = request.stream
+            while remaining and stream is not None:
+                chunk = stream.read(min(remaining, CHUNK_SIZE))
+                if not chunk:
+                    break
+                partial_file.write(chunk)
+                remaining -= len(chunk)
+            offset = partial_file.tell()
+
+        # Only the request which finds the offset unchanged records it.
+        updated = RecipeImageUpload.objects.filter(
+            pk=upload.pk, offset=start).update(offset=offset)
+        if not updated:
+            return self._offset_conflict(self.get_object())
+        upload.offset = offset
+        if remaining:
+            return self._offset_conflict(upload)
+        return Response(self.get_serializer(upload).data)
+
+    def perform_create(self, serializer):
+        """Create the upload and its empty partial file."""
+        upload = serializer.save()
+        os.makedirs(settings.CHUNKED_UPLOAD_ROOT, exist_ok=True)
+        open(upload.path, "wb").close()
+
+    def perform_destroy(self, instance):
+        """Abort the upload and delete its partial file."""
+        path = instance.path
+        instance.delete()
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
+
+    @extend_schema(request=None, responses=RecipeImageSerializer)
+    @action(detail=True, methods=["post"])
+    def finalize(self, request, *args, **kwargs):
+        """Create the recipe image from a completely received upload."""
+        upload = self.get_object()
+        if upload.offset != upload.size:
+            return self._offset_conflict(upload)
+
+        with transaction.atomic():
+            # Claim the upload by deleting its row: a concurrent finalize
+            # waits for this one and then finds nothing to delete. The row
+            # comes back if the image cannot be created.
+            if not raw_delete(RecipeImageUpload.objects.filter(pk=upload.pk)):
+                raise Http404()
+            with open(upload.path, "rb") as partial_file:
+                image_file = UploadedFile(
+                    partial_file, name=upload.filename, size=upload.size)
+                try:
+                    image_file = strip_metadata(image_file)
+                except DjangoValidationError as error:
+                    raise ValidationError({"image": error.messages})
+                serializer = RecipeImageSerializer(
+                    data={"image": image_file},
+                    context={"recipe_id": upload.recipe_id},
+                )
+                serializer.is_valid(raise_exception=True)
+                serializer.save()
+                image_file.close()
+        try:
+            os.remove(upload.path)
+        except FileNotFoundError:
+            pass
+        return Response(serializer.data, status=status.HTTP_201_CREATED)
+
+
+class IngredientImageViewSet(
+    ImageUploadHandlersMixin,
+    BatchImageUploadMixin,
+    ModelViewSet,
+):
     """View set for ingredient images."""
 
+    parent_field = "ingredient"
+
     serializer_class = IngredientImageSerializer
     permission_classes = [IsIngredientOwner]
     queryset = IngredientImage.objects.all()
@@ -168,3 +694,47 @@ class IngredientImageViewSet(ModelViewSet):
     # give the serializer the ingredient id from the url:
     def get_serializer_context(self):
         return {'ingredient_id': self.kwargs['ingredient_pk']}
+
+
+@extend_schema(exclude=True)
+class MediaView(APIView):
+    """
+    Serve uploaded images to their owners.
+
+    Access is granted by a signature issued with the image URL or by
+    authenticating as the owner. The file transfer itself is handed off
+    to nginx with X-Accel-Redirect; Django only streams the file when no
+    redirect prefix is configured (development).
+    """
+
+    authentication_classes = [TokenAuthentication, SessionAuthentication]
+    permission_classes = []
+    # Pages load many images at once, so only the global bucket applies.
+    throttle_classes = [GlobalTokenBucketThrottle]
+
+    def get(self, request, path):
+        signature = request.query_params.get("sig")
+        if signature:
+            allowed = has_valid_signature(path, signature)
+        elif not request.user.is_authenticated:
+            raise NotAuthenticated()
+        else:
+            allowed = user_can_access_media(request.user, path)
+        if not allowed:
+            raise Http404()
+
+        prefix = settings.MEDIA_ACCEL_REDIRECT_PREFIX
+        if prefix:
+            content_type, _ = mimetypes.guess_type(path)
+            response = HttpResponse(
+                content_type=content_type or "application/octet-stream")
+            response["X-Accel-Redirect"] = prefix + quote(path)
+        else:
+            if not image_storage.exists(path):
+                raise Http404()
+            response = FileResponse(image_storage.open(path))
+        # Stored files are named after their content and never change,
+        # but a signed URL must not outlive its signature in caches.
+        response["Cache-Control"] = (
+            f"private, max-age={MEDIA_URL_MAX_AGE}, immutable")
+        return response
@@ -26,6 +26,9 @@ class UserProfileView(RetrieveUpdateAPIView):
 class CreateUserTokenView(ObtainAuthToken):
     """Get token for valid user email and password."""
     serializer_class = UserTokenSerializer
+    # ObtainAuthToken disables throttling; logins are limited per client.
+    throttle_classes = api_settings.DEFAULT_THROTTLE_CLASSES
+    throttle_scope = "token"
 
     # To get the browsable API;
     renderer_classes = api_settings.DEFAULT_RENDERER_CLASSES
@@ -8,6 +8,15 @@ import CardContent from "@mui/material/CardContent";
 import CardMedia from "@mui/material/CardMedia";
 import Typography from "@mui/material/Typography";
 
+// Build a srcset from the resized copies stored for an image.
+function imageSrcSet(image) {
+	if (!image || !image.renditions.length) return undefined;
+	return [
+		...image.renditions.map(({ url, width }) => `${url} ${width}w`),
+		`${image.image} ${image.width}w`,
+	].join(", ");
+}
+
 export default function RecipeCard({ id, title, price, time, image }) {
 	return (
 		<Card sx={{ width: 345, height: 470 }}>
@@ -16,7 +25,18 @@ export default function RecipeCard({ id, title, price, time, image }) {
 					component="img"
 					alt="recipe-image"
 					height="260"
-					image={image}
+					image={image ? image.image : ""}
+					srcSet={imageSrcSet(image)}
+					sizes="345px"
+					loading="lazy"
+					sx={
+						image && image.placeholder
+							? {
+									backgroundImage: `url(${image.placeholder})`,
+									backgroundSize: "cover",
+							  }
+							: undefined
+					}
 				/>
 			</Link>
 			<CardContent>
@@ -61,8 +61,8 @@ function RecipeList() {
 								title={recipe.title}
 								image={
 									Boolean(recipe.images.length)
-										? recipe.images[0].image
-										: ""
+										? recipe.images[0]
+										: null
 								}
 							/>
 						</Grid2>
@@ -0,0 +1,13 @@
+// Key the micro-cache on a hash of the credentials, never on the token
+// itself: nginx writes the cache key in plain text into each cached file.
+var crypto = require('crypto');
+
+function authKey(r) {
+    var authorization = r.headersIn.Authorization;
+    if (!authorization) {
+        return '';
+    }
+    return crypto.createHash('sha256').update(authorization).digest('hex');
+}
+
+export default {authKey};
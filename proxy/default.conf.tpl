@@ -1,13 +1,105 @@
+upstream app_server {
+    server ${APP_HOST}:${APP_PORT};
+}
+
+# Short lived cache for authenticated GET requests to the API. Cached
+# responses belong to users: keep the directory private to the container,
+# never on a shared or persistent volume.
+uwsgi_cache_path /tmp/nginx/microcache levels=1:2 keys_zone=microcache:10m
+                 max_size=${MICROCACHE_MAX_SIZE} inactive=1m use_temp_path=off;
+
+# Skip the micro-cache unless it is enabled and the request is authenticated.
+map "${MICROCACHE_ENABLED}" $microcache_disabled {
+    "1"     0;
+    default 1;
+}
+
+# SHA-256 of the Authorization header, so tokens stay out of cache keys.
+js_import auth from /etc/nginx/auth_key.js;
+js_set $auth_key auth.authKey;
+
+map $http_authorization $microcache_anonymous {
+    ""      1;
+    default 0;
+}
+
 server {
     listen ${LISTEN_PORT};
 
+    sendfile    on;
+    tcp_nopush  on;
+    tcp_nodelay on;
+
+    gzip            on;
+    gzip_static     on;
+    gzip_vary       on;
+    gzip_proxied    any;
+    gzip_comp_level 5;
+    gzip_min_length 1024;
+    gzip_types
+        application/javascript
+        application/json
+        application/manifest+json
+        application/vnd.oai.openapi+json
+        image/svg+xml
+        text/css
+        text/javascript
+        text/plain;
+
+    open_file_cache          max=10000 inactive=60s;
+    open_file_cache_valid    60s;
+    open_file_cache_min_uses 2;
+    open_file_cache_errors   on;
+
+    # Hashed assets of the React build never change once published.
+    location ~ ^/static/static/(js|css|media)/ {
+        root /vol;
+        expires max;
+        add_header Cache-Control "public, max-age=31536000, immutable";
+        access_log off;
+    }
+
     location /static {
         alias /vol/static;
+        expires 1h;
+    }
+
+    # Uploaded media is only served after Django has authorized the request.
+    location /static/media {
+        return 404;
+    }
+
+    location /static/chunked_uploads {
+        return 404;
+    }
+
+    location /protected-media/ {
+        internal;
+        alias /vol/static/media/;
+    }
+
+    # Batch image uploads carry up to MAX_BATCH_IMAGES (20) files of up to
+    # MAX_FILE_SIZE_KB (2000 KB) each: 40000 KB plus multipart overhead.
+    # Keep in line with app/recipe/serializers.py and validators.py.
+    location ~ ^/api/recipe/(recipes|ingredients)/[0-9]+/images/batch/$ {
+        uwsgi_pass    app_server;
+        include       /etc/nginx/uwsgi_params;
+        client_max_body_size 45M;
     }
 
     location / {
-        uwsgi_pass    ${APP_HOST}:${APP_PORT};
+        uwsgi_pass    app_server;
         include       /etc/nginx/uwsgi_params;
         client_max_body_size 5M;
+
+        uwsgi_cache         microcache;
+        uwsgi_cache_methods GET HEAD;
+        uwsgi_cache_key     "$request_method$host$request_uri$auth_key";
+        uwsgi_cache_valid   200 ${MICROCACHE_TTL};
+        uwsgi_cache_lock    on;
+        uwsgi_cache_use_stale updating;
+        uwsgi_cache_bypass  $microcache_disabled $microcache_anonymous;
+        uwsgi_no_cache      $microcache_disabled $microcache_anonymous;
+        add_header X-Cache-Status $upstream_cache_status;
     }
-}
\ No newline at end of file
+}
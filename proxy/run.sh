@@ -2,5 +2,8 @@
 
 set -e
 
-envsubst < /etc/nginx/default.conf.tpl > /etc/nginx/conf.d/default.conf
-nginx -g "daemon off;"
\ No newline at end of file
+envsubst '${LISTEN_PORT} ${APP_HOST} ${APP_PORT} ${MICROCACHE_ENABLED} ${MICROCACHE_TTL} ${MICROCACHE_MAX_SIZE}' \
+    < /etc/nginx/default.conf.tpl \
+    > /etc/nginx/conf.d/default.conf
+# njs hashes the credentials in the micro-cache keys.
+nginx -g "load_module modules/ngx_http_js_module.so; daemon off;"
\ No newline at end of file
@@ -6,4 +6,8 @@ python manage.py wait_for_db
 python manage.py collectstatic --noinput
 python manage.py migrate
 
-uwsgi --socket :9000 --workers 4 --master --enable-threads --module app.wsgi
+# bitmap=1 lets a value span several blocks, so pickled stats payloads
+# and throttle state larger than one block still fit (up to
+# blocks * blocksize, the whole cache, about 40 MB here).
+uwsgi --socket :9000 --workers 4 --master --enable-threads --module app.wsgi \
+    --cache2 name=default,items=10000,blocksize=4096,bitmap=1